@@ -0,0 +1,78 @@
+"""
+Per-call overhead of building a new client/connection per request vs. the
+shared pooled clients in core.clients, against local stub servers.
+
+    python benchmarks/bench_client_reuse.py --calls 200
+
+Over plain localhost HTTP this only measures client construction and TCP
+setup; against real HTTPS endpoints the saved TLS handshakes add more.
+"""
+
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from stub_servers import FakeCrawl4AI, FakeOpenAI  # noqa: E402
+
+for var in ("OPENAI_API_KEY", "TAVILY_API_KEY", "COHERE_API_KEY"):
+    os.environ.setdefault(var, "bench")
+
+
+def per_call_ms(fn, calls: int) -> float:
+    fn()  # warm up
+    start = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    return (time.perf_counter() - start) * 1000 / calls
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=200)
+    args = parser.parse_args()
+
+    with FakeCrawl4AI() as http_stub, FakeOpenAI(
+        first_token_delay=0, token_delay=0
+    ) as openai_stub:
+        os.environ["OPENAI_BASE_URL"] = f"{openai_stub.base_url}/v1"
+        import requests
+        from openai import OpenAI
+
+        from core.clients import http_session, openai_client
+
+        url = f"{http_stub.base_url}/crawl"
+        body = {"urls": "https://example.com"}
+        messages = [{"role": "user", "content": "hi"}]
+
+        def fresh_http():
+            requests.post(url, json=body).raise_for_status()
+
+        def pooled_http():
+            http_session().post(url, json=body).raise_for_status()
+
+        def fresh_openai():
+            client = OpenAI(api_key="bench")
+            client.chat.completions.create(model="stub", messages=messages)
+            client.close()
+
+        def pooled_openai():
+            openai_client().chat.completions.create(model="stub", messages=messages)
+
+        rows = [
+            ("http: requests.post", per_call_ms(fresh_http, args.calls)),
+            ("http: shared Session", per_call_ms(pooled_http, args.calls)),
+            ("openai: new client", per_call_ms(fresh_openai, args.calls)),
+            ("openai: shared client", per_call_ms(pooled_openai, args.calls)),
+        ]
+
+    for name, ms in rows:
+        print(f"{name:24}{ms:8.2f} ms/call")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Prompt size per turn of one long CLI-style session (every question asked
+of the same Agent), with every provider stubbed locally: once keeping the
+whole conversation (--history-budget 0, the behaviour before
+core.compaction) and once compacted to --history-budget tokens.
+
+    python benchmarks/bench_conversation.py --turns 8 --history-budget 8000
+
+For each turn, prints the largest decision prompt (prompt_tokens reported
+by the stub), the share of the compacted run's prompt tokens the stub
+served from its prompt cache, and the conversation's size before and after
+compaction.
+"""
+
+import argparse
+import re
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+from harness import configure_caches, load_corpus, parse_latency  # noqa: E402
+from load_test import start_stubs  # noqa: E402
+
+
+_REFERENCE_RE = re.compile(r"^\[(\d+)\] Title: .*\n   URL: (.*)$", re.M)
+
+
+def session_decision(messages: list) -> dict:
+    """
+    Search once per question, then answer citing the first two references
+    that search returned, like a model following the system prompt.
+    """
+    asked = max(
+        i
+        for i, m in enumerate(messages)
+        if m["role"] == "user" and not m["content"].startswith("Please now")
+    )
+    tools = [m for m in messages[asked:] if m["role"] == "tool"]
+    if not tools:
+        return {
+            "action": "search",
+            "search_queries": [messages[asked]["content"]],
+            "scratchpad": None,
+            "message": None,
+        }
+    refs = _REFERENCE_RE.findall(tools[-1]["content"])[:2]
+    answer = (
+        " ".join(f"A finding from the sources [{number}]." for number, _ in refs)
+        + " More detail follows in this sentence." * 20
+        + "\n\nReferences:\n"
+        + "\n".join(f"[{number}] {url}" for number, url in refs)
+    )
+    return {
+        "action": "answer",
+        "search_queries": [],
+        "scratchpad": None,
+        "message": answer,
+    }
+
+
+def run_session(questions: list, history_budget: int, args) -> list:
+    from core import tracing
+    from core.agent import Agent
+
+    agent = Agent(
+        max_iters=args.max_iters,
+        use_answer_cache=False,
+        render_markdown=False,
+        context_budget=args.context_budget,
+        history_budget=history_budget,
+    )
+    turns = []
+    for question in questions:
+        with tracing.span("session") as root:
+            for _ in agent.run_pipeline(question):
+                pass
+        calls = [s.attributes for s in root.trace if s.name == "decision_llm"]
+        prompts = [call.get("prompt_tokens", 0) for call in calls]
+        compact = next((s.attributes for s in root.trace if s.name == "compact"), {})
+        turns.append(
+            {
+                "prompt_tokens": max(prompts, default=0),
+                "cached": sum(call.get("cached_tokens", 0) for call in calls)
+                / max(1, sum(prompts)),
+                "before": compact.get("tokens_before"),
+                "after": compact.get("tokens_after"),
+            }
+        )
+    return turns
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--corpus", default=str(ROOT / "benchmarks" / "queries.txt"))
+    parser.add_argument("--turns", type=int, default=8)
+    parser.add_argument("--max-iters", type=int, default=2)
+    parser.add_argument("--context-budget", type=int, default=6000)
+    parser.add_argument("--history-budget", type=int, default=8000)
+    args = parser.parse_args()
+
+    stubs = start_stubs(parse_latency(["openai=0"]), token_delay=0)
+    stubs[0].responder = session_decision
+    configure_caches("off")
+    questions = load_corpus(args.corpus, args.turns)
+    try:
+        full = run_session(questions, 0, args)
+        stubs[0].prompt_prefixes.clear()
+        compacted = run_session(questions, args.history_budget, args)
+    finally:
+        for stub in stubs:
+            stub.stop()
+
+    print(f"{len(questions)} turns, history budget {args.history_budget} tokens\n")
+    print(
+        f"{'turn':>4} {'full':>8} {'compacted':>10} {'cached':>7}   "
+        "history before -> after"
+    )
+    for i, (a, b) in enumerate(zip(full, compacted), 1):
+        history = f"{b['before']:>8,} -> {b['after']:,}" if b["before"] else ""
+        print(
+            f"{i:>4} {a['prompt_tokens']:>8,} {b['prompt_tokens']:>10,} "
+            f"{b['cached']:>7.0%}   {history}"
+        )
+    total_full = sum(t["prompt_tokens"] for t in full)
+    total_compacted = sum(t["prompt_tokens"] for t in compacted)
+    print(
+        f"\nlargest prompts summed: {total_full:,} -> {total_compacted:,} tokens "
+        f"({1 - total_compacted / max(1, total_full):.0%} less)"
+    )
+
+
+if __name__ == "__main__":
+    main()
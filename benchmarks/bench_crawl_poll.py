@@ -0,0 +1,130 @@
+"""
+Crawl4AI task polling: fixed 2s polling vs. exponential backoff with jitter,
+one page per task vs. batched tasks, and cancellation at a deadline, against
+a local fake Crawl4AI with variable job durations.
+
+    python benchmarks/bench_crawl_poll.py --pages 24 --max-delay 3 --batch 4
+
+For each strategy it reports the wall time to crawl every page, the mean
+and p95 time a page's text arrived after its job finished (the polling
+overhead), and the number of /task polls sent.
+"""
+
+import argparse
+import concurrent.futures
+import os
+import random
+import sys
+import time
+import uuid
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from stub_servers import FakeCrawl4AI  # noqa: E402
+
+for var in ("OPENAI_API_KEY", "TAVILY_API_KEY", "COHERE_API_KEY"):
+    os.environ.setdefault(var, "bench")
+
+
+def make_pages(n: int, max_delay: float, seed: int) -> dict:
+    """{url: job duration}, durations skewed towards fast pages."""
+    rng = random.Random(seed)
+    run = uuid.uuid4().hex[:8]
+    pages = {}
+    for i in range(n):
+        delay = round(min(max_delay, rng.expovariate(2.0 / max_delay)), 2)
+        pages[f"https://bench.local/{run}/{i}?delay={delay}"] = delay
+    return pages
+
+
+def fixed_poll_fetch(ph, urls: list) -> dict:
+    """The original loop: poll every 2 seconds."""
+    session = ph.http_session()
+    resp = session.post(
+        f"{ph.CRAWL4AI_BASE_URL}/crawl", json=ph.crawl4ai_payload(urls, 10)
+    )
+    task_id = resp.json()["task_id"]
+    while True:
+        js = session.get(f"{ph.CRAWL4AI_BASE_URL}/task/{task_id}").json()
+        done, pages = ph.crawl_task_results(js, urls)
+        if done:
+            return pages
+        time.sleep(2)
+
+
+def run_strategy(fetch, pages: dict, batch: int, concurrency: int, stub) -> dict:
+    urls = list(pages)
+    batches = [urls[i : i + batch] for i in range(0, len(urls), batch)]
+    arrived = {}
+    requests_before = stub.requests
+    start = time.monotonic()
+    with concurrent.futures.ThreadPoolExecutor(concurrency) as pool:
+        futures = [pool.submit(fetch, b) for b in batches]
+        for future in concurrent.futures.as_completed(futures):
+            now = time.monotonic() - start
+            for url in future.result():
+                arrived[url] = now
+    wall = time.monotonic() - start
+    # Jobs start when submitted, i.e. roughly at t=0 with enough concurrency.
+    overheads = sorted(arrived[u] - pages[u] for u in urls)
+    return {
+        "wall": wall,
+        "mean_overhead": sum(overheads) / len(overheads),
+        "p95_overhead": overheads[int(0.95 * (len(overheads) - 1))],
+        "polls": stub.requests - requests_before - len(batches),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=24)
+    parser.add_argument("--max-delay", type=float, default=3.0)
+    parser.add_argument("--batch", type=int, default=4)
+    parser.add_argument("--concurrency", type=int, default=24)
+    parser.add_argument("--deadline", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    with FakeCrawl4AI() as stub:
+        os.environ["CRAWL4AI_BASE_URL"] = stub.base_url
+        from tools import pipeline_helpers as ph
+
+        strategies = [
+            ("fixed 2s, 1/task", lambda u: fixed_poll_fetch(ph, u), 1),
+            ("backoff, 1/task", ph.fetch_markdown_batch, 1),
+            (f"backoff, {args.batch}/task", ph.fetch_markdown_batch, args.batch),
+        ]
+        print(
+            f"{args.pages} pages, job durations 0-{args.max_delay}s\n\n"
+            f"{'strategy':<20} {'wall s':>7} {'mean late s':>11} "
+            f"{'p95 late s':>10} {'polls':>6}"
+        )
+        for name, fetch, batch in strategies:
+            pages = make_pages(args.pages, args.max_delay, args.seed)
+            r = run_strategy(fetch, pages, batch, args.concurrency, stub)
+            print(
+                f"{name:<20} {r['wall']:>7.2f} {r['mean_overhead']:>11.2f} "
+                f"{r['p95_overhead']:>10.2f} {r['polls']:>6}"
+            )
+
+        # Cancellation: pages slower than the deadline stop polling at once.
+        ph.page_cache.redis = None
+        pages = make_pages(args.pages, args.max_delay * 3, args.seed)
+        docs = [{"title": "", "url": u, "content": "", "score": 1.0} for u in pages]
+        enricher = ph.PageEnricher(args.concurrency, crawl_timeout_sec=60)
+        start = time.monotonic()
+        enricher.add(docs)
+        pending = enricher.finish(args.deadline)
+        returned = time.monotonic() - start
+        before = stub.requests
+        time.sleep(2 * ph.CRAWL_POLL_MAX_SEC)
+        print(
+            f"\ncancel at {args.deadline}s: returned after {returned:.2f}s with "
+            f"{pending} page(s) pending; {stub.requests - before} polls after"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Dedup ratio and time of exact (url, title) dedup vs. canonical URL +
+MinHash/LSH near-duplicate dedup on a synthetic search-result corpus.
+
+    python benchmarks/bench_dedup.py --sizes 100 500 2000 --dup-ratio 0.4
+
+Each duplicate is either a URL variant of an original (http/https, www.,
+AMP, tracking params) or a syndicated copy on another site with a few
+words changed and different boilerplate around it.
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+for var in ("OPENAI_API_KEY", "TAVILY_API_KEY", "COHERE_API_KEY"):
+    os.environ.setdefault(var, "bench")
+
+VOCAB = [f"word{i}" for i in range(5000)]
+
+
+def article(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(VOCAB) for _ in range(words))
+
+
+def url_variant(rng: random.Random, url: str) -> str:
+    host_path = url.split("://", 1)[1]
+    return rng.choice(
+        [
+            f"http://{host_path}",
+            f"https://www.{host_path}",
+            f"https://{host_path}/amp",
+            f"https://{host_path}?utm_source=feed&utm_medium=rss",
+            f"https://{host_path.replace('.', '-', 1).split('/', 1)[0]}"
+            f".cdn.ampproject.org/c/s/{host_path}",
+        ]
+    )
+
+
+def syndicated(rng: random.Random, text: str, edit_ratio: float) -> str:
+    words = text.split()
+    for i in rng.sample(range(len(words)), int(len(words) * edit_ratio)):
+        words[i] = rng.choice(VOCAB)
+    return f"Republished by partner. {' '.join(words)} Subscribe for more."
+
+
+def make_corpus(size: int, dup_ratio: float, words: int, seed: int):
+    """Returns (docs, expected number of distinct docs)."""
+    rng = random.Random(seed)
+    originals = int(size * (1 - dup_ratio))
+    docs = [
+        {
+            "title": f"Story {i}",
+            "url": f"https://site{i % 50}.com/news/story-{i}",
+            "content": article(rng, words),
+            "score": rng.random(),
+        }
+        for i in range(originals)
+    ]
+    for j in range(size - originals):
+        source = rng.choice(docs[:originals])
+        if rng.random() < 0.5:
+            copy = dict(source, url=url_variant(rng, source["url"]))
+        else:
+            copy = dict(
+                source,
+                title=f"{source['title']} | Partner",
+                url=f"https://mirror{j % 20}.net/{source['url'].rsplit('/', 1)[1]}",
+                content=syndicated(rng, source["content"], edit_ratio=0.03),
+            )
+        docs.append(copy)
+    rng.shuffle(docs)
+    return docs, originals
+
+
+def exact_dedup(docs: list) -> list:
+    seen = set()
+    unique = []
+    for d in docs:
+        key = (d["url"], d["title"])
+        if key not in seen:
+            seen.add(key)
+            unique.append(d)
+    return unique
+
+
+def timed(fn, docs):
+    start = time.perf_counter()
+    result = fn(docs)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 500, 2000])
+    parser.add_argument("--dup-ratio", type=float, default=0.4)
+    parser.add_argument("--words", type=int, default=400)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    from tools.pipeline_helpers import deduplicate_docs
+
+    print(
+        f"{'docs':>6} {'distinct':>8} {'exact kept':>10} {'near kept':>9} "
+        f"{'ratio':>6} {'exact ms':>8} {'near ms':>8} {'us/doc':>7}"
+    )
+    for size in args.sizes:
+        docs, expected = make_corpus(size, args.dup_ratio, args.words, args.seed)
+        exact, exact_sec = timed(exact_dedup, docs)
+        near, near_sec = timed(deduplicate_docs, docs)
+        print(
+            f"{size:>6} {expected:>8} {len(exact):>10} {len(near):>9} "
+            f"{1 - len(near) / size:>6.1%} {exact_sec * 1000:>8.2f} "
+            f"{near_sec * 1000:>8.1f} {near_sec / size * 1e6:>7.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
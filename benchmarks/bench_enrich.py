@@ -0,0 +1,85 @@
+"""
+Compare serial vs. concurrent crawl enrichment against a local fake Crawl4AI.
+
+    python benchmarks/bench_enrich.py --docs 20 --slow 3 --slow-delay 30
+
+Uses fakeredis when installed, otherwise the Redis configured in .env.
+"""
+
+import argparse
+import os
+import sys
+import time
+import uuid
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from stub_servers import FakeCrawl4AI  # noqa: E402
+
+for var in ("OPENAI_API_KEY", "TAVILY_API_KEY", "COHERE_API_KEY"):
+    os.environ.setdefault(var, "bench")
+
+
+def make_docs(n: int, slow: int, fast_delay: float, slow_delay: float) -> list:
+    run = uuid.uuid4().hex[:8]
+    docs = []
+    for i in range(n):
+        delay = slow_delay if i < slow else fast_delay
+        docs.append(
+            {
+                "title": f"Doc {i}",
+                "url": f"https://bench.local/{run}/{i}?delay={delay}",
+                "content": "short",
+                "score": 1.0,
+            }
+        )
+    return docs
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", type=int, default=20)
+    parser.add_argument("--slow", type=int, default=3)
+    parser.add_argument("--fast-delay", type=float, default=0.5)
+    parser.add_argument("--slow-delay", type=float, default=30.0)
+    parser.add_argument("--budget", type=float, default=5.0)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--skip-serial", action="store_true")
+    args = parser.parse_args()
+
+    with FakeCrawl4AI() as crawl:
+        os.environ["CRAWL4AI_BASE_URL"] = crawl.base_url
+        from tools import pipeline_helpers
+
+        try:
+            import fakeredis
+
+            pipeline_helpers.page_cache.redis = fakeredis.FakeRedis()
+        except ImportError:
+            pass
+
+        if not args.skip_serial:
+            docs = make_docs(args.docs, args.slow, args.fast_delay, args.slow_delay)
+            start = time.perf_counter()
+            for doc in docs:
+                text = pipeline_helpers.get_webpage_text(doc["url"])
+                if text:
+                    doc["content"] = text
+            serial = time.perf_counter() - start
+            enriched = sum(len(d["content"]) > 100 for d in docs)
+            print(f"serial:     {serial:7.2f}s  enriched {enriched}/{len(docs)}")
+
+        docs = make_docs(args.docs, args.slow, args.fast_delay, args.slow_delay)
+        start = time.perf_counter()
+        pipeline_helpers.enrich_docs_with_cache(
+            docs, budget_sec=args.budget, max_concurrency=args.concurrency
+        )
+        concurrent = time.perf_counter() - start
+        enriched = sum(len(d["content"]) > 100 for d in docs)
+        print(f"concurrent: {concurrent:7.2f}s  enriched {enriched}/{len(docs)}")
+
+
+if __name__ == "__main__":
+    main()
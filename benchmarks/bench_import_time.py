@@ -0,0 +1,110 @@
+"""
+CLI cold start: how long `import cli.main` takes (from `python -X importtime`),
+which modules dominate it, and the wall time from launching the CLI to its
+prompt. Exits non-zero if time to prompt is over --target-ms or any of the
+--lazy modules (slow SDKs that should only load in the background or on
+first use) is imported at startup.
+
+    python benchmarks/bench_import_time.py --runs 5 --target-ms 500
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+LAZY_MODULES = "openai,cohere,httpx,numpy,redis,requests,pydantic"
+
+
+def child_env() -> dict:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        p for p in (str(ROOT / "src"), env.get("PYTHONPATH", "")) if p
+    )
+    for var in ("OPENAI_API_KEY", "TAVILY_API_KEY", "COHERE_API_KEY"):
+        env.setdefault(var, "bench")
+    return env
+
+
+def import_times(module: str) -> list:
+    """[(cumulative_us, self_us, depth, name)] from -X importtime."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        env=child_env(),
+        check=True,
+    )
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((int(cumulative_us), int(self_us), depth, name.strip()))
+    return rows
+
+
+def time_to_prompt() -> float:
+    """Seconds from launching the CLI until it asks for a question."""
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-c", "from cli.main import plexy; plexy()"],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        text=True,
+        env=child_env(),
+    )
+    for line in proc.stdout:
+        if "Type your question" in line:
+            break
+    elapsed = time.perf_counter() - start
+    proc.communicate("exit\n", timeout=60)
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--module", default="cli.main")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--target-ms", type=float, default=500)
+    parser.add_argument("--lazy", default=LAZY_MODULES)
+    args = parser.parse_args()
+
+    rows = import_times(args.module)
+    total_ms = next(c for c, _, d, n in reversed(rows) if n == args.module) / 1000
+    print(f"import {args.module}: {total_ms:.1f} ms cumulative\n")
+    print(f"{'module':<48} {'cumulative ms':>14} {'self ms':>9}")
+    for cumulative, self_us, depth, name in sorted(rows, reverse=True)[: args.top]:
+        label = "  " * min(depth, 4) + name
+        print(f"{label:<48} {cumulative / 1000:>14.1f} {self_us / 1000:>9.1f}")
+
+    imported = {name for _, _, _, name in rows}
+    eager = [m for m in args.lazy.split(",") if m and m in imported]
+
+    prompts = [time_to_prompt() * 1000 for _ in range(args.runs)]
+    median = statistics.median(prompts)
+    print(
+        f"\ntime to prompt: median {median:.0f} ms, "
+        f"min {min(prompts):.0f} ms over {args.runs} run(s) "
+        f"(target {args.target_ms:.0f} ms)"
+    )
+
+    failed = False
+    if eager:
+        print(f"FAIL imported at startup: {', '.join(eager)}")
+        failed = True
+    if median > args.target_ms:
+        print(f"FAIL time to prompt over target by {median - args.target_ms:.0f} ms")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Searches against a throttled Tavily stub (429 + Retry-After beyond
+--stub-rps requests per second) with the provider limiter configured three
+ways: unlimited without retries (every 429 fails its search, as before
+core.ratelimit), adaptive concurrency with retries, and a token bucket just
+under the stub's rate.
+
+    python benchmarks/bench_rate_limit.py --searches 200 --threads 32 --stub-rps 20
+
+Reports successes, 429s received, wall time and the limiter's metrics.
+"""
+
+import argparse
+import concurrent.futures
+import os
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+from stub_servers import FakeTavily  # noqa: E402
+
+
+def run(mode: str, args, stub: FakeTavily) -> dict:
+    from core import ratelimit
+    from tools.search import tavily_search
+
+    settings = {
+        "unlimited": dict(
+            max_concurrency=1000, max_attempts=1, retry_after_max_sec=0
+        ),
+        "adaptive": dict(max_concurrency=16, max_attempts=args.attempts),
+        "rps": dict(
+            rps=args.stub_rps * 0.9,
+            burst=1,
+            max_concurrency=16,
+            max_attempts=args.attempts,
+        ),
+    }[mode]
+    ratelimit._limiters["tavily"] = ratelimit.ProviderLimiter("tavily", **settings)
+    # Start each mode in a fresh rate-limit window.
+    time.sleep(1.1 - time.monotonic() % 1)
+    throttled_before = stub.throttled
+
+    def search(i: int) -> bool:
+        try:
+            tavily_search(f"{mode} query {i}", max_results=5)
+            return True
+        except Exception:
+            return False
+
+    start = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(args.threads) as pool:
+        ok = sum(pool.map(search, range(args.searches)))
+    return {
+        "ok": ok,
+        "throttled": stub.throttled - throttled_before,
+        "wall": time.perf_counter() - start,
+        "limiter": ratelimit.limiter("tavily").snapshot(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--searches", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--stub-rps", type=int, default=20)
+    parser.add_argument("--delay", type=float, default=0.1, help="Stub latency")
+    parser.add_argument("--attempts", type=int, default=6)
+    args = parser.parse_args()
+
+    with FakeTavily(delay=args.delay) as stub:
+        stub.rate_limit = args.stub_rps
+        os.environ["TAVILY_BASE_URL"] = stub.base_url
+        for var in ("OPENAI_API_KEY", "TAVILY_API_KEY", "COHERE_API_KEY"):
+            os.environ.setdefault(var, "bench")
+        from harness import configure_caches
+
+        configure_caches("off")
+
+        print(
+            f"{args.searches} searches from {args.threads} threads, "
+            f"stub allows {args.stub_rps}/s\n"
+        )
+        print(f"{'mode':<10} {'ok':>5} {'429s':>6} {'wall s':>7}  limiter")
+        for mode in ("unlimited", "adaptive", "rps"):
+            r = run(mode, args, stub)
+            lim = r["limiter"]
+            print(
+                f"{mode:<10} {r['ok']:>5} {r['throttled']:>6} {r['wall']:>7.1f}  "
+                f"limit {lim['limit']}, retries {lim['retries']}, "
+                f"wait avg {lim['wait_ms_avg']} ms / max {lim['wait_ms_max']} ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Round trips and latency of per-URL GET/SET vs. MGET + pipelined SET for the
+crawl cache.
+
+    python benchmarks/bench_redis_cache.py --urls 40 --hit-ratio 0.5 --rtt-ms 1
+
+Runs against fakeredis when installed (with --rtt-ms of simulated network
+latency per round trip), or a real server via --redis-url.
+"""
+
+import argparse
+import os
+import sys
+import time
+import uuid
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+for var in ("OPENAI_API_KEY", "TAVILY_API_KEY", "COHERE_API_KEY"):
+    os.environ.setdefault(var, "bench")
+
+
+class CountingRedis:
+    """Proxies a redis client, counting (and optionally delaying) round trips."""
+
+    def __init__(self, client, rtt_sec: float = 0.0):
+        self._client = client
+        self._rtt_sec = rtt_sec
+        self.round_trips = 0
+
+    def _trip(self):
+        self.round_trips += 1
+        if self._rtt_sec:
+            time.sleep(self._rtt_sec)
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if name == "pipeline":
+            return self._pipeline
+        if callable(attr):
+
+            def call(*args, **kwargs):
+                self._trip()
+                return attr(*args, **kwargs)
+
+            return call
+        return attr
+
+    def _pipeline(self, *args, **kwargs):
+        pipe = self._client.pipeline(*args, **kwargs)
+        execute = pipe.execute
+
+        def counted_execute(*a, **kw):
+            self._trip()
+            return execute(*a, **kw)
+
+        pipe.execute = counted_execute
+        return pipe
+
+
+def make_client(redis_url: str):
+    if redis_url:
+        import redis
+
+        return redis.Redis.from_url(redis_url)
+    import fakeredis
+
+    return fakeredis.FakeRedis()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--urls", type=int, default=40)
+    parser.add_argument("--hit-ratio", type=float, default=0.5)
+    parser.add_argument("--rtt-ms", type=float, default=1.0)
+    parser.add_argument("--redis-url", default="")
+    args = parser.parse_args()
+
+    from tools import pipeline_helpers as ph
+
+    from tools.cache import TieredCache
+
+    client = CountingRedis(make_client(args.redis_url), args.rtt_ms / 1000)
+    # Redis tier only, so every lookup is a real round trip.
+    ph.page_cache = TieredCache(
+        "bench",
+        client,
+        prefix=ph.CRAWL_CACHE_PREFIX,
+        ttl_sec=ph.CRAWL_CACHE_TTL_SEC,
+        memory_max_bytes=0,
+        memory_ttl_sec=0,
+    )
+    page = "x" * 20_000
+
+    def scenario():
+        run = uuid.uuid4().hex[:8]
+        urls = [f"https://bench.local/{run}/{i}" for i in range(args.urls)]
+        hits = urls[: int(len(urls) * args.hit_ratio)]
+        ph.cache_texts({u: page for u in hits})
+        client.round_trips = 0
+        return urls
+
+    # Before: one GET per doc, one SET per crawled page.
+    urls = scenario()
+    start = time.perf_counter()
+    for url in urls:
+        if not client.get(ph.cache_key_for_url(url)):
+            client.set(ph.cache_key_for_url(url), page, ex=ph.CRAWL_CACHE_TTL_SEC)
+    before = (client.round_trips, time.perf_counter() - start)
+
+    # After: one MGET, one pipelined SET batch for the fills.
+    urls = scenario()
+    start = time.perf_counter()
+    cached = ph.get_cached_texts(urls)
+    ph.cache_texts({u: page for u in urls if u not in cached})
+    after = (client.round_trips, time.perf_counter() - start)
+
+    print(f"{'':8}{'round trips':>12}{'latency':>12}")
+    print(f"{'before':8}{before[0]:>12}{before[1] * 1000:>10.1f}ms")
+    print(f"{'after':8}{after[0]:>12}{after[1] * 1000:>10.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
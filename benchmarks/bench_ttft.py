@@ -0,0 +1,67 @@
+"""
+Time to first answer token: blocking call_decision_llm vs. streamed
+stream_decision_llm, against a local fake OpenAI-compatible server.
+
+    python benchmarks/bench_ttft.py --first-token-delay 0.3 --token-delay 0.02
+"""
+
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from stub_servers import FakeOpenAI  # noqa: E402
+
+for var in ("OPENAI_API_KEY", "TAVILY_API_KEY", "COHERE_API_KEY"):
+    os.environ.setdefault(var, "bench")
+
+CONVERSATION = [
+    {"role": "system", "content": "You are Plexy."},
+    {"role": "user", "content": "What is new in Python 3.13?"},
+    {"role": "tool", "tool_call_id": "search_0", "content": "[]"},
+]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--first-token-delay", type=float, default=0.3)
+    parser.add_argument("--token-delay", type=float, default=0.02)
+    args = parser.parse_args()
+
+    with FakeOpenAI(
+        first_token_delay=args.first_token_delay, token_delay=args.token_delay
+    ) as stub:
+        os.environ["OPENAI_BASE_URL"] = f"{stub.base_url}/v1"
+        from tools.pipeline_helpers import call_decision_llm, stream_decision_llm
+
+        start = time.perf_counter()
+        decision = call_decision_llm(list(CONVERSATION))
+        blocking = time.perf_counter() - start
+        assert decision and decision.message, "no answer from blocking call"
+
+        start = time.perf_counter()
+        first_token = None
+        streamed = ""
+        stream = stream_decision_llm(list(CONVERSATION))
+        while True:
+            try:
+                _, text = next(stream)
+            except StopIteration as stop:
+                final = stop.value
+                break
+            if first_token is None:
+                first_token = time.perf_counter() - start
+            streamed += text
+        total = time.perf_counter() - start
+        assert final and streamed == final.message, "streamed text != parsed message"
+
+    print(f"blocking: first visible text after {blocking:6.2f}s")
+    print(f"streamed: first token after        {first_token:6.2f}s (done {total:.2f}s)")
+
+
+if __name__ == "__main__":
+    main()
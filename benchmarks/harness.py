@@ -0,0 +1,337 @@
+"""
+End-to-end benchmark: runs Agent.run_pipeline over a corpus of questions
+with every provider (OpenAI, Tavily, Cohere, Crawl4AI) behind a local
+server, and reports p50/p95 latency per pipeline stage plus prompt tokens
+and doc counts, from the pipeline's own trace spans.
+
+    # synthetic providers, no recordings or network needed
+    python benchmarks/harness.py --limit 5 --latency openai=0.3 --latency crawl4ai=1
+
+    # record real provider responses once (needs API keys and network) ...
+    python benchmarks/harness.py --mode record --cassette benchmarks/cassettes/run.jsonl
+    # ... then replay them offline, with injected latency
+    python benchmarks/harness.py --mode replay --cassette benchmarks/cassettes/run.jsonl
+
+The corpus (default: benchmarks/queries.txt) is plain text with one question
+per line, or JSON lines whose "query", "question" or "title" field is used.
+
+--json-out writes the report; --baseline compares against an earlier report
+and exits non-zero if a stage's p95 got slower by more than --max-regression.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+from record_replay import Cassette, RecordReplayProxy  # noqa: E402
+from stub_servers import FakeCohere, FakeCrawl4AI, FakeOpenAI, FakeTavily  # noqa: E402
+
+PROVIDERS = ("openai", "tavily", "cohere", "crawl4ai")
+UPSTREAMS = {
+    "openai": os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1"),
+    "tavily": os.getenv("TAVILY_BASE_URL", "https://api.tavily.com"),
+    "cohere": os.getenv("COHERE_BASE_URL", "https://api.cohere.com"),
+    "crawl4ai": os.getenv("CRAWL4AI_BASE_URL", "http://localhost:11235"),
+}
+# Numeric span attributes summed per question and reported as metrics.
+METRICS = {
+    "decision_llm": ("prompt_tokens", "cached_tokens", "completion_tokens"),
+    "tavily": ("results",),
+    "streaming_search": ("docs", "duplicates", "crawled", "crawl_cache_hits"),
+    "rerank": ("docs", "sent"),
+    "speculative_search": ("hit", "wasted"),
+    "iteration": ("routed",),
+}
+# Span names counted per question, e.g. answer_cache hits.
+OUTCOMES = {"answer_cache": "result"}
+# Spans that are one LLM round trip each
+LLM_CALLS = ("decision_llm",)
+
+
+def load_corpus(path: str, limit: int) -> List[str]:
+    questions = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if path.endswith(".jsonl"):
+                row = json.loads(line)
+                line = next(
+                    (row[k] for k in ("query", "question", "title") if row.get(k)),
+                    "",
+                )
+            if line:
+                questions.append(line)
+    return questions[:limit] if limit else questions
+
+
+def parse_latency(specs: List[str]) -> Dict[str, float]:
+    latency = dict.fromkeys(PROVIDERS, 0.0)
+    for spec in specs:
+        name, _, seconds = spec.partition("=")
+        if name not in latency:
+            raise SystemExit(f"Unknown provider in --latency {spec!r}")
+        latency[name] = float(seconds)
+    return latency
+
+
+def start_servers(args, latency: Dict[str, float]) -> dict:
+    """Starts one server per provider and points Plexy's base URLs at them."""
+    if args.mode == "synthetic":
+        servers = {
+            "openai": FakeOpenAI(
+                first_token_delay=latency["openai"], token_delay=args.token_delay
+            ),
+            "tavily": FakeTavily(delay=latency["tavily"]),
+            "cohere": FakeCohere(delay=latency["cohere"]),
+            "crawl4ai": FakeCrawl4AI(default_delay=latency["crawl4ai"]),
+        }
+    else:
+        cassette = Cassette(args.cassette)
+        if args.mode == "replay" and not len(cassette):
+            raise SystemExit(f"No recordings in {args.cassette}; run --mode record")
+        servers = {
+            name: RecordReplayProxy(
+                name,
+                cassette,
+                upstream=UPSTREAMS[name] if args.mode == "record" else "",
+                latency=latency[name],
+                jitter=args.jitter,
+                recorded_latency=args.recorded_latency,
+            )
+            for name in PROVIDERS
+        }
+    for server in servers.values():
+        server.start()
+
+    openai_url = servers["openai"].base_url
+    os.environ["OPENAI_BASE_URL"] = (
+        f"{openai_url}/v1" if args.mode == "synthetic" else openai_url
+    )
+    os.environ["TAVILY_BASE_URL"] = servers["tavily"].base_url
+    os.environ["COHERE_BASE_URL"] = servers["cohere"].base_url
+    os.environ["CRAWL4AI_BASE_URL"] = servers["crawl4ai"].base_url
+    if args.mode != "record":
+        for var in ("OPENAI_API_KEY", "TAVILY_API_KEY", "COHERE_API_KEY"):
+            os.environ.setdefault(var, "bench")
+    return servers
+
+
+def configure_caches(mode: str):
+    """off: every question pays full cost; memory: in-process tier only."""
+    from core.answer_cache import answer_cache
+    from tools.cache import MemoryLRU
+    from tools.pipeline_helpers import page_cache, search_cache
+
+    if mode != "redis":
+        answer_cache.redis = None
+    for cache in (page_cache, search_cache):
+        if mode != "redis":
+            cache.redis = None
+        if mode == "off":
+            cache.memory = MemoryLRU(0, 0)
+
+
+def run_question(question: str, args) -> dict:
+    """Runs one question on a fresh Agent and summarizes its trace."""
+    from core import tracing
+    from core.agent import Agent
+
+    agent = Agent(
+        max_iters=args.max_iters,
+        stream_answers=args.stream,
+        speculative=args.speculative,
+        use_answer_cache=args.answer_cache,
+        fast_path=args.fast_path,
+    )
+    first_chunk = None
+    start = time.perf_counter()
+    with tracing.span("harness") as root:
+        for _ in agent.run_pipeline(question):
+            if first_chunk is None:
+                first_chunk = time.perf_counter() - start
+    total = time.perf_counter() - start
+
+    durations = defaultdict(list)
+    metrics = defaultdict(float)
+    for span in root.trace:
+        if span is root:
+            continue
+        durations[span.name].append(span.duration * 1000)
+        if span.name in LLM_CALLS:
+            metrics["llm_calls"] += 1
+        if span.name in OUTCOMES:
+            outcome = span.attributes.get(OUTCOMES[span.name])
+            metrics[f"{span.name}.{outcome}"] += 1
+        for attr in METRICS.get(span.name, ()):
+            value = span.attributes.get(attr)
+            if isinstance(value, (int, float)):
+                metrics[f"{span.name}.{attr}"] += value
+    durations["end_to_end"].append(total * 1000)
+    durations["first_chunk"].append((first_chunk or total) * 1000)
+    return {"durations": durations, "metrics": metrics}
+
+
+def percentiles(values: List[float]) -> dict:
+    return {
+        "n": len(values),
+        "p50": round(float(np.percentile(values, 50)), 2),
+        "p95": round(float(np.percentile(values, 95)), 2),
+        "mean": round(float(np.mean(values)), 2),
+    }
+
+
+def build_report(runs: List[dict], args, servers: dict) -> dict:
+    durations = defaultdict(list)
+    metrics = defaultdict(list)
+    names = {m for run in runs for m in run["metrics"]}
+    for run in runs:
+        for name, values in run["durations"].items():
+            durations[name].extend(values)
+        for name in names | {"llm_calls"}:
+            metrics[name].append(run["metrics"].get(name, 0.0))
+    return {
+        "mode": args.mode,
+        "questions": len(runs),
+        "stages_ms": {k: percentiles(v) for k, v in sorted(durations.items())},
+        "per_question": {k: percentiles(v) for k, v in sorted(metrics.items())},
+        "provider_requests": {k: s.requests for k, s in servers.items()},
+        "replay_misses": {
+            k: s.misses for k, s in servers.items() if hasattr(s, "misses")
+        },
+    }
+
+
+def print_report(report: dict):
+    print(f"\n{report['questions']} question(s), {report['mode']} providers\n")
+    print(f"{'stage':<22} {'n':>5} {'p50 ms':>10} {'p95 ms':>10} {'mean ms':>10}")
+    for name, row in report["stages_ms"].items():
+        print(
+            f"{name:<22} {row['n']:>5} {row['p50']:>10.1f} "
+            f"{row['p95']:>10.1f} {row['mean']:>10.1f}"
+        )
+    print(f"\n{'per question':<36} {'p50':>8} {'p95':>8} {'mean':>8}")
+    for name, row in report["per_question"].items():
+        print(f"{name:<36} {row['p50']:>8.0f} {row['p95']:>8.0f} {row['mean']:>8.1f}")
+    print(f"\nprovider requests: {report['provider_requests']}")
+    if any(report["replay_misses"].values()):
+        print(f"replay misses: {report['replay_misses']}")
+
+
+def savings(report: dict, baseline: dict) -> str:
+    """LLM calls and seconds saved per question relative to the baseline."""
+    calls = baseline["per_question"]["llm_calls"]["mean"] - (
+        report["per_question"]["llm_calls"]["mean"]
+    )
+    before = baseline["stages_ms"]["end_to_end"]
+    after = report["stages_ms"]["end_to_end"]
+    return (
+        f"saved per question vs baseline: {calls:.2f} LLM calls, "
+        f"{(before['mean'] - after['mean']) / 1000:.2f}s mean, "
+        f"{(before['p50'] - after['p50']) / 1000:.2f}s p50"
+    )
+
+
+def compare(report: dict, baseline: dict, max_regression: float) -> List[str]:
+    """Stages whose p95 grew by more than max_regression (a fraction)."""
+    regressions = []
+    for name, row in report["stages_ms"].items():
+        before = baseline.get("stages_ms", {}).get(name)
+        if not before or before["p95"] <= 0:
+            continue
+        change = row["p95"] / before["p95"] - 1
+        if change > max_regression:
+            regressions.append(
+                f"{name}: p95 {before['p95']:.1f} -> {row['p95']:.1f} ms "
+                f"(+{change:.0%})"
+            )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--corpus", default=str(ROOT / "benchmarks" / "queries.txt"))
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument(
+        "--mode", choices=["synthetic", "record", "replay"], default="synthetic"
+    )
+    parser.add_argument(
+        "--cassette", default=str(ROOT / "benchmarks" / "cassettes" / "run.jsonl")
+    )
+    parser.add_argument(
+        "--latency",
+        action="append",
+        default=[],
+        metavar="PROVIDER=SEC",
+        help="Injected latency per request, e.g. --latency tavily=0.5",
+    )
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument(
+        "--recorded-latency",
+        action="store_true",
+        help="Replay with each response's recorded upstream latency",
+    )
+    parser.add_argument("--token-delay", type=float, default=0.002)
+    parser.add_argument("--cache", choices=["off", "memory", "redis"], default="off")
+    parser.add_argument("--max-iters", type=int, default=2)
+    parser.add_argument("--stream", action="store_true")
+    parser.add_argument("--speculative", action="store_true")
+    parser.add_argument(
+        "--fast-path",
+        action="store_true",
+        help="Route obvious searches and answers without decision LLM calls",
+    )
+    parser.add_argument(
+        "--answer-cache",
+        action="store_true",
+        help="Use the semantic answer cache (e.g. with --repeat to measure hits)",
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=1, help="Ask each question this many times"
+    )
+    parser.add_argument("--json-out", default="")
+    parser.add_argument("--baseline", default="")
+    parser.add_argument("--max-regression", type=float, default=0.2)
+    args = parser.parse_args()
+
+    questions = load_corpus(args.corpus, args.limit) * args.repeat
+    servers = start_servers(args, parse_latency(args.latency))
+    try:
+        configure_caches(args.cache)
+        runs = []
+        for i, question in enumerate(questions, 1):
+            print(f"[{i}/{len(questions)}] {question[:70]}", file=sys.stderr)
+            runs.append(run_question(question, args))
+        report = build_report(runs, args, servers)
+    finally:
+        for server in servers.values():
+            server.stop()
+
+    print_report(report)
+    if args.json_out:
+        Path(args.json_out).write_text(json.dumps(report, indent=2))
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text())
+        if "llm_calls" in baseline["per_question"]:
+            print(savings(report, baseline))
+        regressions = compare(report, baseline, args.max_regression)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+"""
+Load test for `plexy serve`: many concurrent clients asking questions over
+SSE, with every provider stubbed locally (or against a running server with
+--url). Reports throughput, time to first chunk and total latency
+percentiles, 503s from admission control, and the server's /metrics.
+
+    python benchmarks/load_test.py --clients 32 --requests 3 --workers 8 \\
+        --queue-size 16 --latency openai=0.3 --latency tavily=0.5
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+import requests
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+from harness import configure_caches, load_corpus, parse_latency  # noqa: E402
+from stub_servers import FakeCohere, FakeCrawl4AI, FakeOpenAI, FakeTavily  # noqa: E402
+
+
+def start_stubs(latency: dict, token_delay: float) -> list:
+    stubs = {
+        "openai": FakeOpenAI(
+            first_token_delay=latency["openai"], token_delay=token_delay
+        ),
+        "tavily": FakeTavily(delay=latency["tavily"]),
+        "cohere": FakeCohere(delay=latency["cohere"]),
+        "crawl4ai": FakeCrawl4AI(default_delay=latency["crawl4ai"]),
+    }
+    for stub in stubs.values():
+        stub.start()
+    os.environ["OPENAI_BASE_URL"] = f"{stubs['openai'].base_url}/v1"
+    os.environ["TAVILY_BASE_URL"] = stubs["tavily"].base_url
+    os.environ["COHERE_BASE_URL"] = stubs["cohere"].base_url
+    os.environ["CRAWL4AI_BASE_URL"] = stubs["crawl4ai"].base_url
+    for var in ("OPENAI_API_KEY", "TAVILY_API_KEY", "COHERE_API_KEY"):
+        os.environ.setdefault(var, "bench")
+    return list(stubs.values())
+
+
+def start_server(args):
+    from cli.server import PlexyServer
+    from core.agent import Agent
+
+    server = PlexyServer(
+        ("127.0.0.1", 0),
+        lambda: Agent(
+            max_iters=args.max_iters,
+            stream_answers=True,
+            render_markdown=False,
+            use_answer_cache=args.answer_cache,
+        ),
+        workers=args.workers,
+        queue_size=args.queue_size,
+        queue_timeout_sec=args.queue_timeout,
+    )
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def ask(url: str, question: str, session_id: str = "") -> dict:
+    """One streamed question; timings in ms."""
+    body = {"question": question}
+    if session_id:
+        body["session_id"] = session_id
+    start = time.perf_counter()
+    result = {"status": 0, "first_chunk": None, "total": None, "session_id": ""}
+    try:
+        with requests.post(f"{url}/v1/ask", json=body, stream=True, timeout=300) as r:
+            result["status"] = r.status_code
+            if r.status_code != 200:
+                return result
+            event = ""
+            for line in r.iter_lines(decode_unicode=True):
+                if line.startswith("event: "):
+                    event = line[len("event: ") :]
+                elif line.startswith("data: "):
+                    data = json.loads(line[len("data: ") :])
+                    if event == "session":
+                        result["session_id"] = data["session_id"]
+                    elif event == "chunk" and result["first_chunk"] is None:
+                        result["first_chunk"] = (time.perf_counter() - start) * 1000
+                    elif event == "error":
+                        result["status"] = 500
+                    elif event == "done":
+                        break
+    except requests.RequestException:
+        result["status"] = -1
+    result["total"] = (time.perf_counter() - start) * 1000
+    return result
+
+
+def percentiles(values: list) -> str:
+    if not values:
+        return "n/a"
+    return (
+        f"p50 {np.percentile(values, 50):7.0f}  p95 {np.percentile(values, 95):7.0f}"
+        f"  max {max(values):7.0f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="", help="Test a running server instead")
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=3, help="Per client")
+    parser.add_argument(
+        "--follow-ups",
+        action="store_true",
+        help="Each client keeps one session across its requests",
+    )
+    parser.add_argument("--corpus", default=str(ROOT / "benchmarks" / "queries.txt"))
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--queue-size", type=int, default=16)
+    parser.add_argument("--queue-timeout", type=float, default=30.0)
+    parser.add_argument("--max-iters", type=int, default=2)
+    parser.add_argument("--answer-cache", action="store_true")
+    parser.add_argument("--cache", choices=["off", "memory", "redis"], default="off")
+    parser.add_argument(
+        "--latency", action="append", default=[], metavar="PROVIDER=SEC"
+    )
+    parser.add_argument("--token-delay", type=float, default=0.002)
+    args = parser.parse_args()
+
+    questions = load_corpus(args.corpus, 0)
+    stubs, server, url = [], None, args.url.rstrip("/")
+    if not url:
+        stubs = start_stubs(parse_latency(args.latency), args.token_delay)
+        configure_caches(args.cache)
+        server = start_server(args)
+        url = f"http://127.0.0.1:{server.server_port}"
+
+    results = []
+    lock = threading.Lock()
+
+    def client(index: int):
+        session_id = ""
+        for i in range(args.requests):
+            question = questions[(index * args.requests + i) % len(questions)]
+            result = ask(url, question, session_id if args.follow_ups else "")
+            session_id = result["session_id"] or session_id
+            with lock:
+                results.append(result)
+
+    start = time.perf_counter()
+    threads = [
+        threading.Thread(target=client, args=(i,)) for i in range(args.clients)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - start
+
+    ok = [r for r in results if r["status"] == 200]
+    statuses = Counter(r["status"] for r in results)
+    print(
+        f"\n{len(results)} requests from {args.clients} clients in {wall:.1f}s: "
+        f"{len(ok) / wall:.2f} answers/s"
+    )
+    print(f"status codes: {dict(sorted(statuses.items()))}")
+    first_chunks = [r["first_chunk"] for r in ok if r["first_chunk"]]
+    print(f"first chunk  {percentiles(first_chunks)}")
+    print(f"total        {percentiles([r['total'] for r in ok])}")
+    print(f"server: {requests.get(f'{url}/metrics', timeout=10).json()}")
+
+    if server is not None:
+        server.shutdown()
+        server.server_close()
+    for stub in stubs:
+        stub.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+"""
+Record/replay proxy for the provider HTTP APIs (OpenAI, Tavily, Cohere,
+Crawl4AI).
+
+In record mode a proxy forwards each request to the real upstream and
+appends the response to a cassette (JSON lines). In replay mode it serves
+the recorded responses, with no network access, after an injected delay:
+
+    cassette = Cassette("benchmarks/cassettes/run.jsonl")
+    with RecordReplayProxy("tavily", cassette, latency=0.2) as proxy:
+        os.environ["TAVILY_BASE_URL"] = proxy.base_url
+        ...
+
+Requests are matched on provider, method, path and JSON body, with dates
+and times in the body masked so prompts that embed the current date still
+match. When one request was recorded several times (e.g. Crawl4AI task
+polls going from "pending" to "completed"), replay serves the response
+that was current at the same time offset since the first such request.
+"""
+
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import requests
+
+from stub_servers import _JSONHandler, _StubServer
+
+_DATE_RE = re.compile(
+    r"\d{4}-\d{2}-\d{2}(?:[ T]\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?)?(?: [A-Z]{2,5})?"
+)
+_DROP_REQUEST_HEADERS = {
+    "host",
+    "content-length",
+    "connection",
+    "keep-alive",
+    "accept-encoding",
+    "transfer-encoding",
+}
+
+
+def request_key(provider: str, method: str, path: str, body: bytes) -> str:
+    text = body.decode("utf-8", "replace")
+    try:
+        text = json.dumps(json.loads(text), sort_keys=True)
+    except ValueError:
+        pass
+    text = _DATE_RE.sub("<date>", text)
+    return hashlib.sha256(f"{provider} {method} {path} {text}".encode()).hexdigest()
+
+
+class Cassette:
+    """Recorded responses keyed by request_key(), persisted as JSON lines."""
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.entries: Dict[str, List[dict]] = defaultdict(list)
+        self._first_seen: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        if self.path.exists():
+            with self.path.open(encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self.entries[entry["key"]].append(entry)
+
+    def __len__(self) -> int:
+        return sum(len(v) for v in self.entries.values())
+
+    def record(self, entry: dict):
+        with self._lock:
+            now = time.monotonic()
+            first = self._first_seen.setdefault(entry["key"], now)
+            entry["offset"] = round(now - first, 3)
+            self.entries[entry["key"]].append(entry)
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with self.path.open("a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+
+    def replay(self, key: str) -> Optional[dict]:
+        with self._lock:
+            recorded = self.entries.get(key)
+            if not recorded:
+                return None
+            elapsed = time.monotonic() - self._first_seen.setdefault(
+                key, time.monotonic()
+            )
+        current = recorded[0]
+        for entry in recorded:
+            if entry["offset"] <= elapsed:
+                current = entry
+        return current
+
+
+class _ProxyHandler(_JSONHandler):
+    def do_GET(self):
+        self._proxy("GET")
+
+    def do_POST(self):
+        self._proxy("POST")
+
+    def _proxy(self, method: str):
+        self.stub.count_request()
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        status, content_type, payload = self.stub.handle(
+            method, self.path, dict(self.headers), body
+        )
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+class RecordReplayProxy(_StubServer):
+    """
+    Proxy for one provider. With `upstream` set it records, otherwise it
+    replays from the cassette, sleeping `latency` (+ up to `jitter`) seconds
+    per request, or the recorded upstream time when `recorded_latency`.
+    Unrecorded requests get a 404 and are counted in `misses`.
+    """
+
+    handler_class = _ProxyHandler
+
+    def __init__(
+        self,
+        provider: str,
+        cassette: Cassette,
+        upstream: str = "",
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        recorded_latency: bool = False,
+        **kwargs,
+    ):
+        super().__init__(**kwargs)
+        self.provider = provider
+        self.cassette = cassette
+        self.upstream = upstream.rstrip("/")
+        self.latency = latency
+        self.jitter = jitter
+        self.recorded_latency = recorded_latency
+        self.misses = 0
+        self.session = requests.Session()
+
+    def handle(
+        self, method: str, path: str, headers: dict, body: bytes
+    ) -> Tuple[int, str, bytes]:
+        key = request_key(self.provider, method, path, body)
+        if self.upstream:
+            return self._record(key, method, path, headers, body)
+
+        entry = self.cassette.replay(key)
+        if entry is None:
+            with self._lock:
+                self.misses += 1
+            message = f"no recording for {self.provider} {method} {path}"
+            return 404, "application/json", json.dumps(
+                {"error": {"message": message}}
+            ).encode("utf-8")
+        delay = entry["elapsed"] if self.recorded_latency else self.latency
+        time.sleep(delay + random.uniform(0, self.jitter))
+        return entry["status"], entry["content_type"], entry["body"].encode("utf-8")
+
+    def _record(self, key, method, path, headers, body) -> Tuple[int, str, bytes]:
+        forward = {
+            k: v for k, v in headers.items() if k.lower() not in _DROP_REQUEST_HEADERS
+        }
+        start = time.perf_counter()
+        resp = self.session.request(
+            method, self.upstream + path, headers=forward, data=body, timeout=300
+        )
+        elapsed = time.perf_counter() - start
+        content_type = resp.headers.get("Content-Type", "application/json")
+        self.cassette.record(
+            {
+                "key": key,
+                "provider": self.provider,
+                "method": method,
+                "path": path,
+                "status": resp.status_code,
+                "content_type": content_type,
+                "elapsed": round(elapsed, 3),
+                "body": resp.content.decode("utf-8", "replace"),
+            }
+        )
+        return resp.status_code, content_type, resp.content
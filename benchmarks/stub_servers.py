@@ -0,0 +1,506 @@
+"""
+Local stand-ins for the external services Plexy talks to.
+
+Each stub is a tiny threaded HTTP server that can be started in-process:
+
+    with FakeCrawl4AI() as crawl:
+        os.environ["CRAWL4AI_BASE_URL"] = crawl.base_url
+        ...
+
+They only implement the endpoints and response shapes Plexy actually uses.
+Setting `rate_limit` on a stub makes it answer 429 with a Retry-After
+header to requests beyond that many per second, like a throttled API.
+"""
+
+import base64
+import hashlib
+import json
+import math
+import re
+import socket
+import struct
+import threading
+import time
+import uuid
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class _StubServer:
+    """Runs a ThreadingHTTPServer on a free localhost port in a daemon thread."""
+
+    handler_class = BaseHTTPRequestHandler
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        handler = type("Handler", (self.handler_class,), {"stub": self})
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+        self.requests = 0
+        # Requests per second before answering 429 (0 = unlimited)
+        self.rate_limit = 0
+        self.retry_after = 1
+        self.throttled = 0
+        self._window = (0, 0)  # (second, requests in it)
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def count_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def over_rate_limit(self) -> bool:
+        with self._lock:
+            second = int(time.monotonic())
+            count = self._window[1] + 1 if self._window[0] == second else 1
+            self._window = (second, count)
+            if self.rate_limit and count > self.rate_limit:
+                self.throttled += 1
+                return True
+            return False
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class _JSONHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        # Headers and body are separate writes; without this, Nagle plus
+        # delayed ACKs add ~40ms to every keep-alive request.
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def log_message(self, format, *args):
+        pass
+
+    def _read_json(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        return json.loads(body or b"{}")
+
+    def _throttled(self) -> bool:
+        """Answer 429 if the stub is over its rate limit."""
+        if not self.stub.over_rate_limit():
+            return False
+        self._read_json()
+        body = b'{"error": {"message": "rate limit exceeded"}}'
+        self.send_response(429)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Retry-After", str(self.stub.retry_after))
+        self.end_headers()
+        self.wfile.write(body)
+        return True
+
+    def _send_json(self, payload, status: int = 200):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+##############################################################################
+# Crawl4AI
+##############################################################################
+
+
+def url_delay(url: str, default: float = 0.0) -> float:
+    """
+    Job duration for a fake crawl. Add `delay=<seconds>` to the crawled URL's
+    query string to make that page slow, e.g. https://example.com/a?delay=5
+    """
+    values = parse_qs(urlparse(url).query).get("delay")
+    return float(values[0]) if values else default
+
+
+class _Crawl4AIHandler(_JSONHandler):
+    def do_POST(self):
+        self.stub.count_request()
+        if self._throttled():
+            return
+        if self.path != "/crawl":
+            return self._send_json({"detail": "not found"}, status=404)
+        payload = self._read_json()
+        self._send_json({"task_id": self.stub.submit(payload)})
+
+    def do_GET(self):
+        self.stub.count_request()
+        if self._throttled():
+            return
+        match = re.fullmatch(r"/task/([\w-]+)", self.path)
+        if not match:
+            return self._send_json({"detail": "not found"}, status=404)
+        task = self.stub.status(match.group(1))
+        if task is None:
+            return self._send_json({"detail": "unknown task"}, status=404)
+        self._send_json(task)
+
+
+class FakeCrawl4AI(_StubServer):
+    """
+    Minimal Crawl4AI task API: POST /crawl returns a task id and
+    GET /task/{id} reports "pending" until the job's delay has elapsed.
+    URLs containing "fail" produce a failed job.
+    """
+
+    handler_class = _Crawl4AIHandler
+
+    def __init__(self, default_delay: float = 0.0, page_chars: int = 2000, **kwargs):
+        super().__init__(**kwargs)
+        self.default_delay = default_delay
+        self.page_chars = page_chars
+        self.tasks = {}
+
+    def markdown_for(self, url: str) -> str:
+        header = f"# Page for {url}\n\n"
+        filler = "Lorem ipsum dolor sit amet, consectetur adipiscing elit. "
+        return header + (filler * (self.page_chars // len(filler) + 1))[: self.page_chars]
+
+    def submit(self, payload: dict) -> str:
+        urls = payload.get("urls")
+        urls = urls if isinstance(urls, list) else [urls]
+        task_id = uuid.uuid4().hex
+        ready_at = time.monotonic() + max(url_delay(u, self.default_delay) for u in urls)
+        with self._lock:
+            self.tasks[task_id] = {"urls": urls, "ready_at": ready_at}
+        return task_id
+
+    def status(self, task_id: str):
+        with self._lock:
+            task = self.tasks.get(task_id)
+        if task is None:
+            return None
+        if time.monotonic() < task["ready_at"]:
+            return {"status": "pending"}
+        urls = task["urls"]
+        if any("fail" in u for u in urls):
+            return {"status": "failed", "error": "simulated failure"}
+        results = [{"url": u, "markdown": self.markdown_for(u)} for u in urls]
+        if len(results) == 1:
+            return {"status": "completed", "result": results[0]}
+        return {"status": "completed", "results": results}
+
+
+##############################################################################
+# Tavily
+##############################################################################
+
+
+class _TavilyHandler(_JSONHandler):
+    def do_POST(self):
+        self.stub.count_request()
+        if self._throttled():
+            return
+        if self.path != "/search":
+            return self._send_json({"detail": "not found"}, status=404)
+        payload = self._read_json()
+        time.sleep(self.stub.delay)
+        self._send_json(
+            {
+                "query": payload.get("query", ""),
+                "results": self.stub.results_for(
+                    payload.get("query", ""), int(payload.get("max_results", 5))
+                ),
+            }
+        )
+
+
+class FakeTavily(_StubServer):
+    """
+    Tavily POST /search with deterministic results for each query: every
+    third result only has a short snippet (so it gets crawled), and every
+    fifth is a www. variant of the previous URL (so it gets deduplicated).
+    """
+
+    handler_class = _TavilyHandler
+
+    def __init__(self, delay: float = 0.0, page_chars: int = 3000, **kwargs):
+        super().__init__(**kwargs)
+        self.delay = delay
+        self.page_chars = page_chars
+
+    def results_for(self, query: str, max_results: int) -> list:
+        slug = re.sub(r"\W+", "-", query.lower()).strip("-")[:40] or "q"
+        sentence = f"{query} is discussed in this article in some detail. "
+        results = []
+        for i in range(max_results):
+            url = f"https://site{i % 7}.example.com/{slug}-{i}"
+            if i % 5 == 4:
+                url = results[-1]["url"].replace("https://", "https://www.")
+            short = i % 3 == 0
+            results.append(
+                {
+                    "title": f"{query} ({i})",
+                    "url": url,
+                    "content": f"{query}: result {i}.",
+                    "raw_content": None
+                    if short
+                    else (f"Result {i}. " + sentence * 200)[: self.page_chars],
+                    "score": round(0.95 - 0.01 * i, 3),
+                }
+            )
+        return results
+
+
+##############################################################################
+# Cohere rerank
+##############################################################################
+
+
+class _CohereHandler(_JSONHandler):
+    def do_POST(self):
+        self.stub.count_request()
+        if self._throttled():
+            return
+        if not self.path.endswith("/rerank"):
+            return self._send_json({"message": "not found"}, status=404)
+        payload = self._read_json()
+        time.sleep(self.stub.delay)
+        self._send_json(
+            {
+                "id": uuid.uuid4().hex,
+                "results": self.stub.rank(
+                    payload.get("query", ""),
+                    payload.get("documents", []),
+                    payload.get("top_n"),
+                ),
+                "meta": {"billed_units": {"search_units": 1}},
+            }
+        )
+
+
+class FakeCohere(_StubServer):
+    """
+    Cohere POST /v1/rerank scoring documents by query-word overlap. Point
+    COHERE_BASE_URL at stub.base_url.
+    """
+
+    handler_class = _CohereHandler
+
+    def __init__(self, delay: float = 0.0, **kwargs):
+        super().__init__(**kwargs)
+        self.delay = delay
+
+    @staticmethod
+    def rank(query: str, documents: list, top_n=None) -> list:
+        words = set(re.findall(r"\w+", query.lower()))
+        scored = []
+        for index, doc in enumerate(documents):
+            text = doc if isinstance(doc, str) else doc.get("text", "")
+            doc_words = re.findall(r"\w+", text.lower())
+            overlap = sum(1 for w in doc_words if w in words)
+            scored.append((overlap / (len(doc_words) + 1), index))
+        scored.sort(key=lambda x: (-x[0], x[1]))
+        top_n = top_n or len(scored)
+        return [
+            {"index": index, "relevance_score": round(min(1.0, score * 5), 4)}
+            for score, index in scored[:top_n]
+        ]
+
+
+##############################################################################
+# OpenAI-compatible chat completions
+##############################################################################
+
+
+def default_decision(messages: list) -> dict:
+    """
+    Search once with the user's question, then answer citing the first
+    reference.
+    """
+    question = next(
+        (m["content"] for m in reversed(messages) if m.get("role") == "user"), ""
+    )
+    if not any(m.get("role") == "tool" for m in messages):
+        return {
+            "action": "search",
+            "search_queries": [question],
+            "scratchpad": None,
+            "message": None,
+        }
+    answer = (
+        f"Here is what the sources say about {question!r} [1]. "
+        + "More detail follows in this sentence. " * 20
+        + "\n\nReferences:\n[1] https://example.com/source1"
+    )
+    return {
+        "action": "answer",
+        "search_queries": [],
+        "scratchpad": None,
+        "message": answer,
+    }
+
+
+def fake_embedding(text: str, dims: int = 256) -> list:
+    """Unit-length hashed bag of words, so reworded questions land nearby."""
+    vector = [0.0] * dims
+    for word in re.findall(r"[a-z0-9]+", text.lower()):
+        vector[zlib.crc32(word.encode("utf-8")) % dims] += 1.0
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+
+class _OpenAIHandler(_JSONHandler):
+    def do_POST(self):
+        self.stub.count_request()
+        if self._throttled():
+            return
+        if self.path.endswith("/embeddings"):
+            return self._embeddings(self._read_json())
+        if not self.path.endswith("/chat/completions"):
+            return self._send_json({"error": {"message": "not found"}}, status=404)
+        payload = self._read_json()
+        content = json.dumps(self.stub.responder(payload.get("messages", [])))
+        time.sleep(self.stub.first_token_delay)
+        if payload.get("stream"):
+            return self._stream(payload, content)
+        time.sleep(self.stub.token_delay * len(self.stub.tokenize(content)))
+        self._send_json(
+            {
+                "id": "chatcmpl-stub",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": payload.get("model", "stub"),
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {"role": "assistant", "content": content},
+                        "finish_reason": "stop",
+                    }
+                ],
+                "usage": self.stub.usage(payload, content),
+            }
+        )
+
+    def _embeddings(self, payload: dict):
+        inputs = payload.get("input", "")
+        inputs = [inputs] if isinstance(inputs, str) else inputs
+        data = []
+        for i, text in enumerate(inputs):
+            vector = fake_embedding(text)
+            if payload.get("encoding_format") == "base64":
+                vector = base64.b64encode(
+                    struct.pack(f"{len(vector)}f", *vector)
+                ).decode("ascii")
+            data.append({"object": "embedding", "index": i, "embedding": vector})
+        tokens = sum(len(self.stub.tokenize(text)) for text in inputs)
+        self._send_json(
+            {
+                "object": "list",
+                "data": data,
+                "model": payload.get("model", "stub"),
+                "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+            }
+        )
+
+    def _stream(self, payload: dict, content: str):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        def chunk(delta: dict, finish_reason=None, usage=None):
+            body = {
+                "id": "chatcmpl-stub",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": payload.get("model", "stub"),
+                "choices": [
+                    {"index": 0, "delta": delta, "finish_reason": finish_reason}
+                ],
+            }
+            if usage:
+                body["usage"] = usage
+            self.wfile.write(f"data: {json.dumps(body)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        chunk({"role": "assistant", "content": ""})
+        for token in self.stub.tokenize(content):
+            chunk({"content": token})
+            time.sleep(self.stub.token_delay)
+        chunk({}, finish_reason="stop", usage=self.stub.usage(payload, content))
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+
+class FakeOpenAI(_StubServer):
+    """
+    OpenAI-compatible /v1/chat/completions (plain and streamed) that answers
+    with Decision JSON from `responder(messages)`, at a configurable
+    time-to-first-token and per-token delay, plus /v1/embeddings
+    (fake_embedding) without delay. Point OPENAI_BASE_URL at
+    f"{stub.base_url}/v1".
+
+    Usage reports cached prompt tokens the way OpenAI's prompt caching
+    does: for prompts of PROMPT_CACHE_MIN_TOKENS or more, the leading
+    messages already seen in an earlier prompt, in 128-token increments.
+    """
+
+    PROMPT_CACHE_MIN_TOKENS = 1024
+
+    handler_class = _OpenAIHandler
+
+    def __init__(
+        self,
+        responder=default_decision,
+        first_token_delay: float = 0.3,
+        token_delay: float = 0.01,
+        **kwargs,
+    ):
+        super().__init__(**kwargs)
+        self.responder = responder
+        self.first_token_delay = first_token_delay
+        self.token_delay = token_delay
+        self.prompt_prefixes = set()  # digests of every message prefix seen
+
+    @staticmethod
+    def tokenize(text: str) -> list:
+        return [text[i : i + 4] for i in range(0, len(text), 4)]
+
+    def usage(self, payload: dict, content: str) -> dict:
+        prompt_chars = cached_chars = 0
+        digest = hashlib.sha256()
+        prefixes = []
+        for message in payload["messages"]:
+            digest.update(json.dumps(message, sort_keys=True).encode("utf-8"))
+            prompt_chars += len(str(message.get("content") or ""))
+            prefixes.append(digest.hexdigest())
+            with self._lock:
+                if prefixes[-1] in self.prompt_prefixes:
+                    cached_chars = prompt_chars
+        with self._lock:
+            self.prompt_prefixes.update(prefixes)
+        prompt_tokens = prompt_chars // 4
+        cached_tokens = cached_chars // 4 // 128 * 128
+        if prompt_tokens < self.PROMPT_CACHE_MIN_TOKENS:
+            cached_tokens = 0
+        completion_tokens = len(self.tokenize(content))
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "prompt_tokens_details": {"cached_tokens": cached_tokens},
+        }
@@ -0,0 +1,201 @@
+"""
+Batch mode (`plexy batch`): answers every question in a JSONL file with a
+pool of workers and appends one JSON line per question to an output file
+as soon as it is answered.
+
+All workers share the process-wide API clients and caches, so identical
+Tavily queries across the batch are searched once (and concurrent ones
+share a request), and a page being crawled for one question is not
+crawled again for another.
+
+Output lines hold the question's id, the final answer, its status and
+per-stage timings. Re-running with the same output file skips the ids
+already answered, so a crashed or interrupted batch resumes where it
+stopped; questions that failed are retried.
+"""
+
+import concurrent.futures
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from typing import Callable, Iterator, Optional, Set, Tuple
+
+from core import tracing
+from core.logger import log
+
+QUESTION_FIELDS = ("question", "query", "prompt", "title")
+ID_FIELDS = ("id", "request_id", "question_id")
+
+
+def read_questions(
+    path: str, field: str = "", id_field: str = ""
+) -> Iterator[Tuple[str, str]]:
+    """
+    (id, question) for each line of a JSONL file. The question comes from
+    `field` or the first of QUESTION_FIELDS present, the id from `id_field`
+    or the first of ID_FIELDS, falling back to the line number.
+    """
+    with open(path, encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                log(f"{path}:{number}: not valid JSON, skipped", error=True)
+                continue
+            if isinstance(row, str):
+                row = {"question": row}
+            if not isinstance(row, dict):
+                log(f"{path}:{number}: not a JSON object, skipped", error=True)
+                continue
+            fields = (field,) if field else QUESTION_FIELDS
+            question = next((str(row[k]) for k in fields if row.get(k)), "")
+            if not question.strip():
+                log(f"{path}:{number}: no question found, skipped", error=True)
+                continue
+            ids = (id_field,) if id_field else ID_FIELDS
+            qid = next((str(row[k]) for k in ids if row.get(k)), f"line-{number}")
+            yield qid, question.strip()
+
+
+def answered_ids(path: str) -> Set[str]:
+    """Ids with an "ok" result in an earlier run's output, for resuming."""
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                row = json.loads(line)
+            except ValueError:
+                # A line cut short by a crash.
+                continue
+            if not isinstance(row, dict) or not isinstance(row.get("id"), str):
+                continue
+            if row.get("status") == "ok":
+                done.add(row["id"])
+    return done
+
+
+def _drop_partial_line(path: str):
+    """Cut off a last line left unfinished by a crash, so appends start clean."""
+    if not os.path.exists(path):
+        return
+    with open(path, "rb+") as f:
+        data = f.read()
+        if data and not data.endswith(b"\n"):
+            f.truncate(data.rfind(b"\n") + 1)
+
+
+def answer_question(agent, qid: str, question: str) -> dict:
+    """Run the pipeline for one question and summarize its trace."""
+    start = time.perf_counter()
+    error = None
+    with tracing.span("batch_question", id=qid) as root:
+        try:
+            for _ in agent.run_pipeline(question):
+                pass
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+    stages = defaultdict(float)
+    for span in root.trace:
+        if span is not root:
+            stages[span.name] += span.duration * 1000
+    answer = agent.last_answer
+    return {
+        "id": qid,
+        "question": question,
+        "status": "error" if error or not answer else "ok",
+        "answer": answer,
+        "error": error or (None if answer else "no answer produced"),
+        "elapsed_ms": round((time.perf_counter() - start) * 1000, 1),
+        "stages_ms": {k: round(v, 1) for k, v in sorted(stages.items())},
+    }
+
+
+def run_batch(
+    input_path: str,
+    output_path: str,
+    agent_factory: Callable,
+    workers: int = 8,
+    resume: bool = True,
+    limit: int = 0,
+    field: str = "",
+    id_field: str = "",
+    progress_every: int = 10,
+) -> dict:
+    """
+    Answer the questions in input_path, appending results to output_path.
+    Returns counts of answered, failed and skipped questions.
+    """
+    done = answered_ids(output_path) if resume else set()
+    if resume:
+        _drop_partial_line(output_path)
+    mode = "a" if resume else "w"
+    counts = {"ok": 0, "error": 0, "skipped": 0}
+    lock = threading.Lock()
+    # Bounds questions read ahead of the workers, so huge inputs stream.
+    slots = threading.BoundedSemaphore(workers * 2)
+    start = time.monotonic()
+
+    def work(qid: str, question: str) -> dict:
+        try:
+            return answer_question(agent_factory(), qid, question)
+        finally:
+            slots.release()
+
+    def write(out, result: dict):
+        with lock:
+            out.write(json.dumps(result, ensure_ascii=False) + "\n")
+            out.flush()
+            counts[result["status"]] += 1
+            finished = counts["ok"] + counts["error"]
+        if result["status"] == "error":
+            log(f"{result['id']}: {result['error']}", error=True)
+        if progress_every and finished % progress_every == 0:
+            elapsed = time.monotonic() - start
+            log(
+                f"{finished} answered ({counts['error']} failed) in "
+                f"{elapsed:.0f}s, {finished / elapsed:.2f}/s"
+            )
+
+    with open(output_path, mode, encoding="utf-8") as out:
+        with concurrent.futures.ThreadPoolExecutor(
+            workers, thread_name_prefix="plexy-batch"
+        ) as pool:
+            futures = set()
+            submitted = set()
+            for qid, question in read_questions(input_path, field, id_field):
+                if qid in done or qid in submitted:
+                    counts["skipped"] += 1
+                    continue
+                if limit and len(submitted) >= limit:
+                    break
+                submitted.add(qid)
+                slots.acquire()
+                futures.add(pool.submit(work, qid, question))
+                finished = {f for f in futures if f.done()}
+                for future in finished:
+                    write(out, future.result())
+                futures -= finished
+            for future in concurrent.futures.as_completed(futures):
+                write(out, future.result())
+        os.fsync(out.fileno())
+
+    counts["elapsed_sec"] = round(time.monotonic() - start, 1)
+    return counts
+
+
+def report(counts: dict, output_path: Optional[str] = None):
+    answered = counts["ok"] + counts["error"]
+    rate = answered / counts["elapsed_sec"] if counts["elapsed_sec"] else 0.0
+    log(
+        f"Batch done: {counts['ok']} answered, {counts['error']} failed, "
+        f"{counts['skipped']} skipped (already answered) in "
+        f"{counts['elapsed_sec']}s ({rate:.2f}/s)"
+        + (f"; results in {output_path}" if output_path else "")
+    )
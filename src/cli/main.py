@@ -1,33 +1,144 @@
 import click
 import sys
+import threading
 from rich.console import Console
-from core.agent import Agent
+from core import tracing
+from core.config import ANSWER_CACHE
 from core.logger import log
 
 
 console = Console()
 
 
-@click.command()
+class AgentLoader:
+    """
+    Builds the Agent on a background thread, so the prompt shows up while
+    the pipeline modules and API clients (openai in particular) load.
+    """
+
+    def __init__(self, **agent_kwargs):
+        self.agent = None
+        self.error = None
+        self._thread = threading.Thread(
+            target=self._load, args=(agent_kwargs,), daemon=True
+        )
+        self._thread.start()
+
+    def _load(self, agent_kwargs: dict):
+        try:
+            from core.agent import Agent
+            from core.clients import cohere_client, http_session, openai_client
+
+            self.agent = Agent(**agent_kwargs)
+            openai_client()
+            cohere_client()
+            http_session()
+        except Exception as e:
+            self.error = e
+
+    def get(self):
+        self._thread.join()
+        if self.error is not None:
+            raise self.error
+        return self.agent
+
+
+@click.group(invoke_without_command=True)
 @click.option("--model", default="openai", help="Model provider (default: openai)")
 @click.option("--tool-dir", default="", help="Path to a folder with extra tools")
 @click.option("--debug", is_flag=True, help="Enable debug prints")
 @click.option(
     "--max-iters", default=2, help="Max decision iterations before forced answer"
 )
-def plexy(model: str, tool_dir: str, debug: bool, max_iters: int):
+@click.option(
+    "--stream", is_flag=True, help="Stream answers token by token as they arrive"
+)
+@click.option(
+    "--context-budget",
+    default=6000,
+    help="Token budget for search references per question (default: 6000)",
+)
+@click.option(
+    "--history-budget",
+    default=8000,
+    help="Token ceiling for the conversation carried into follow-up questions; "
+    "0 keeps everything (default: 8000)",
+)
+@click.option(
+    "--speculative",
+    is_flag=True,
+    help="Search a session's first question as typed while the first decision "
+    "is being made",
+)
+@click.option(
+    "--fast-path",
+    is_flag=True,
+    help="Skip decision LLM calls when searching or answering is the obvious step",
+)
+@click.option(
+    "--answer-cache",
+    is_flag=True,
+    help="Answer a session's first question from the semantic answer cache "
+    "when a similar one was answered recently",
+)
+@click.option(
+    "--trace-file",
+    default="",
+    help="Append a trace of each question's pipeline steps to this file",
+)
+@click.option(
+    "--trace-format",
+    type=click.Choice(["jsonl", "otlp"]),
+    default="jsonl",
+    help="Trace file format: one span per line, or OTLP/JSON (default: jsonl)",
+)
+@click.pass_context
+def plexy(
+    ctx: click.Context,
+    model: str,
+    tool_dir: str,
+    debug: bool,
+    max_iters: int,
+    stream: bool,
+    context_budget: int,
+    history_budget: int,
+    speculative: bool,
+    fast_path: bool,
+    answer_cache: bool,
+    trace_file: str,
+    trace_format: str,
+):
     """
     Plexy - A CLI-based AI assistant that uses an iterative pipeline approach.
+
+    Without a command, starts an interactive session. The options also apply
+    to `plexy serve` and `plexy batch`.
     """
     if debug:
         log("[DEBUG] Debug mode enabled")
 
+    if trace_file:
+        tracing.configure(trace_file, trace_format)
+
+    ctx.obj = dict(
+        model_provider=model,
+        tool_dir=tool_dir,
+        debug=debug,
+        max_iters=max_iters,
+        stream_answers=stream,
+        context_budget=context_budget,
+        history_budget=history_budget,
+        speculative=speculative,
+        fast_path=fast_path,
+        use_answer_cache=ANSWER_CACHE or answer_cache,
+    )
+    if ctx.invoked_subcommand is not None:
+        return
+
     log("Starting Plexy...")
     log("Type your question or type 'exit' to quit.")
 
-    agent = Agent(
-        model_provider=model, tool_dir=tool_dir, debug=debug, max_iters=max_iters
-    )
+    loader = AgentLoader(**ctx.obj)
 
     while True:
         try:
@@ -37,12 +148,13 @@ def plexy(model: str, tool_dir: str, debug: bool, max_iters: int):
             if user_input.lower() in ("exit", "q", "quit"):
                 break
 
+            agent = loader.get()
             console.print("[bold cyan]\nPlexy says:[/bold cyan]")
             for chunk in agent.run_pipeline(user_input):
                 sys.stdout.write(chunk)
                 sys.stdout.flush()
 
-        except KeyboardInterrupt:
+        except (KeyboardInterrupt, EOFError):
             break
         except Exception as e:
             log(f"Error: {str(e)}", error=True)
@@ -50,5 +162,127 @@ def plexy(model: str, tool_dir: str, debug: bool, max_iters: int):
     log("Goodbye!")
 
 
+@plexy.command()
+@click.option("--host", default="127.0.0.1", help="Address to listen on")
+@click.option("--port", default=8000, help="Port to listen on (default: 8000)")
+@click.option("--workers", default=8, help="Questions answered at once (default: 8)")
+@click.option(
+    "--queue-size",
+    default=32,
+    help="Requests that may wait for a worker before new ones get 503",
+)
+@click.option(
+    "--queue-timeout",
+    default=30.0,
+    help="Seconds a request may wait for a worker (default: 30)",
+)
+@click.option(
+    "--session-ttl",
+    default=1800.0,
+    help="Seconds an idle session's conversation is kept (default: 1800)",
+)
+@click.option("--max-sessions", default=1000, help="Sessions kept at most")
+@click.pass_obj
+def serve(
+    agent_kwargs: dict,
+    host: str,
+    port: int,
+    workers: int,
+    queue_size: int,
+    queue_timeout: float,
+    session_ttl: float,
+    max_sessions: int,
+):
+    """
+    Serve the pipeline over HTTP, streaming answers as Server-Sent Events.
+    """
+    from core.agent import Agent
+    from cli.server import PlexyServer
+
+    # Answers stream token by token as plain Markdown.
+    agent_kwargs = dict(agent_kwargs, stream_answers=True, render_markdown=False)
+    server = PlexyServer(
+        (host, port),
+        lambda: Agent(**agent_kwargs),
+        workers=workers,
+        queue_size=queue_size,
+        queue_timeout_sec=queue_timeout,
+        session_ttl_sec=session_ttl,
+        max_sessions=max_sessions,
+        debug=agent_kwargs["debug"],
+    )
+    log(
+        f"Serving on http://{host}:{server.server_port} "
+        f"({workers} workers, queue of {queue_size})"
+    )
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    log("Goodbye!")
+
+
+@plexy.command()
+@click.argument("input_path", type=click.Path(exists=True, dir_okay=False))
+@click.option(
+    "-o",
+    "--output",
+    required=True,
+    type=click.Path(dir_okay=False),
+    help="JSONL file answers are appended to",
+)
+@click.option("--workers", default=8, help="Questions answered at once (default: 8)")
+@click.option(
+    "--overwrite",
+    is_flag=True,
+    help="Start over instead of skipping questions already in the output",
+)
+@click.option("--limit", default=0, help="Answer at most this many questions")
+@click.option("--field", default="", help="Input field holding the question")
+@click.option("--id-field", default="", help="Input field holding the question id")
+@click.pass_obj
+def batch(
+    agent_kwargs: dict,
+    input_path: str,
+    output: str,
+    workers: int,
+    overwrite: bool,
+    limit: int,
+    field: str,
+    id_field: str,
+):
+    """
+    Answer every question in a JSONL file, appending results to OUTPUT.
+    """
+    from core.agent import Agent
+    from core.tool_registry import ToolRegistry
+    from cli.batch import report, run_batch
+
+    # Each question is a fresh conversation; only the final text is kept.
+    agent_kwargs = dict(
+        agent_kwargs,
+        stream_answers=False,
+        render_markdown=False,
+        tool_registry=ToolRegistry(agent_kwargs["tool_dir"]),
+    )
+    try:
+        counts = run_batch(
+            input_path,
+            output,
+            lambda: Agent(**agent_kwargs),
+            workers=workers,
+            resume=not overwrite,
+            limit=limit,
+            field=field,
+            id_field=id_field,
+        )
+    except KeyboardInterrupt:
+        log(f"Interrupted; run the same command again to resume into {output}")
+        sys.exit(130)
+    report(counts, output)
+
+
 if __name__ == "__main__":
     plexy()
@@ -0,0 +1,362 @@
+"""
+HTTP server mode (`plexy serve`): runs the pipeline for many users at once
+and streams answers as Server-Sent Events.
+
+    POST /v1/ask        {"question": "...", "session_id": "..." (optional),
+                         "stream": true (default)}
+    DELETE /v1/sessions/<session_id>
+    GET /healthz, GET /metrics
+
+/v1/ask streams `session` (the session id to send with follow-ups), then
+`chunk` events with answer text, then `done` (or `error`). With
+"stream": false it returns the whole answer as JSON instead.
+
+Each session keeps its own Agent, so follow-up questions see the earlier
+conversation; idle sessions expire. At most `workers` pipelines run at
+once, and up to `queue_size` more requests wait for a worker for at most
+`queue_timeout_sec`; anything beyond that is turned away with 503 and a
+Retry-After header instead of piling up. Chunks are written as they are
+produced, so a slow reader slows its own pipeline down rather than
+buffering its answer in memory, and a client that stops reading for
+`write_timeout_sec` is disconnected.
+"""
+
+import json
+import secrets
+import sys
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Optional
+
+from core.logger import log
+from core.ratelimit import limiter_metrics
+
+
+class Overloaded(Exception):
+    """The request queue is full, or the wait for a worker timed out."""
+
+
+class AdmissionController:
+    """
+    Bounded concurrency with a bounded wait queue: acquire() returns once
+    one of `workers` slots is free, or raises Overloaded if `queue_size`
+    requests are already waiting or no slot frees up in `timeout_sec`.
+    """
+
+    def __init__(self, workers: int, queue_size: int, timeout_sec: float):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.timeout_sec = timeout_sec
+        self._slots = threading.BoundedSemaphore(workers)
+        self._lock = threading.Lock()
+        self.active = 0
+        self.queued = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.queue_wait_sec = 0.0
+
+    def acquire(self):
+        with self._lock:
+            if self._slots.acquire(blocking=False):
+                self.active += 1
+                self.admitted += 1
+                return
+            if self.queued >= self.queue_size:
+                self.rejected += 1
+                raise Overloaded("request queue is full")
+            self.queued += 1
+        start = time.monotonic()
+        acquired = self._slots.acquire(timeout=self.timeout_sec)
+        with self._lock:
+            self.queued -= 1
+            self.queue_wait_sec += time.monotonic() - start
+            if not acquired:
+                self.timed_out += 1
+                raise Overloaded("timed out waiting for a worker")
+            self.active += 1
+            self.admitted += 1
+
+    def release(self):
+        with self._lock:
+            self.active -= 1
+        self._slots.release()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "active": self.active,
+                "queued": self.queued,
+                "admitted": self.admitted,
+                "rejected": self.rejected,
+                "timed_out": self.timed_out,
+                "queue_wait_sec": round(self.queue_wait_sec, 3),
+            }
+
+
+class SessionStore:
+    """
+    Agents by session id, least recently used first. Sessions idle for
+    `ttl_sec` expire, and the oldest idle ones are evicted beyond
+    `max_sessions`. A session runs one question at a time.
+    """
+
+    def __init__(self, agent_factory: Callable, ttl_sec: float, max_sessions: int):
+        self.agent_factory = agent_factory
+        self.ttl_sec = ttl_sec
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[str, dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.created = 0
+        self.expired = 0
+
+    def checkout(self, session_id: Optional[str]):
+        """
+        (session_id, agent) for a new or existing session, marked busy until
+        checkin(). Returns (session_id, None) if the session is busy.
+        """
+        with self._lock:
+            self._expire()
+            session = self._sessions.get(session_id) if session_id else None
+            if session is None:
+                session_id = session_id or secrets.token_urlsafe(12)
+                session = {"agent": None, "busy": False, "last_used": 0.0}
+                self._sessions[session_id] = session
+                self.created += 1
+            if session["busy"]:
+                return session_id, None
+            session["busy"] = True
+            session["last_used"] = time.monotonic()
+            self._sessions.move_to_end(session_id)
+        if session["agent"] is None:
+            # Built outside the lock; only this request can see the session.
+            try:
+                session["agent"] = self.agent_factory()
+            except BaseException:
+                # Don't leave a session without an agent marked busy forever.
+                with self._lock:
+                    self._sessions.pop(session_id, None)
+                raise
+        return session_id, session["agent"]
+
+    def checkin(self, session_id: str):
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is not None:
+                session["busy"] = False
+                session["last_used"] = time.monotonic()
+
+    def delete(self, session_id: str) -> bool:
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def _expire(self):
+        now = time.monotonic()
+        for session_id in list(self._sessions):
+            session = self._sessions[session_id]
+            too_many = len(self._sessions) > self.max_sessions
+            if session["busy"]:
+                continue
+            if too_many or now - session["last_used"] > self.ttl_sec:
+                del self._sessions[session_id]
+                self.expired += 1
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._sessions)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: "PlexyServer"
+
+    def log_message(self, format, *args):
+        if self.server.debug:
+            log(f"[DEBUG] {self.address_string()} {format % args}")
+
+    def _send_json(self, payload: dict, status: int = 200, headers: dict = None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/healthz":
+            return self._send_json(
+                {"status": "ok", **self.server.admission.snapshot()}
+            )
+        if self.path == "/metrics":
+            return self._send_json(self.server.metrics())
+        self._send_json({"error": "not found"}, status=404)
+
+    def do_DELETE(self):
+        prefix = "/v1/sessions/"
+        if self.path.startswith(prefix):
+            found = self.server.sessions.delete(self.path[len(prefix) :])
+            return self._send_json({"deleted": found}, status=200 if found else 404)
+        self._send_json({"error": "not found"}, status=404)
+
+    def do_POST(self):
+        if self.path != "/v1/ask":
+            return self._send_json({"error": "not found"}, status=404)
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            payload = json.loads(self.rfile.read(length) or b"{}")
+            question = str(payload["question"]).strip()
+        except (ValueError, KeyError, TypeError):
+            return self._send_json(
+                {"error": 'expected a JSON body with a "question"'}, status=400
+            )
+        if not question:
+            return self._send_json({"error": "empty question"}, status=400)
+
+        server = self.server
+        try:
+            server.admission.acquire()
+        except Overloaded as e:
+            return self._send_json(
+                {"error": f"server busy: {e}"},
+                status=503,
+                headers={"Retry-After": str(server.retry_after_sec)},
+            )
+        try:
+            try:
+                session_id, agent = server.sessions.checkout(payload.get("session_id"))
+            except Exception as e:
+                server.count("errors")
+                log(f"Could not create an agent: {e}", error=True)
+                return self._send_json({"error": f"could not create agent: {e}"}, 500)
+            if agent is None:
+                return self._send_json(
+                    {"error": "session is busy with another question"}, status=409
+                )
+            try:
+                if payload.get("stream", True):
+                    self._stream_answer(agent, session_id, question)
+                else:
+                    self._json_answer(agent, session_id, question)
+            finally:
+                server.sessions.checkin(session_id)
+        finally:
+            server.admission.release()
+
+    def _json_answer(self, agent, session_id: str, question: str):
+        start = time.monotonic()
+        try:
+            answer = "".join(agent.run_pipeline(question))
+        except Exception as e:
+            self.server.count("errors")
+            log(f"Pipeline error: {e}", error=True)
+            return self._send_json({"session_id": session_id, "error": str(e)}, 500)
+        self.server.count("completed")
+        self._send_json(
+            {
+                "session_id": session_id,
+                "answer": answer,
+                "elapsed_ms": round((time.monotonic() - start) * 1000, 1),
+            }
+        )
+
+    def _event(self, event: str, data: dict):
+        message = f"event: {event}\ndata: {json.dumps(data)}\n\n".encode("utf-8")
+        # Chunked framing keeps the connection reusable after the stream.
+        self.wfile.write(f"{len(message):x}\r\n".encode("ascii") + message + b"\r\n")
+        self.wfile.flush()
+
+    def _stream_answer(self, agent, session_id: str, question: str):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        self.connection.settimeout(self.server.write_timeout_sec)
+
+        start = time.monotonic()
+        chunks = agent.run_pipeline(question)
+        try:
+            self._event("session", {"session_id": session_id})
+            for text in chunks:
+                self._event("chunk", {"text": text})
+            self._event(
+                "done", {"elapsed_ms": round((time.monotonic() - start) * 1000, 1)}
+            )
+            self.server.count("completed")
+        except OSError:
+            # Client went away or stopped reading: stop the pipeline.
+            self.server.count("disconnected")
+            self.close_connection = True
+            return
+        except Exception as e:
+            self.server.count("errors")
+            log(f"Pipeline error: {e}", error=True)
+            try:
+                self._event("error", {"error": str(e)})
+            except OSError:
+                self.close_connection = True
+                return
+        finally:
+            chunks.close()
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+
+class PlexyServer(ThreadingHTTPServer):
+    """ThreadingHTTPServer with the session store and admission control."""
+
+    daemon_threads = True
+    # Connections waiting in accept() beyond the request queue
+    request_queue_size = 128
+
+    def __init__(
+        self,
+        address,
+        agent_factory: Callable,
+        workers: int = 8,
+        queue_size: int = 32,
+        queue_timeout_sec: float = 30.0,
+        session_ttl_sec: float = 1800.0,
+        max_sessions: int = 1000,
+        write_timeout_sec: float = 30.0,
+        debug: bool = False,
+    ):
+        super().__init__(address, _Handler)
+        self.admission = AdmissionController(workers, queue_size, queue_timeout_sec)
+        self.sessions = SessionStore(agent_factory, session_ttl_sec, max_sessions)
+        self.write_timeout_sec = write_timeout_sec
+        self.retry_after_sec = max(1, int(queue_timeout_sec / 4))
+        self.debug = debug
+        self._lock = threading.Lock()
+        self.counters = {"completed": 0, "errors": 0, "disconnected": 0}
+
+    def handle_error(self, request, client_address):
+        # Clients dropping idle keep-alive connections is routine under load.
+        if isinstance(sys.exc_info()[1], ConnectionError):
+            return
+        super().handle_error(request, client_address)
+
+    def count(self, name: str):
+        with self._lock:
+            self.counters[name] += 1
+
+    def metrics(self) -> dict:
+        # Loaded with the first Agent
+        from tools.pipeline_helpers import prompt_cache_stats
+
+        with self._lock:
+            counters = dict(self.counters)
+        return {
+            **counters,
+            **self.admission.snapshot(),
+            "sessions": len(self.sessions),
+            "sessions_created": self.sessions.created,
+            "sessions_expired": self.sessions.expired,
+            "providers": limiter_metrics(),
+            "prompt_cache": prompt_cache_stats.snapshot(),
+        }
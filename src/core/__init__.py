@@ -1,7 +1,5 @@
-from .agent import Agent
 from .logger import log
 from .config import OPENAI_API_KEY, TAVILY_API_KEY, REDIS_HOST, REDIS_PORT, REDIS_DB
-from .tool_registry import ToolRegistry
 
 __all__ = [
     "Agent",
@@ -13,3 +11,17 @@ __all__ = [
     "REDIS_PORT",
     "REDIS_DB",
 ]
+
+
+def __getattr__(name):
+    # Agent and ToolRegistry pull in the whole pipeline (which itself imports
+    # core.config), so they are imported on first access to avoid a cycle.
+    if name == "Agent":
+        from .agent import Agent
+
+        return Agent
+    if name == "ToolRegistry":
+        from .tool_registry import ToolRegistry
+
+        return ToolRegistry
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,33 +1,57 @@
 import json
 import sys
-from typing import Dict, List
+import time
+from typing import Collection, Dict, List, Optional
 from rich.console import Console
 from rich.markdown import Markdown
 from datetime import datetime
 from zoneinfo import ZoneInfo
 
+from . import tracing
 from .logger import log
 from .tool_registry import ToolRegistry
 from .decision import Decision
+from .answer_cache import answer_cache
+from .config import ANSWER_CACHE, PROMPT_TIME_BUCKET_SEC
+from .ratelimit import limiter_metrics
+from .router import needs_search, references_cover
+from .compaction import cited_numbers, prompt_tokens, reduce_turn, split_turns
 
 # import your pipeline helpers
 from tools.pipeline_helpers import (
-    tavily_in_parallel,
-    enrich_docs_with_cache,
+    streaming_search,
     deduplicate_docs,
-    cohere_rerank,
     call_decision_llm,
+    stream_decision_llm,
+    page_cache,
+    prompt_cache_stats,
+    search_cache,
+    speculation_stats,
+    SpeculativeSearch,
 )
+from tools.context_builder import ReferencePacker
 
 console = Console()
 
+FORCE_FINAL_MESSAGE = {
+    "role": "user",
+    "content": (
+        "Please now provide your final answer with inline citations [1], [2], etc., referencing only the references above, "
+        "and end with a 'References' section."
+    ),
+}
+
 
 class Agent:
     """
     Agent that calls the decision LLM repeatedly.
-    We keep exactly ONE system message in self.conversation[0].
-    After a 'search', we append references to that single system message
-    so the model is forced to produce inline citations if it decides to answer.
+    We keep exactly ONE system message in self.conversation[0], and never
+    change it: together with the earlier turns it is a byte-stable prompt
+    prefix the provider can serve from its prompt cache. After a 'search',
+    the new references go in the tool result, so the model is forced to
+    produce inline citations if it decides to answer.
+    Before each follow-up question the conversation is compacted to fit
+    history_budget tokens (see core.compaction).
     """
 
     def __init__(
@@ -36,18 +60,55 @@ class Agent:
         tool_dir: str = "",
         debug: bool = False,
         max_iters: int = 2,
+        stream_answers: bool = False,
+        context_budget: int = 6000,
+        speculative: bool = False,
+        use_answer_cache: bool = ANSWER_CACHE,
+        render_markdown: bool = True,
+        tool_registry: Optional[ToolRegistry] = None,
+        fast_path: bool = False,
+        history_budget: int = 8000,
     ):
-        self.tool_registry = ToolRegistry(tool_dir)
+        # Agents may share one registry (and its tool executors and cache)
+        self.tool_registry = tool_registry or ToolRegistry(tool_dir)
         self.conversation: List[Dict] = []
 
         self.debug = debug
         self.max_iters = max_iters
+        # Stream answer tokens as they are generated instead of rendering
+        # the finished markdown (sync pipeline only)
+        self.stream_answers = stream_answers
+        # Reference numbering and the per-question token budget for them
+        self.references = ReferencePacker(context_budget)
+        # Search the raw first question of the session while the first
+        # decision is being made (sync pipeline only)
+        self.speculative = speculative
+        # Answer a conversation's first question from the semantic answer
+        # cache when a similar one was answered recently (sync pipeline only)
+        self.use_answer_cache = use_answer_cache
+        self.last_answer: Optional[str] = None
+        # Render answers for the terminal, or pass the Markdown through
+        # (e.g. to HTTP clients)
+        self.render_markdown = render_markdown
+        # Skip decision LLM calls when the next step is obvious: search
+        # right away for a factual question, answer right away once the
+        # reranked references cover it (see core.router)
+        self.fast_path = fast_path
+        # Token ceiling for the prompt carried into a follow-up question
+        # (0 keeps the whole conversation)
+        self.history_budget = history_budget
+        self.questions = 0
+        # reference number -> id of the search tool call that sent it
+        self.reference_calls: Dict[int, str] = {}
 
-        # Start with a single system prompt
-        current_datetime = datetime.now(tz=ZoneInfo("America/Los_Angeles")).strftime(
-            "%Y-%m-%d %H:%M:%S %Z"
-        )
-        self.system_content = (
+        # Start with a single system prompt. The time is rounded down to
+        # PROMPT_TIME_BUCKET_SEC so sessions started close together share it.
+        now = time.time()
+        now -= now % max(1, PROMPT_TIME_BUCKET_SEC)
+        current_datetime = datetime.fromtimestamp(
+            now, tz=ZoneInfo("America/Los_Angeles")
+        ).strftime("%Y-%m-%d %H:%M %Z")
+        self.system_prompt = (
             f"You are Plexy, a helpful AI assistant with web_search capability. "
             f"Current date and time is {current_datetime}.\n\n"
             "You can either:\n"
@@ -57,7 +118,7 @@ class Agent:
             "Use 'scratchpad' for short reasoning if you want.\n\n"
             "Return strict JSON for the Decision schema. (No extra keys!)\n"
             "When you eventually provide a final answer (action='answer'), you MUST:\n"
-            "1) Base your answer ONLY on the references we have added below.\n"
+            "1) Base your answer ONLY on the references returned by web_search_tool.\n"
             "2) Use inline citations like [1], [2], etc.\n"
             "3) Your response must end with a 'References' section listing the sources cited. For example:\n"
             "References:\n"
@@ -66,7 +127,7 @@ class Agent:
             "Obviously, dont include any references that are not cited in the body of your response.\n"
         )
         # Place it as the single system message
-        self.conversation.append({"role": "system", "content": self.system_content})
+        self.conversation.append({"role": "system", "content": self.system_prompt})
 
     def run_pipeline(self, user_query: str):
         """
@@ -76,121 +137,447 @@ class Agent:
          3) If it says 'search', run search tool, store results
          4) If 'answer', yield final LLM response
          5) If we exceed max_iters, forcibly produce a final
+
+        With fast_path, obvious searches skip step 2 and references that
+        already cover the question skip straight to the final answer.
+        """
+        with tracing.span("pipeline", query=user_query) as root:
+            yield from self._pipeline_steps(user_query)
+        self._log_trace(root)
+
+    def _pipeline_steps(self, user_query: str):
+        cacheable = self.use_answer_cache and not self.questions
+        if cacheable:
+            cached = answer_cache.lookup(user_query)
+            if cached is not None:
+                yield from self._render_cached(user_query, cached)
+                return
+
+        self._start_question(user_query)
+        yield from self._search_and_answer(user_query)
+        if cacheable and self.last_answer:
+            answer = {"role": "assistant", "content": self.last_answer}
+            references = self.references.sent(cited_numbers([answer]))
+            # Only cited answers are worth reusing.
+            if references:
+                answer_cache.store(user_query, self.last_answer, references)
+
+    def _render_cached(self, user_query: str, cached: dict):
+        """
+        Show a cached answer, and add it to the conversation after the
+        references it cites, as the search result that sent them: their
+        numbers stay taken, so later searches don't reuse them.
         """
-        # Add the user query
+        if self.debug:
+            log(
+                f"[DEBUG] Answer cache hit: {cached['query']!r} "
+                f"(similarity {cached['similarity']:.3f}, "
+                f"{cached['age_sec']:.0f}s old)"
+            )
+        self.questions += 1
+        self.conversation.append({"role": "user", "content": user_query})
+        self.references.restore(cached["references"])
+        call_id = f"search_{self.questions}_0"
+        for ref in cached["references"]:
+            self.reference_calls[ref["ref"]] = call_id
+        blocks = "\n".join(ref["block"] for ref in cached["references"])
+        self._append_search(
+            call_id,
+            [cached["query"]],
+            "Here are new references (iteration=1):\n"
+            f"{blocks}"
+            "#---------------------------------------#\n",
+        )
+        self.conversation.append({"role": "assistant", "content": cached["answer"]})
+        self.last_answer = cached["answer"]
+        yield "\n"
+        yield from self._markdown_stream(cached["answer"])
+        yield "\n"
+
+    def _start_question(self, user_query: str):
+        """Compact the earlier turns, then add the user query."""
+        if self.questions and self.history_budget:
+            self._compact()
+        self.questions += 1
         self.conversation.append({"role": "user", "content": user_query})
+        self.references.start_question()
+        self.last_answer = None
+
+    def _compact(self):
+        """
+        Reduce earlier search results to the references the remaining
+        answers cite, and drop the oldest turns until the prompt fits
+        history_budget. Prompt tokens before and after go on the "compact"
+        span.
+        """
+        with tracing.span("compact") as span:
+            before = prompt_tokens(self.conversation)
+            system = self.conversation[0]
+            turns = split_turns(
+                self.conversation[1:], {FORCE_FINAL_MESSAGE["content"]}
+            )
+            dropped_turns = 0
+            while True:
+                cited = cited_numbers(m for turn in turns for m in turn)
+                kept = set()
+
+                def kept_result(call_id: str) -> str:
+                    numbers = sorted(
+                        n
+                        for n, sent_by in self.reference_calls.items()
+                        if sent_by == call_id and n in cited
+                    )
+                    kept.update(numbers)
+                    return self._cited_references(numbers)
+
+                history = [m for turn in turns for m in reduce_turn(turn, kept_result)]
+                after = prompt_tokens([system] + history)
+                if after <= self.history_budget or not turns:
+                    break
+                turns.pop(0)
+                dropped_turns += 1
+
+            dropped_refs = self.references.forget(set(self.references.blocks) - kept)
+            self.reference_calls = {
+                n: call_id for n, call_id in self.reference_calls.items() if n in kept
+            }
+            self.conversation = [system] + history
+            span.set(
+                tokens_before=before,
+                tokens_after=after,
+                turns_dropped=dropped_turns,
+                references_dropped=dropped_refs,
+            )
+        if self.debug:
+            log(
+                f"[DEBUG] Compacted conversation: {before:,} -> {after:,} tokens "
+                f"({dropped_turns} turns, {dropped_refs} references dropped)"
+            )
 
-        last_top_docs = []
+    def _search_and_answer(self, user_query: str):
+        # Follow-ups ("what about X?") rarely match the decision's queries.
+        speculate = self.speculative and self.questions == 1
+        speculation = SpeculativeSearch(user_query) if speculate else None
+        try:
+            yield from self._iterate(user_query, speculation)
+        finally:
+            if speculation is not None:
+                if not speculation.claimed:
+                    speculation.discard()
+                if self.debug:
+                    stats = speculation_stats.snapshot()
+                    log(f"[DEBUG] Speculative search stats: {stats}")
 
+    def _iterate(self, user_query: str, speculation: Optional[SpeculativeSearch]):
+        covered = False
         for iteration in range(self.max_iters):
-            decision = call_decision_llm(self.conversation, debug=self.debug)
-            if not decision:
-                yield "\n**(No valid decision from LLM - halting.)**\n"
-                return
+            with tracing.span("iteration", index=iteration + 1) as span:
+                decision, streamed = self._routed_decision(user_query, iteration), ()
+                if decision is not None:
+                    span.set(routed=1)
+                else:
+                    decision, streamed = yield from self._decide(iteration)
+                if not decision:
+                    yield "\n**(No valid decision from LLM - halting.)**\n"
+                    return
 
-            if decision.scratchpad:
-                # Show scratchpad
-                yield "\n"
-                yield from self._markdown_stream(
-                    f"**Scratchpad iteration={iteration+1}**: {decision.scratchpad}"
+                span.set(action=decision.action)
+                chunks, finished = self._render_decision(decision, iteration, streamed)
+                yield from chunks
+                if finished:
+                    return
+
+                # If action == "search"
+                if self.debug:
+                    log(f"[DEBUG] Searching with queries: {decision.search_queries}")
+
+                yield "\n(Performing web searches...)\n"
+
+                search_queries, prefetched = decision.search_queries, {}
+                if speculation is not None and not speculation.claimed:
+                    search_queries, prefetched = speculation.claim(search_queries)
+                top_docs, timings = streaming_search(
+                    user_query, search_queries, top_n=10, prefetched=prefetched
                 )
+                if self.debug:
+                    log(f"[DEBUG] Search stage timings: {timings}")
+                    log(f"[DEBUG] Page cache stats: {page_cache.snapshot()}")
+                    log(f"[DEBUG] Search cache stats: {search_cache.snapshot()}")
+                    log(f"[DEBUG] Provider limits: {limiter_metrics()}")
+
+                self._record_search(iteration, user_query, search_queries, top_docs)
+                covered = self._references_cover(top_docs)
+                if covered:
+                    break
+
+        # Force final if we exit loop
+        if not covered:
+            yield "\nReached max iterations. Force-producing final answer...\n"
+        self.conversation.append(dict(FORCE_FINAL_MESSAGE))
+        with tracing.span("early_answer" if covered else "forced_answer"):
+            forced_decision, streamed = yield from self._decide()
+        yield from self._render_forced(forced_decision, streamed)
+
+    def _routed_decision(self, user_query: str, iteration: int) -> Optional[Decision]:
+        """
+        Under fast_path, a search decision for a factual first question,
+        made without calling the decision LLM.
+        """
+        if not self.fast_path or iteration or self.questions > 1:
+            return None
+        if not needs_search(user_query):
+            return None
+        return Decision(
+            action="search", search_queries=[user_query], message=None, scratchpad=None
+        )
+
+    def _references_cover(self, top_docs: list) -> bool:
+        """Under fast_path, whether to answer now instead of deciding again."""
+        if not self.fast_path or not references_cover(top_docs):
+            return False
+        if self.debug:
+            scores = [d.get("rerank_score") for d in top_docs]
+            log(f"[DEBUG] References cover the question (scores {scores})")
+        return True
+
+    def _log_trace(self, root: tracing.Span):
+        """
+        Under --debug, print the finished trace as a table and how much of
+        the decision prompts the provider served from its prompt cache.
+        """
+        if self.debug:
+            console.print(tracing.summary_table(tracing.finished_subtree(root)))
+            log(f"[DEBUG] Prompt cache: {prompt_cache_stats.snapshot()}")
+
+    def _decide(self, iteration: Optional[int] = None):
+        """
+        Call the decision LLM. In streaming mode an answer's text is yielded
+        as it arrives, after its scratchpad (shown for an `iteration` only,
+        as _render_decision would). Returns (decision, the fields already
+        shown).
+        """
+        if not self.stream_answers:
+            return call_decision_llm(self.conversation, debug=self.debug), ()
+
+        stream = stream_decision_llm(self.conversation, debug=self.debug)
+        streamed = set()
+        while True:
+            try:
+                field, text = next(stream)
+            except StopIteration as stop:
+                return stop.value, streamed
+            if field == "scratchpad":
+                if iteration is not None:
+                    yield from self._scratchpad_chunks(text, iteration)
+                    streamed.add(field)
+                continue
+            if field not in streamed:
                 yield "\n"
+                streamed.add(field)
+            yield text
 
-            if decision.action == "answer":
-                if decision.message:
-                    yield "\n"
-                    yield from self._markdown_stream(decision.message)
-                    yield "\n"
-                    self.conversation.append(
-                        {"role": "assistant", "content": decision.message}
+    async def arun_pipeline(self, user_query: str):
+        """
+        asyncio version of run_pipeline with the same steps and the same
+        streamed chunks, using the async helpers so many queries can share one
+        event loop.
+        """
+        with tracing.span("pipeline", query=user_query) as root:
+            async for chunk in self._apipeline_steps(user_query):
+                yield chunk
+        self._log_trace(root)
+
+    async def _apipeline_steps(self, user_query: str):
+        # Imported on first use: the sync CLI never needs the async clients.
+        from tools.async_pipeline_helpers import (
+            atavily_in_parallel,
+            aenrich_docs_with_cache,
+            acohere_rerank,
+            acall_decision_llm,
+        )
+
+        self._start_question(user_query)
+
+        covered = False
+        for iteration in range(self.max_iters):
+            with tracing.span("iteration", index=iteration + 1) as span:
+                decision = self._routed_decision(user_query, iteration)
+                if decision is not None:
+                    span.set(routed=1)
+                else:
+                    decision = await acall_decision_llm(
+                        self.conversation, debug=self.debug
                     )
+                if not decision:
+                    yield "\n**(No valid decision from LLM - halting.)**\n"
                     return
-                else:
-                    yield "\nNo message from the LLM. Stopping.\n"
+
+                span.set(action=decision.action)
+                chunks, finished = self._render_decision(decision, iteration)
+                for chunk in chunks:
+                    yield chunk
+                if finished:
                     return
 
-            # If action == "search"
-            if self.debug:
-                log(f"[DEBUG] Searching with queries: {decision.search_queries}")
+                if self.debug:
+                    log(f"[DEBUG] Searching with queries: {decision.search_queries}")
 
-            yield "\n(Performing web searches...)\n"
+                yield "\n(Performing web searches...)\n"
 
-            docs = tavily_in_parallel(decision.search_queries)
-            docs = enrich_docs_with_cache(docs)
-            docs = deduplicate_docs(docs)
-            top_docs = cohere_rerank(user_query, docs, top_n=10)
-            last_top_docs = top_docs
+                docs = await atavily_in_parallel(decision.search_queries)
+                docs = await aenrich_docs_with_cache(docs)
+                if self.debug:
+                    log(f"[DEBUG] Page cache stats: {page_cache.snapshot()}")
+                    log(f"[DEBUG] Search cache stats: {search_cache.snapshot()}")
+                    log(f"[DEBUG] Provider limits: {limiter_metrics()}")
+                docs = deduplicate_docs(docs)
+                top_docs = await acohere_rerank(user_query, docs, top_n=10)
 
-            # Store the tool calls in conversation
-            # Convert arguments dict to JSON string for OpenAI API
-            self.conversation.append(
-                {
-                    "role": "assistant",
-                    "content": None,
-                    "tool_calls": [
-                        {
-                            "id": f"search_{iteration}",
-                            "type": "function",
-                            "function": {
-                                "name": "web_search_tool",
-                                "arguments": json.dumps(
-                                    {"queries": decision.search_queries}
-                                ),
-                            },
-                        }
-                    ],
-                }
+                self._record_search(
+                    iteration, user_query, decision.search_queries, top_docs
+                )
+                covered = self._references_cover(top_docs)
+                if covered:
+                    break
+
+        if not covered:
+            yield "\nReached max iterations. Force-producing final answer...\n"
+        self.conversation.append(dict(FORCE_FINAL_MESSAGE))
+        with tracing.span("early_answer" if covered else "forced_answer"):
+            forced_decision = await acall_decision_llm(
+                self.conversation, debug=self.debug
             )
+        for chunk in self._render_forced(forced_decision):
+            yield chunk
+
+    def _render_decision(
+        self, decision: Decision, iteration: int, streamed: Collection[str] = ()
+    ):
+        """
+        Chunks to show for a decision, plus whether it ends the turn
+        (an answer, or an answer without a message). Fields already
+        streamed ("scratchpad", "message") are not rendered again.
+        """
+        chunks = []
+        if decision.scratchpad and "scratchpad" not in streamed:
+            chunks.extend(self._scratchpad_chunks(decision.scratchpad, iteration))
+
+        if decision.action == "answer":
+            if decision.message:
+                if "message" not in streamed:
+                    chunks.append("\n")
+                    chunks.extend(self._markdown_stream(decision.message))
+                chunks.append("\n")
+                self.conversation.append(
+                    {"role": "assistant", "content": decision.message}
+                )
+                self.last_answer = decision.message
+            else:
+                chunks.append("\nNo message from the LLM. Stopping.\n")
+            return chunks, True
+        return chunks, False
+
+    def _scratchpad_chunks(self, scratchpad: str, iteration: int) -> List[str]:
+        return [
+            "\n",
+            *self._markdown_stream(
+                f"**Scratchpad iteration={iteration+1}**: {scratchpad}"
+            ),
+            "\n",
+        ]
+
+    def _render_forced(
+        self, forced_decision: Optional[Decision], streamed: Collection[str] = ()
+    ):
+        if forced_decision and forced_decision.message:
             self.conversation.append(
-                {
-                    "role": "tool",
-                    "tool_call_id": f"search_{iteration}",
-                    "content": json.dumps(top_docs, indent=2),
-                }
+                {"role": "assistant", "content": forced_decision.message}
             )
+            self.last_answer = forced_decision.message
+            if "message" not in streamed:
+                yield from self._markdown_stream(forced_decision.message)
+            yield "\n"
+        else:
+            yield "\nNo final forced answer produced.\n"
 
-            # Build enumerated references text
-            enumerated_list = []
-            for i, doc in enumerate(top_docs, start=1):
-                enumerated_list.append(
-                    f"{i}. Title: {doc.get('title','Untitled')}\n"
-                    f"   URL: {doc.get('url','#')}\n"
-                    f"   Snippet:\n   \"{doc.get('content','')}\"\n---\n"
-                )
-            if enumerated_list:
-                # Append references to the single system message
-                reference_block = "\n\n".join(enumerated_list)
-                updated_refs = (
-                    f"\n\nHere are new references (iteration={iteration+1}):\n"
-                    f"{reference_block}"
-                    "#---------------------------------------#\n"
-                )
-                self.system_content += updated_refs
-                # Overwrite system message [0]
-                self.conversation[0] = {
-                    "role": "system",
-                    "content": self.system_content,
-                }
+    def _record_search(
+        self,
+        iteration: int,
+        user_query: str,
+        search_queries: List[str],
+        top_docs: list,
+    ):
+        """
+        Store the search as a tool call + result in the conversation, with
+        the new references as the result. Reference text is packed into the
+        context budget and each URL is only sent once; results found again
+        are listed by reference number.
+        """
+        known = set(self.references.blocks)
+        reference_block, refs = self.references.pack(user_query, top_docs)
+        call_id = f"search_{self.questions}_{iteration}"
+        for number in self.references.blocks:
+            if number not in known:
+                self.reference_calls[number] = call_id
 
-        # Force final if we exit loop
-        yield "\nReached max iterations. Force-producing final answer...\n"
+        result = []
+        if reference_block:
+            result.append(
+                f"Here are new references (iteration={iteration+1}):\n"
+                f"{reference_block}"
+                "#---------------------------------------#\n"
+            )
+        again = sorted({ref["ref"] for ref in refs if ref["ref"] in known})
+        if again:
+            result.append(
+                "Also found, see the references above: "
+                + ", ".join(f"[{n}]" for n in again)
+            )
+        self._append_search(call_id, search_queries, "\n".join(result))
+
+    def _append_search(self, call_id: str, search_queries: List[str], result: str):
+        """Add a web_search_tool call and its result to the conversation."""
+        # Store the tool calls in conversation
+        # Convert arguments dict to JSON string for OpenAI API
         self.conversation.append(
             {
-                "role": "user",
-                "content": (
-                    "Please now provide your final answer with inline citations [1], [2], etc., referencing only the references above, "
-                    "and end with a 'References' section."
-                ),
+                "role": "assistant",
+                "content": None,
+                "tool_calls": [
+                    {
+                        "id": call_id,
+                        "type": "function",
+                        "function": {
+                            "name": "web_search_tool",
+                            "arguments": json.dumps({"queries": search_queries}),
+                        },
+                    }
+                ],
             }
         )
-        forced_decision = call_decision_llm(self.conversation, debug=self.debug)
-        if forced_decision and forced_decision.message:
-            yield from self._markdown_stream(forced_decision.message)
-            yield "\n"
-        else:
-            yield "\nNo final forced answer produced.\n"
+        self.conversation.append(
+            {
+                "role": "tool",
+                "tool_call_id": call_id,
+                "content": result or "No results.",
+            }
+        )
+
+    def _cited_references(self, numbers: List[int]) -> str:
+        """A compacted search result: the references later answers cite."""
+        if not numbers:
+            return ""
+        blocks = "\n".join(self.references.blocks[n] for n in numbers)
+        return (
+            "References cited in the answers:\n"
+            f"{blocks}"
+            "#---------------------------------------#\n"
+        )
 
     def _markdown_stream(self, md_text: str):
+        if not self.render_markdown:
+            yield md_text
+            return
         md_renderable = Markdown(md_text)
         with console.capture() as capture:
             console.print(md_renderable)
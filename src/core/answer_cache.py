@@ -0,0 +1,326 @@
+"""
+Semantic cache of final answers, in front of Agent.run_pipeline.
+
+A new conversation's first question is embedded and compared (cosine
+similarity, NumPy brute force) with the questions answered before; close
+enough matches return the stored cited answer, with the references it
+cites, without any LLM or search calls. Exact repeats (after normalize_query) skip the embedding call too.
+
+Entries live in Redis, with an expiry that depends on how time-sensitive
+the question is (see freshness_ttl), and are mirrored in a local vector
+index of at most ANSWER_CACHE_MAX_ENTRIES answers. A sorted set of entry
+keys by expiry time is checked periodically, and only the entries missing
+locally are fetched, so answers stored by other processes are found as
+well, without scanning the rest of the Redis DB (crawled pages, search
+results).
+"""
+
+import base64
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from . import tracing
+from .clients import openai_client
+from .config import (
+    ANSWER_CACHE_EMBEDDING_MODEL,
+    ANSWER_CACHE_MAX_ENTRIES,
+    ANSWER_CACHE_MIN_SIMILARITY,
+    ANSWER_CACHE_TTL_LIVE_SEC,
+    ANSWER_CACHE_TTL_RECENT_SEC,
+    ANSWER_CACHE_TTL_SEC,
+)
+from .logger import log
+from tools.cache import rclient, redis_error
+from tools.search import normalize_query
+
+_LIVE_RE = re.compile(
+    r"\b(today|tonight|now|live|current(ly)?|price|prices|stock|stocks|"
+    r"score|scores|weather|forecast|exchange rate|breaking)\b"
+)
+_RECENT_RE = re.compile(
+    r"\b(latest|recent(ly)?|new|newest|news|this (week|month|year)|yesterday|"
+    r"upcoming|release|released|update|updates|20\d\d)\b"
+)
+
+
+def freshness_ttl(query: str) -> float:
+    """
+    How long an answer to `query` stays fresh: minutes for live data
+    (prices, scores, "today"), hours for recent events ("latest", news),
+    days otherwise.
+    """
+    text = normalize_query(query)
+    if _LIVE_RE.search(text):
+        return ANSWER_CACHE_TTL_LIVE_SEC
+    if _RECENT_RE.search(text):
+        return ANSWER_CACHE_TTL_RECENT_SEC
+    return ANSWER_CACHE_TTL_SEC
+
+
+def embed_query(text: str) -> np.ndarray:
+    """Unit-length embedding of text from the OpenAI embeddings API."""
+    resp = openai_client().embeddings.create(
+        model=ANSWER_CACHE_EMBEDDING_MODEL, input=text, encoding_format="float"
+    )
+    vector = np.asarray(resp.data[0].embedding, dtype=np.float32)
+    return vector / (np.linalg.norm(vector) or 1.0)
+
+
+def _encode_vector(vector: np.ndarray) -> str:
+    return base64.b64encode(vector.astype(np.float32).tobytes()).decode("ascii")
+
+
+def _decode_vector(text: str) -> np.ndarray:
+    return np.frombuffer(base64.b64decode(text), dtype=np.float32)
+
+
+class AnswerCache:
+    """
+    lookup(query) returns a stored answer for the same or a paraphrased
+    question, or None; store(query, answer, references) saves one. Works from the local
+    index alone when Redis is unavailable (`redis_client=None` turns Redis
+    off).
+    """
+
+    def __init__(
+        self,
+        redis_client=rclient,
+        min_similarity: float = ANSWER_CACHE_MIN_SIMILARITY,
+        embed: Callable[[str], np.ndarray] = embed_query,
+        prefix: str = "answer:v2:",
+        refresh_sec: float = 60.0,
+        redis_retry_sec: float = 30.0,
+        max_entries: int = ANSWER_CACHE_MAX_ENTRIES,
+        max_pending_embeddings: int = 256,
+    ):
+        self.redis = redis_client
+        self.min_similarity = min_similarity
+        self.embed = embed
+        self.prefix = prefix
+        # Sorted set of entry keys, scored by expiry time
+        self.index_key = prefix + "index"
+        self.refresh_sec = refresh_sec
+        self.redis_retry_sec = redis_retry_sec
+        self.max_entries = max(1, max_entries)
+        self.max_pending_embeddings = max_pending_embeddings
+        self._lock = threading.Lock()
+        self._entries: Dict[str, dict] = {}  # key -> entry
+        self._vectors: Dict[str, np.ndarray] = {}  # key -> embedding
+        self._keys: List[str] = []  # rows of _matrix
+        self._matrix = np.zeros((0, 0), dtype=np.float32)
+        self._loaded_at = float("-inf")
+        self._redis_down_until = 0.0
+        # Embeddings computed by lookup(), reused by store() for the same
+        # query; most misses are never stored, so only the latest are kept
+        self._embeddings: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+
+    def key(self, query: str) -> str:
+        digest = hashlib.sha256(normalize_query(query).encode("utf-8")).hexdigest()
+        return self.prefix + digest
+
+    def lookup(self, query: str) -> Optional[dict]:
+        """
+        The stored answer to the same question, or else to the most similar
+        question at least `min_similarity` similar to `query`, among answers
+        still fresh; as {"query", "answer", "references", "similarity",
+        "age_sec"}, where references are the ones the answer cites (see
+        ReferencePacker.sent).
+        """
+        with tracing.span("answer_cache") as span:
+            self._refresh()
+            now = time.time()
+            key = self.key(query)
+            with self._lock:
+                entry = self._entries.get(key)
+            similarity = 1.0
+            if entry is None or entry["expires_at"] <= now:
+                entry, similarity = self._nearest(query, now)
+            if entry is None:
+                self.misses += 1
+                span.set(result="miss", similarity=round(similarity, 3))
+                return None
+            self.hits += 1
+            span.set(result="hit", similarity=round(similarity, 3))
+            return {
+                "query": entry["query"],
+                "answer": entry["answer"],
+                "references": entry["references"],
+                "similarity": similarity,
+                "age_sec": now - entry["created_at"],
+            }
+
+    def _nearest(self, query: str, now: float):
+        """(entry, similarity) of the closest fresh question, if close enough."""
+        try:
+            vector = self.embed(query)
+        except Exception as e:
+            log(f"Answer cache: embedding failed ({e})", error=True)
+            return None, 0.0
+        with self._lock:
+            self._embeddings[normalize_query(query)] = vector
+            while len(self._embeddings) > self.max_pending_embeddings:
+                self._embeddings.popitem(last=False)
+            if not self._keys or self._matrix.shape[1] != len(vector):
+                return None, 0.0
+            scores = self._matrix @ vector
+            for row in np.argsort(-scores):
+                if scores[row] < self.min_similarity:
+                    break
+                entry = self._entries[self._keys[row]]
+                if entry["expires_at"] > now:
+                    return entry, float(scores[row])
+            return None, float(scores.max())
+
+    def store(self, query: str, answer: str, references: List[dict]):
+        """
+        Cache the answer to query, and the references it cites, for
+        freshness_ttl(query) seconds.
+        """
+        with self._lock:
+            vector = self._embeddings.pop(normalize_query(query), None)
+        if vector is None:
+            try:
+                vector = self.embed(query)
+            except Exception as e:
+                log(f"Answer cache: embedding failed ({e})", error=True)
+                return
+        ttl = freshness_ttl(query)
+        now = time.time()
+        entry = {
+            "query": query,
+            "answer": answer,
+            "references": references,
+            "embedding": _encode_vector(vector),
+            "created_at": now,
+            "expires_at": now + ttl,
+        }
+        key = self.key(query)
+        self._add(key, entry, vector)
+        self.stores += 1
+        if self._redis_available():
+            try:
+                pipe = self.redis.pipeline(transaction=False)
+                pipe.set(key, json.dumps(entry), ex=max(1, int(ttl)))
+                pipe.zadd(self.index_key, {key: entry["expires_at"]})
+                # Keep the index to the entries that expire last.
+                pipe.zremrangebyrank(self.index_key, 0, -self.max_entries - 1)
+                pipe.execute()
+            except redis_error() as e:
+                self._redis_failed("SET", e)
+
+    def _add(self, key: str, entry: dict, vector: np.ndarray):
+        with self._lock:
+            self._entries[key] = entry
+            self._vectors[key] = vector
+            if len(self._entries) > self.max_entries:
+                self._rebuild(time.time())
+            elif key in self._keys:
+                self._matrix[self._keys.index(key)] = vector
+            elif not self._keys or self._matrix.shape[1] == len(vector):
+                self._keys.append(key)
+                rows = self._matrix.reshape(-1, len(vector))
+                self._matrix = np.vstack([rows, vector[None, :]])
+
+    def _refresh(self):
+        """
+        Every `refresh_sec`, read the index of fresh entry keys from Redis
+        and fetch the entries not held locally (new, or stored again).
+        """
+        if time.monotonic() - self._loaded_at < self.refresh_sec:
+            return
+        self._loaded_at = time.monotonic()
+        if not self._redis_available():
+            return
+        now = time.time()
+        try:
+            self.redis.zremrangebyscore(self.index_key, "-inf", now)
+            listed = self.redis.zrevrangebyscore(
+                self.index_key,
+                "+inf",
+                now,
+                start=0,
+                num=self.max_entries,
+                withscores=True,
+            )
+            missing = []
+            with self._lock:
+                for key, expires_at in listed:
+                    key = key.decode() if isinstance(key, bytes) else key
+                    if self._entries.get(key, {}).get("expires_at") != expires_at:
+                        missing.append(key)
+            values = self.redis.mget(missing) if missing else []
+        except redis_error() as e:
+            self._redis_failed("index read", e)
+            return
+        fetched = {
+            key: json.loads(value)
+            for key, value in zip(missing, values)
+            if value is not None
+        }
+        with self._lock:
+            # Local entries Redis doesn't have (e.g. written while it was
+            # down) are kept.
+            for key, entry in fetched.items():
+                self._entries[key] = entry
+                self._vectors[key] = _decode_vector(entry["embedding"])
+            self._rebuild(now)
+
+    def _rebuild(self, now: float):
+        """
+        Drop expired entries and all but the `max_entries` that expire last,
+        then rebuild the matrix. Call with the lock held.
+        """
+        fresh = sorted(
+            (k for k, e in self._entries.items() if e["expires_at"] > now),
+            key=lambda k: self._entries[k]["expires_at"],
+            reverse=True,
+        )[: self.max_entries]
+        sizes = {len(self._vectors[k]) for k in fresh}
+        if len(sizes) > 1:
+            # Entries from another embedding model: keep the newest kind.
+            newest = max(fresh, key=lambda k: self._entries[k]["created_at"])
+            size = len(self._vectors[newest])
+            fresh = [k for k in fresh if len(self._vectors[k]) == size]
+        self._entries = {k: self._entries[k] for k in fresh}
+        self._vectors = {k: self._vectors[k] for k in fresh}
+        self._keys = fresh
+        self._matrix = (
+            np.stack([self._vectors[k] for k in fresh])
+            if fresh
+            else np.zeros((0, 0), dtype=np.float32)
+        )
+
+    def _redis_available(self) -> bool:
+        return self.redis is not None and time.monotonic() >= self._redis_down_until
+
+    def _redis_failed(self, op: str, err: Exception):
+        if self._redis_available():
+            log(
+                f"Answer cache: Redis {op} failed ({err}); "
+                f"using the local index only for {self.redis_retry_sec:.0f}s",
+                error=True,
+            )
+        self._redis_down_until = time.monotonic() + self.redis_retry_sec
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            entries = len(self._entries)
+        return {
+            "entries": entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "stores": self.stores,
+        }
+
+
+answer_cache = AnswerCache()
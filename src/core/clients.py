@@ -0,0 +1,203 @@
+"""
+Process-wide API clients and HTTP sessions.
+
+Every provider call goes through one of these shared clients, so
+connections (and TLS sessions) are kept alive and reused across calls
+instead of being re-established per request. Pool sizes and timeouts come
+from core.config.
+
+Requests go through their provider's rate limiter (core.ratelimit), which
+also retries them, so the SDKs' own retries are turned off.
+
+Async clients are bound to an event loop, so those are cached per loop.
+The SDKs (openai in particular) are slow to import, so they are imported
+when their client is first built rather than at startup.
+"""
+
+import asyncio
+import threading
+import weakref
+from typing import TYPE_CHECKING, Callable, Dict, Optional
+
+if TYPE_CHECKING:
+    import cohere
+    import httpx
+    import requests
+    from openai import AsyncOpenAI, OpenAI
+
+from .config import (
+    OPENAI_API_KEY,
+    COHERE_API_KEY,
+    COHERE_BASE_URL,
+    CRAWL4AI_BASE_URL,
+    HTTP_POOL_SIZE,
+    HTTP_TIMEOUT_SEC,
+    OPENAI_TIMEOUT_SEC,
+    TAVILY_BASE_URL,
+)
+from .ratelimit import ProviderLimiter, limiter
+
+_lock = threading.Lock()
+_clients: Dict[str, object] = {}
+_loop_clients = weakref.WeakKeyDictionary()
+
+
+def _shared(name: str, factory: Callable):
+    client = _clients.get(name)
+    if client is None:
+        with _lock:
+            client = _clients.get(name)
+            if client is None:
+                client = _clients[name] = factory()
+    return client
+
+
+def _per_loop(name: str, factory: Callable):
+    clients = _loop_clients.setdefault(asyncio.get_running_loop(), {})
+    if name not in clients:
+        clients[name] = factory()
+    return clients[name]
+
+
+def _httpx_limits() -> "httpx.Limits":
+    import httpx
+
+    return httpx.Limits(
+        max_connections=HTTP_POOL_SIZE, max_keepalive_connections=HTTP_POOL_SIZE
+    )
+
+
+def _route_http(url: str) -> Optional[ProviderLimiter]:
+    """Limiter for a request on the plain HTTP clients, by endpoint."""
+    if url.startswith(TAVILY_BASE_URL):
+        return limiter("tavily")
+    if url.startswith(CRAWL4AI_BASE_URL):
+        return limiter("crawl4ai")
+    return None
+
+
+def _route_to(provider: str) -> Callable[[str], ProviderLimiter]:
+    return lambda url: limiter(provider)
+
+
+def _limited_client(route: Callable, **kwargs) -> "httpx.Client":
+    import httpx
+
+    from .transports import LimitedTransport
+
+    transport = httpx.HTTPTransport(limits=_httpx_limits())
+    return httpx.Client(transport=LimitedTransport(route, transport), **kwargs)
+
+
+def _limited_async_client(route: Callable, **kwargs) -> "httpx.AsyncClient":
+    import httpx
+
+    from .transports import LimitedAsyncTransport
+
+    transport = httpx.AsyncHTTPTransport(limits=_httpx_limits())
+    return httpx.AsyncClient(
+        transport=LimitedAsyncTransport(route, transport), **kwargs
+    )
+
+
+def http_session() -> "requests.Session":
+    """requests.Session for plain HTTP APIs (Tavily, Crawl4AI)."""
+
+    def build():
+        import requests
+
+        from .transports import LimitedAdapter
+
+        session = requests.Session()
+        adapter = LimitedAdapter(
+            _route_http, pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE
+        )
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    return _shared("http", build)
+
+
+def openai_client() -> "OpenAI":
+    def build():
+        from openai import OpenAI
+
+        return OpenAI(
+            api_key=OPENAI_API_KEY,
+            timeout=OPENAI_TIMEOUT_SEC,
+            max_retries=0,
+            http_client=_limited_client(_route_to("openai")),
+        )
+
+    return _shared("openai", build)
+
+
+def cohere_client() -> "cohere.Client":
+    def build():
+        import cohere
+
+        return cohere.Client(
+            COHERE_API_KEY,
+            base_url=COHERE_BASE_URL,
+            timeout=HTTP_TIMEOUT_SEC,
+            max_retries=0,
+            httpx_client=_limited_client(
+                _route_to("cohere"), timeout=HTTP_TIMEOUT_SEC
+            ),
+        )
+
+    return _shared("cohere", build)
+
+
+def async_http_client() -> "httpx.AsyncClient":
+    def build():
+        return _limited_async_client(_route_http, timeout=HTTP_TIMEOUT_SEC)
+
+    return _per_loop("http", build)
+
+
+def async_openai_client() -> "AsyncOpenAI":
+    def build():
+        from openai import AsyncOpenAI
+
+        return AsyncOpenAI(
+            api_key=OPENAI_API_KEY,
+            timeout=OPENAI_TIMEOUT_SEC,
+            max_retries=0,
+            http_client=_limited_async_client(_route_to("openai")),
+        )
+
+    return _per_loop("openai", build)
+
+
+def async_cohere_client() -> "cohere.AsyncClient":
+    def build():
+        import cohere
+
+        return cohere.AsyncClient(
+            COHERE_API_KEY,
+            base_url=COHERE_BASE_URL,
+            timeout=HTTP_TIMEOUT_SEC,
+            max_retries=0,
+            httpx_client=_limited_async_client(
+                _route_to("cohere"), timeout=HTTP_TIMEOUT_SEC
+            ),
+        )
+
+    return _per_loop("cohere", build)
+
+
+def per_loop_client(name: str, factory: Callable):
+    """Cache any other async client (e.g. redis.asyncio) per event loop."""
+    return _per_loop(name, factory)
+
+
+def reset_clients() -> None:
+    """Close and forget the shared sync clients (e.g. after fork)."""
+    with _lock:
+        for client in _clients.values():
+            close = getattr(client, "close", None)
+            if close:
+                close()
+        _clients.clear()
@@ -0,0 +1,84 @@
+"""
+Conversation compaction between questions of a long session.
+
+Every question leaves its search tool calls, their results (the reference
+text) and the forced-answer prompt in the conversation that is resent with
+each decision call. Once a question is answered, follow-ups only need the
+question, the answer and the references it cites, so before the next
+question the agent:
+
+* reduces each earlier search result to the references some remaining
+  answer cites, dropping searches none of whose references were cited;
+* drops the forced-answer prompts;
+* drops the oldest turns until the prompt fits its history budget.
+
+Reduction is deterministic, so a turn compacted once stays byte-identical
+in later prompts and keeps the prompt prefix cacheable by the provider.
+"""
+
+import re
+from typing import Callable, Iterable, List, Set
+
+from tools.text_utils import count_tokens
+
+# Per-message framing the API adds (role, separators), roughly
+MESSAGE_OVERHEAD_TOKENS = 4
+
+_CITATION_RE = re.compile(r"\[(\d+)\]")
+
+
+def prompt_tokens(messages: List[dict]) -> int:
+    """Approximate prompt size of a chat conversation."""
+    total = 0
+    for message in messages:
+        total += MESSAGE_OVERHEAD_TOKENS + count_tokens(message.get("content") or "")
+        for call in message.get("tool_calls") or ():
+            total += count_tokens(call["function"]["arguments"])
+    return total
+
+
+def cited_numbers(messages: Iterable[dict]) -> Set[int]:
+    """Reference numbers cited as [n] in assistant messages."""
+    return {
+        int(number)
+        for message in messages
+        if message["role"] == "assistant"
+        for number in _CITATION_RE.findall(message.get("content") or "")
+    }
+
+
+def split_turns(messages: Iterable[dict], transient: Set[str]) -> List[List[dict]]:
+    """
+    Earlier messages (after the system message) grouped per user question,
+    leaving out `transient` prompts such as the forced-answer request.
+    """
+    turns: List[List[dict]] = []
+    for message in messages:
+        if message["role"] == "user" and message.get("content") in transient:
+            continue
+        if message["role"] == "user" or not turns:
+            turns.append([])
+        turns[-1].append(message)
+    return turns
+
+
+def reduce_turn(turn: List[dict], kept_result: Callable[[str], str]) -> List[dict]:
+    """
+    The turn with each tool result replaced by kept_result(tool_call_id);
+    a call whose kept result is empty is dropped along with its result.
+    """
+    reduced = []
+    for message in turn:
+        if message["role"] == "tool":
+            continue
+        if not message.get("tool_calls"):
+            reduced.append(message)
+            continue
+        call_id = message["tool_calls"][0]["id"]
+        content = kept_result(call_id)
+        if content:
+            reduced.append(message)
+            reduced.append(
+                {"role": "tool", "tool_call_id": call_id, "content": content}
+            )
+    return reduced
@@ -32,3 +32,113 @@ REDIS_DB = int(os.getenv("REDIS_DB", "0"))
 # Crawl4AI configuration with sensible defaults
 CRAWL4AI_BASE_URL = os.getenv("CRAWL4AI_BASE_URL", "http://localhost:11235")
 CRAWL4AI_API_TOKEN = os.getenv("CRAWL4AI_API_TOKEN", "your_secret_token")
+
+# Crawl enrichment: wall-clock budget per request and max in-flight crawls
+CRAWL_BUDGET_SEC = float(os.getenv("CRAWL_BUDGET_SEC", "20"))
+CRAWL_MAX_CONCURRENCY = int(os.getenv("CRAWL_MAX_CONCURRENCY", "8"))
+
+# Crawl cache: TTL, max stored page size (characters) and value compression
+CRAWL_CACHE_TTL_SEC = int(os.getenv("CRAWL_CACHE_TTL_SEC", str(60 * 60 * 24 * 14)))
+CRAWL_CACHE_MAX_CHARS = int(os.getenv("CRAWL_CACHE_MAX_CHARS", "200000"))
+CACHE_COMPRESSION = os.getenv("CACHE_COMPRESSION", "zstd")
+
+# In-process cache tier in front of Redis (bytes and TTL per cache)
+PAGE_MEMORY_CACHE_MAX_BYTES = int(
+    os.getenv("PAGE_MEMORY_CACHE_MAX_BYTES", str(64 * 1024 * 1024))
+)
+SEARCH_MEMORY_CACHE_MAX_BYTES = int(
+    os.getenv("SEARCH_MEMORY_CACHE_MAX_BYTES", str(16 * 1024 * 1024))
+)
+MEMORY_CACHE_TTL_SEC = int(os.getenv("MEMORY_CACHE_TTL_SEC", "3600"))
+
+# Tavily search result cache TTL (short: results go stale quickly)
+TAVILY_CACHE_TTL_SEC = int(os.getenv("TAVILY_CACHE_TTL_SEC", "600"))
+
+# Streaming search: fraction of queries to wait for, and a hard deadline
+SEARCH_QUORUM = float(os.getenv("SEARCH_QUORUM", "1.0"))
+SEARCH_DEADLINE_SEC = float(os.getenv("SEARCH_DEADLINE_SEC", "15"))
+
+# Shared HTTP connection pools (per client) and request timeouts
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "32"))
+HTTP_TIMEOUT_SEC = float(os.getenv("HTTP_TIMEOUT_SEC", "30"))
+OPENAI_TIMEOUT_SEC = float(os.getenv("OPENAI_TIMEOUT_SEC", "60"))
+
+# Tavily and Cohere REST endpoints (OpenAI's is read from OPENAI_BASE_URL by
+# its SDK, Crawl4AI's from CRAWL4AI_BASE_URL)
+TAVILY_BASE_URL = os.getenv("TAVILY_BASE_URL", "https://api.tavily.com")
+COHERE_BASE_URL = os.getenv("COHERE_BASE_URL", "https://api.cohere.com")
+
+# Local BM25 pre-ranking: passage size and how many passages go to Cohere
+PASSAGE_MAX_CHARS = int(os.getenv("PASSAGE_MAX_CHARS", "1000"))
+PRERANK_TOP_K = int(os.getenv("PRERANK_TOP_K", "40"))
+
+# Near-duplicate search results: minimum estimated Jaccard similarity
+NEAR_DUP_THRESHOLD = float(os.getenv("NEAR_DUP_THRESHOLD", "0.7"))
+
+# Crawl4AI task polling (exponential backoff with jitter) and how many
+# pages to submit per task
+CRAWL_POLL_INITIAL_SEC = float(os.getenv("CRAWL_POLL_INITIAL_SEC", "0.25"))
+CRAWL_POLL_MAX_SEC = float(os.getenv("CRAWL_POLL_MAX_SEC", "2"))
+CRAWL_BATCH_SIZE = int(os.getenv("CRAWL_BATCH_SIZE", "4"))
+
+# Tool execution: default per-call timeout, worker threads/processes per
+# tool, and the in-process cache for tools that declare TOOL_PURE = True
+TOOL_TIMEOUT_SEC = float(os.getenv("TOOL_TIMEOUT_SEC", "30"))
+TOOL_MAX_WORKERS = int(os.getenv("TOOL_MAX_WORKERS", "8"))
+TOOL_CACHE_MAX_BYTES = int(os.getenv("TOOL_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+TOOL_CACHE_TTL_SEC = float(os.getenv("TOOL_CACHE_TTL_SEC", "600"))
+
+# Speculative search: a decision query at least this similar to the raw
+# user query (Jaccard over terms) reuses the speculative results
+SPECULATIVE_MIN_OVERLAP = float(os.getenv("SPECULATIVE_MIN_OVERLAP", "0.5"))
+
+# Semantic answer cache for first questions: on/off (off unless
+# --answer-cache or ANSWER_CACHE=1), embedding model, the minimum cosine
+# similarity for a hit, freshness TTLs for live (prices, scores, "today"),
+# recent ("latest", news) and other questions, and the most answers kept in
+# the index
+ANSWER_CACHE = os.getenv("ANSWER_CACHE", "0").lower() in ("1", "true", "yes")
+ANSWER_CACHE_EMBEDDING_MODEL = os.getenv(
+    "ANSWER_CACHE_EMBEDDING_MODEL", "text-embedding-3-small"
+)
+ANSWER_CACHE_MIN_SIMILARITY = float(os.getenv("ANSWER_CACHE_MIN_SIMILARITY", "0.92"))
+ANSWER_CACHE_TTL_LIVE_SEC = float(os.getenv("ANSWER_CACHE_TTL_LIVE_SEC", "600"))
+ANSWER_CACHE_TTL_RECENT_SEC = float(os.getenv("ANSWER_CACHE_TTL_RECENT_SEC", "21600"))
+ANSWER_CACHE_TTL_SEC = float(os.getenv("ANSWER_CACHE_TTL_SEC", str(7 * 24 * 3600)))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "10000"))
+
+# Provider rate limits (see core.ratelimit): requests per second (0 = no
+# cap) and burst, and the ceiling for the adaptive concurrency limit, per
+# provider as <PROVIDER>_RPS, <PROVIDER>_BURST, <PROVIDER>_MAX_CONCURRENCY
+RATE_LIMITS = {
+    provider: {
+        "rps": float(os.getenv(f"{provider.upper()}_RPS", "0")),
+        "burst": int(os.getenv(f"{provider.upper()}_BURST", "10")),
+        "max_concurrency": int(
+            os.getenv(f"{provider.upper()}_MAX_CONCURRENCY", concurrency)
+        ),
+    }
+    for provider, concurrency in (
+        ("openai", "32"),
+        ("cohere", "16"),
+        ("tavily", "16"),
+        ("crawl4ai", "32"),
+    )
+}
+
+# Retries of failed provider calls (429, 5xx, timeouts): attempts in all,
+# jittered exponential backoff, and the longest Retry-After honoured
+RETRY_MAX_ATTEMPTS = int(os.getenv("RETRY_MAX_ATTEMPTS", "3"))
+RETRY_BACKOFF_BASE_SEC = float(os.getenv("RETRY_BACKOFF_BASE_SEC", "0.5"))
+RETRY_BACKOFF_MAX_SEC = float(os.getenv("RETRY_BACKOFF_MAX_SEC", "8"))
+RETRY_AFTER_MAX_SEC = float(os.getenv("RETRY_AFTER_MAX_SEC", "30"))
+
+# Fast path (--fast-path): reranked references cover the question when at
+# least FAST_PATH_MIN_DOCS of them have a rerank score of FAST_PATH_MIN_SCORE
+FAST_PATH_MIN_SCORE = float(os.getenv("FAST_PATH_MIN_SCORE", "0.5"))
+FAST_PATH_MIN_DOCS = int(os.getenv("FAST_PATH_MIN_DOCS", "2"))
+
+# Decision prompt: the current time in the system prompt is rounded down to
+# this many seconds, so the prompt prefix stays byte-identical (and can be
+# served from the provider's prompt cache) across sessions
+PROMPT_TIME_BUCKET_SEC = int(os.getenv("PROMPT_TIME_BUCKET_SEC", "3600"))
@@ -8,12 +8,14 @@ class Decision(BaseModel):
       {
         "action": "search" or "answer",
         "search_queries": [...],
-        "message": "...",       # (if action == "answer")
-        "scratchpad": "..."     # optional reasoning
+        "scratchpad": "...",    # optional reasoning
+        "message": "..."        # (if action == "answer")
       }
+    Field order is the order the model generates them in: reasoning comes
+    before the message, which can then be streamed after it.
     """
 
     action: Literal["search", "answer"]
     search_queries: List[str]
-    message: Optional[str]
     scratchpad: Optional[str]
+    message: Optional[str]
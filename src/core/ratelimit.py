@@ -0,0 +1,346 @@
+"""
+Per-provider rate limiting, adaptive concurrency and retries.
+
+Every call to an external API (OpenAI, Cohere, Tavily, Crawl4AI) goes
+through its provider's ProviderLimiter, shared by all threads and event
+loops in the process:
+
+* a token bucket caps the request rate (`<PROVIDER>_RPS`, 0 = no cap);
+* an AIMD concurrency limit caps the calls in flight: it grows by about
+  one per `limit` successful calls, up to `<PROVIDER>_MAX_CONCURRENCY`,
+  and halves on 429s, 5xx responses, timeouts and latency spikes;
+* calls that failed in a way worth retrying are retried with jittered
+  exponential backoff, and a Retry-After header holds back every caller
+  of that provider for as long as it asks.
+
+limiter_metrics() reports the current limits, calls in flight, retries and
+time spent waiting for a slot.
+"""
+
+import asyncio
+import email.utils
+import random
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+from . import tracing
+from .config import (
+    RATE_LIMITS,
+    RETRY_AFTER_MAX_SEC,
+    RETRY_BACKOFF_BASE_SEC,
+    RETRY_BACKOFF_MAX_SEC,
+    RETRY_MAX_ATTEMPTS,
+)
+
+RETRYABLE_STATUS = {408, 425, 429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """`rate` tokens per second, up to `burst` saved up; rate <= 0 is unlimited."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Take a token; returns how long to wait before using it."""
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self.burst, self._tokens + (now - self._updated) * self.rate
+            )
+            self._updated = now
+            self._tokens -= 1
+            return max(0.0, -self._tokens / self.rate)
+
+
+class AIMDLimit:
+    """
+    Concurrency limit with additive increase and multiplicative decrease.
+    A call is too slow when it takes `latency_factor` times the moving
+    average latency; decreases happen at most once per `cooldown_sec`, so a
+    burst of failures from one overload halves the limit only once.
+    """
+
+    def __init__(
+        self,
+        max_limit: int,
+        min_limit: int = 1,
+        backoff: float = 0.5,
+        latency_factor: float = 3.0,
+        cooldown_sec: float = 1.0,
+    ):
+        self.max_limit = max(1, max_limit)
+        self.min_limit = max(1, min(min_limit, self.max_limit))
+        self.limit = float(self.max_limit)
+        self.backoff = backoff
+        self.latency_factor = latency_factor
+        self.cooldown_sec = cooldown_sec
+        self.in_flight = 0
+        self.decreases = 0
+        self._latency: Optional[float] = None  # moving average, seconds
+        self._samples = 0
+        self._last_decrease = float("-inf")
+        self._cond = threading.Condition()
+
+    def try_acquire(self) -> bool:
+        with self._cond:
+            if self.in_flight < int(self.limit):
+                self.in_flight += 1
+                return True
+            return False
+
+    def acquire(self):
+        with self._cond:
+            self._cond.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+
+    def release(self, overloaded: bool = False, latency: Optional[float] = None):
+        """
+        End a call. `latency` is given for calls that succeeded; failures
+        that say nothing about load (e.g. a 400) pass neither.
+        """
+        with self._cond:
+            self.in_flight -= 1
+            slow = (
+                latency is not None
+                and self._samples >= 10
+                and latency > self.latency_factor * self._latency
+            )
+            if overloaded or slow:
+                self._decrease()
+            elif latency is not None:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            if latency is not None:
+                self._samples += 1
+                self._latency = (
+                    latency
+                    if self._latency is None
+                    else 0.9 * self._latency + 0.1 * latency
+                )
+            self._cond.notify_all()
+
+    def _decrease(self):
+        now = time.monotonic()
+        if now - self._last_decrease < self.cooldown_sec:
+            return
+        self._last_decrease = now
+        self.limit = max(self.min_limit, self.limit * self.backoff)
+        self.decreases += 1
+
+
+def _retry_after(headers) -> Optional[float]:
+    """Seconds from a Retry-After (or OpenAI's retry-after-ms) header."""
+    if not headers:
+        return None
+    try:
+        value = headers.get("retry-after-ms")
+        if value:
+            return float(value) / 1000
+        value = headers.get("retry-after")
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            when = email.utils.parsedate_to_datetime(value)
+            return max(0.0, when.timestamp() - time.time())
+    except (TypeError, ValueError, AttributeError):
+        return None
+
+
+def http_status(err: BaseException) -> Optional[int]:
+    status = getattr(err, "status_code", None)
+    if status is None:
+        status = getattr(getattr(err, "response", None), "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def classify(err: BaseException) -> Tuple[bool, Optional[float]]:
+    """
+    (retryable, retry_after_sec) for an exception from any provider client:
+    HTTP errors from requests, httpx, the OpenAI and Cohere SDKs, or a
+    connection failure or timeout.
+    """
+    status = http_status(err)
+    if status is not None:
+        headers = getattr(getattr(err, "response", None), "headers", None)
+        headers = headers or getattr(err, "headers", None)
+        return status in RETRYABLE_STATUS, _retry_after(headers)
+    # Each client has its own connection error and timeout classes.
+    names = [cls.__name__ for cls in type(err).__mro__]
+    transient = isinstance(err, (ConnectionError, TimeoutError)) or any(
+        "Timeout" in name or "Connect" in name for name in names
+    )
+    return transient, None
+
+
+class ProviderLimiter:
+    """
+    call(fn, ...) / acall(coro_fn, ...) run one provider request within the
+    rate and concurrency limits, retrying transient failures. fn must raise
+    on HTTP errors (e.g. call raise_for_status()) for them to be retried.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        rps: float = 0.0,
+        burst: int = 1,
+        max_concurrency: int = 32,
+        max_attempts: int = RETRY_MAX_ATTEMPTS,
+        backoff_base_sec: float = RETRY_BACKOFF_BASE_SEC,
+        backoff_max_sec: float = RETRY_BACKOFF_MAX_SEC,
+        retry_after_max_sec: float = RETRY_AFTER_MAX_SEC,
+    ):
+        self.name = name
+        self.bucket = TokenBucket(rps, burst)
+        self.concurrency = AIMDLimit(max_concurrency)
+        self.max_attempts = max(1, max_attempts)
+        self.backoff_base_sec = backoff_base_sec
+        self.backoff_max_sec = backoff_max_sec
+        self.retry_after_max_sec = retry_after_max_sec
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.retries = 0
+        self.throttled = 0
+        self.failures = 0
+        self.wait_sec = 0.0
+        self.max_wait_sec = 0.0
+
+    def call(self, fn: Callable, *args, **kwargs):
+        for attempt in range(self.max_attempts):
+            start = time.monotonic()
+            self.concurrency.acquire()
+            delay = self._admit()
+            if delay > 0:
+                time.sleep(delay)
+            self._waited(start)
+            sent = time.monotonic()
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                backoff = self._failed(e, attempt)
+                if backoff is None:
+                    raise
+                time.sleep(backoff)
+                continue
+            except BaseException:
+                self.concurrency.release()
+                raise
+            self.concurrency.release(latency=time.monotonic() - sent)
+            return result
+
+    async def acall(self, fn: Callable, *args, **kwargs):
+        for attempt in range(self.max_attempts):
+            start = time.monotonic()
+            pause = 0.005
+            # Not Condition.wait: that would block the event loop.
+            while not self.concurrency.try_acquire():
+                await asyncio.sleep(pause)
+                pause = min(0.1, pause * 2)
+            delay = self._admit()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self._waited(start)
+            sent = time.monotonic()
+            try:
+                result = await fn(*args, **kwargs)
+            except Exception as e:
+                backoff = self._failed(e, attempt)
+                if backoff is None:
+                    raise
+                await asyncio.sleep(backoff)
+                continue
+            except BaseException:
+                # Cancelled (e.g. an abandoned crawl)
+                self.concurrency.release()
+                raise
+            self.concurrency.release(latency=time.monotonic() - sent)
+            return result
+
+    def _admit(self) -> float:
+        """Seconds to wait for a token and any Retry-After hold."""
+        with self._lock:
+            self.calls += 1
+            blocked = self._blocked_until - time.monotonic()
+        return max(self.bucket.reserve(), blocked)
+
+    def _waited(self, start: float):
+        waited = time.monotonic() - start
+        with self._lock:
+            self.wait_sec += waited
+            self.max_wait_sec = max(self.max_wait_sec, waited)
+        if waited >= 0.001:
+            tracing.add_to("limiter_wait_ms", round(waited * 1000, 1))
+
+    def _failed(self, err: Exception, attempt: int) -> Optional[float]:
+        """
+        Release the slot after a failed call and return the backoff before
+        the next attempt, or None if the error should propagate.
+        """
+        retryable, retry_after = classify(err)
+        self.concurrency.release(overloaded=retryable)
+        with self._lock:
+            if http_status(err) == 429:
+                self.throttled += 1
+            if retry_after is not None:
+                retry_after = min(retry_after, self.retry_after_max_sec)
+                self._blocked_until = max(
+                    self._blocked_until, time.monotonic() + retry_after
+                )
+            give_up = not retryable or attempt + 1 >= self.max_attempts
+            if give_up:
+                self.failures += 1
+                return None
+            self.retries += 1
+        tracing.add_to("retries")
+        cap = min(self.backoff_max_sec, self.backoff_base_sec * 2**attempt)
+        return max(retry_after or 0.0, random.uniform(cap / 2, cap))
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            calls = self.calls
+            return {
+                "limit": round(self.concurrency.limit, 1),
+                "max_limit": self.concurrency.max_limit,
+                "in_flight": self.concurrency.in_flight,
+                "decreases": self.concurrency.decreases,
+                "rps": self.bucket.rate,
+                "calls": calls,
+                "retries": self.retries,
+                "throttled": self.throttled,
+                "failures": self.failures,
+                "wait_ms_avg": round(self.wait_sec * 1000 / calls, 1) if calls else 0,
+                "wait_ms_max": round(self.max_wait_sec * 1000, 1),
+            }
+
+
+_limiters: Dict[str, ProviderLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def limiter(provider: str) -> ProviderLimiter:
+    """The shared limiter for a provider, configured from RATE_LIMITS."""
+    found = _limiters.get(provider)
+    if found is None:
+        with _limiters_lock:
+            found = _limiters.get(provider)
+            if found is None:
+                found = _limiters[provider] = ProviderLimiter(
+                    provider, **RATE_LIMITS.get(provider, {})
+                )
+    return found
+
+
+def limiter_metrics() -> Dict[str, dict]:
+    with _limiters_lock:
+        limiters = dict(_limiters)
+    return {name: found.snapshot() for name, found in sorted(limiters.items())}
@@ -0,0 +1,75 @@
+"""
+Fast path heuristics that stand in for decision LLM calls (--fast-path).
+
+needs_search() is a cheap local classifier for questions that obviously
+need a web search: answers must be based on references, so a factual
+first question (with no earlier answers to build on) has no other
+option, and the decision
+LLM call that would say so can be skipped. references_cover() judges from
+rerank scores whether the references found so far already answer the
+question, so the pipeline can go straight to the final answer instead of
+asking the model whether to search again.
+
+Anything not obvious is left to the decision LLM.
+"""
+
+import re
+
+from .config import FAST_PATH_MIN_DOCS, FAST_PATH_MIN_SCORE
+from tools.search import normalize_query
+
+_SMALL_TALK_RE = re.compile(
+    r"^(hi|hello|hey|thanks|thank you|thx|ok|okay|cool|great|bye|goodbye|"
+    r"good (morning|afternoon|evening|night)|who are you|what can you do|help)\b"
+)
+# Requests to work on given text rather than look something up
+_TASK_RE = re.compile(
+    r"^(translate|rewrite|rephrase|reword|summari[sz]e|shorten|proofread|fix|"
+    r"format|convert|calculate|compute|solve|write|draft|continue)\b"
+)
+_QUESTION_RE = re.compile(
+    r"^(who|whom|whose|what|when|where|which|why|how|is|are|was|were|does|do|"
+    r"did|can|could|should|will|would|has|have|had|list|compare|find|show|"
+    r"tell me|give me|explain)\b"
+)
+# Time-sensitive topics only a search can answer
+_FRESH_RE = re.compile(
+    r"\b(latest|newest|recent(ly)?|current(ly)?|today|tonight|yesterday|"
+    r"this (week|month|year)|news|price|prices|stock|score|scores|weather|"
+    r"release|released|version|update|20\d\d)\b"
+)
+MAX_QUESTION_CHARS = 400
+
+
+def needs_search(question: str) -> bool:
+    """
+    True for an information-seeking question or a time-sensitive topic,
+    e.g. "What's new in Python 3.13?" or "latest Kubernetes release";
+    False for small talk, requests to rewrite or compute something, pasted
+    text and code.
+    """
+    if len(question) > MAX_QUESTION_CHARS or "```" in question:
+        return False
+    text = normalize_query(question)
+    if len(text.split()) < 3:
+        return False
+    if _SMALL_TALK_RE.match(text) or _TASK_RE.match(text):
+        return False
+    return bool(
+        _QUESTION_RE.match(text)
+        or _FRESH_RE.search(text)
+        or question.rstrip().endswith("?")
+    )
+
+
+def references_cover(
+    docs: list,
+    min_score: float = FAST_PATH_MIN_SCORE,
+    min_docs: int = FAST_PATH_MIN_DOCS,
+) -> bool:
+    """
+    Whether at least `min_docs` reranked docs scored `min_score` or more.
+    Docs ranked without the reranker have no score and never count.
+    """
+    strong = [d for d in docs if (d.get("rerank_score") or 0.0) >= min_score]
+    return len(strong) >= min_docs
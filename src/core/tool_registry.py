@@ -1,22 +1,198 @@
+import ast
+import concurrent.futures
+import functools
+import hashlib
+import json
 import os
 import sys
 import importlib
-from typing import Dict, Any
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from . import tracing
+from .config import (
+    TOOL_CACHE_MAX_BYTES,
+    TOOL_CACHE_TTL_SEC,
+    TOOL_MAX_WORKERS,
+    TOOL_TIMEOUT_SEC,
+)
 from .logger import log
 
 
+class ToolResult:
+    """
+    Outcome of one tool call. status is "ok", "error", "timeout" or
+    "cached"; `result` is set for "ok" and "cached", `error` otherwise.
+    """
+
+    def __init__(
+        self,
+        tool_name: str,
+        args: Dict[str, Any],
+        status: str,
+        result: Any = None,
+        error: Optional[str] = None,
+        duration_ms: float = 0.0,
+    ):
+        self.tool_name = tool_name
+        self.args = args
+        self.status = status
+        self.result = result
+        self.error = error
+        self.duration_ms = duration_ms
+
+    @property
+    def ok(self) -> bool:
+        return self.status in ("ok", "cached")
+
+    def to_dict(self) -> dict:
+        return {
+            "tool": self.tool_name,
+            "status": self.status,
+            "result": self.result,
+            "error": self.error,
+            "duration_ms": self.duration_ms,
+        }
+
+
+TOOL_OPTIONS = ("TOOL_TIMEOUT_SEC", "TOOL_PURE", "TOOL_EXECUTOR", "TOOL_MAX_WORKERS")
+
+
+def _module_bindings(tree: ast.Module) -> Dict[str, List[ast.AST]]:
+    """
+    Every statement that binds a name at module level, by name, including
+    those nested in if/try/with/loop blocks (but not in functions or
+    classes). A star import is recorded under "*".
+    """
+    bindings: Dict[str, List[ast.AST]] = {}
+
+    def bind(name: str, node: ast.AST):
+        bindings.setdefault(name, []).append(node)
+
+    def visit(node: ast.AST, stmt: ast.AST):
+        if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Store):
+            bind(node.id, stmt)
+        elif isinstance(node, (ast.Import, ast.ImportFrom)):
+            for alias in node.names:
+                bind(alias.asname or alias.name.split(".")[0], node)
+            return
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            bind(node.name, node)
+            return
+        elif isinstance(node, ast.Lambda):
+            return
+        for child in ast.iter_child_nodes(node):
+            visit(child, node if isinstance(child, ast.stmt) else stmt)
+
+    for node in tree.body:
+        visit(node, node)
+    return bindings
+
+
+def read_manifest(path: str) -> Optional[Tuple[Optional[str], dict]]:
+    """
+    A tool file's name and options, read from its module-level TOOL_*
+    constants without importing it. None if it never binds TOOL_NAME;
+    a None name if it does but TOOL_NAME, an option or run() isn't a plain
+    top-level constant or def (set conditionally, imported, computed ...),
+    so the module has to be imported to find out.
+    """
+    with open(path, encoding="utf-8") as f:
+        tree = ast.parse(f.read(), filename=path)
+    bindings = _module_bindings(tree)
+    if "TOOL_NAME" not in bindings and "*" not in bindings:
+        return None
+    if "*" in bindings:
+        return None, {}
+    run = bindings.get("run", [])
+    functions = (ast.FunctionDef, ast.AsyncFunctionDef)
+    if not (len(run) == 1 and run[0] in tree.body and isinstance(run[0], functions)):
+        return None, {}
+
+    constants = {}
+    for name, nodes in bindings.items():
+        if not name.startswith("TOOL_"):
+            continue
+        node = nodes[0]
+        if len(nodes) != 1 or node not in tree.body:
+            return None, {}
+        if isinstance(node, ast.AnnAssign) and node.value is not None:
+            value = node.value
+        elif isinstance(node, ast.Assign) and len(node.targets) == 1:
+            value = node.value
+            if not isinstance(node.targets[0], ast.Name):
+                return None, {}
+        else:
+            return None, {}
+        try:
+            constants[name] = ast.literal_eval(value)
+        except ValueError:
+            return None, {}
+    name = constants.pop("TOOL_NAME")
+    if not isinstance(name, str):
+        return None, {}
+    return name, {k: v for k, v in constants.items() if k in TOOL_OPTIONS}
+
+
+def _finish_span(span: tracing.Span, future: concurrent.futures.Future):
+    # Runs when the call completes, so durations don't include time spent
+    # waiting for earlier calls in the batch. Timed-out spans are already done.
+    if span.end_time is None and not future.cancelled():
+        span.set(status="error" if future.exception() else "ok")
+        span.finish()
+
+
+def _add_sys_path(path: str):
+    # Process pool initializer, so external tools import in spawned workers.
+    if path not in sys.path:
+        sys.path.append(path)
+
+
 class ToolRegistry:
-    def __init__(self, tool_dir: str = ""):
-        self.tools = {}
+    """
+    Registers the built-in and external tools and runs them.
+
+    External tool modules define TOOL_NAME and run(**args), and may also set
+    the constants below. These are read from the source (see read_manifest),
+    so a tool's module is only imported the first time it runs.
+      TOOL_TIMEOUT_SEC  per-call timeout (default: TOOL_TIMEOUT_SEC)
+      TOOL_PURE         True if results depend only on the arguments, so they
+                        are cached by argument hash (default: False)
+      TOOL_EXECUTOR     "thread" (default) or "process" for CPU-bound tools
+      TOOL_MAX_WORKERS  most calls of the tool running at once (default:
+                        max_workers)
+
+    Each tool runs on its own pool, so a tool whose calls hang (and keep
+    running after they time out) only holds up its own later calls.
+
+    run_tools() and run_tool() are the API for running tools from code
+    built on Plexy; the Agent's decision loop only searches, through the
+    search pipeline, and doesn't dispatch tool calls itself.
+    """
+
+    def __init__(self, tool_dir: str = "", max_workers: int = TOOL_MAX_WORKERS):
+        # Tool name -> module and options, from each file's manifest; the
+        # module is imported (and its run() put in self.tools) on first use,
+        # and its pool (in self._executors) started.
+        self.modules: Dict[str, str] = {}
+        self.options: Dict[str, dict] = {}
+        self.tools: Dict[str, Callable] = {}
+        self.tool_dir = tool_dir
+        self.max_workers = max_workers
+        self._executors: Dict[str, concurrent.futures.Executor] = {}
+        self._lock = threading.Lock()
+        # Imported here: tools.cache pulls in the tools package, which
+        # imports core.
+        from tools.cache import MemoryLRU
+
+        self.cache = MemoryLRU(TOOL_CACHE_MAX_BYTES, TOOL_CACHE_TTL_SEC)
         self._load_builtin_tools()
         if tool_dir:
             self._load_external_tools(tool_dir)
 
     def _load_builtin_tools(self):
-        # Load our built-in web search tool.
-        from tools import web_search
-
-        self.tools["web_search_tool"] = web_search.run
+        # Register our built-in web search tool; it's imported on first use.
+        self._register("web_search_tool", "tools.web_search", {})
         log("Loaded built-in tool: web_search_tool")
 
     def _load_external_tools(self, tool_dir: str):
@@ -24,19 +200,185 @@ class ToolRegistry:
             log(f"Tool directory not found: {tool_dir}", error=True)
             return
         sys.path.append(tool_dir)
-        for file in os.listdir(tool_dir):
+        for file in sorted(os.listdir(tool_dir)):
             if file.endswith(".py") and not file.startswith("_"):
                 module_name = file[:-3]
                 try:
-                    module = importlib.import_module(module_name)
-                    if hasattr(module, "TOOL_NAME") and hasattr(module, "run"):
-                        self.tools[module.TOOL_NAME] = module.run
-                        log(f"Loaded external tool: {module.TOOL_NAME}")
+                    entry = read_manifest(os.path.join(tool_dir, file))
+                    if entry is not None and entry[0] is None:
+                        # Not a plain string TOOL_NAME and def run(): import.
+                        entry = self._import_manifest(module_name)
+                    if entry is None:
+                        log(
+                            f"Skipping {file}: it doesn't define TOOL_NAME and "
+                            "run() (prefix helper modules with _)",
+                            error=True,
+                        )
+                        continue
+                    name, options = entry
+                    self._register(name, module_name, options)
+                    log(f"Loaded external tool: {name}")
                 except Exception as e:
                     log(f"Error loading tool {module_name}: {e}", error=True)
 
+    @staticmethod
+    def _import_manifest(module_name: str) -> Optional[Tuple[str, dict]]:
+        module = importlib.import_module(module_name)
+        if not (hasattr(module, "TOOL_NAME") and hasattr(module, "run")):
+            return None
+        options = {k: getattr(module, k) for k in TOOL_OPTIONS if hasattr(module, k)}
+        return module.TOOL_NAME, options
+
+    def _register(self, name: str, module_name: str, options: dict):
+        executor = options.get("TOOL_EXECUTOR", "thread")
+        if executor not in ("thread", "process"):
+            log(
+                f"Unknown TOOL_EXECUTOR {executor!r} for {name}, using threads",
+                error=True,
+            )
+            executor = "thread"
+        self.modules[name] = module_name
+        self.options[name] = {
+            "timeout_sec": float(options.get("TOOL_TIMEOUT_SEC", TOOL_TIMEOUT_SEC)),
+            "pure": bool(options.get("TOOL_PURE", False)),
+            "executor": executor,
+            "max_workers": max(
+                1, int(options.get("TOOL_MAX_WORKERS", self.max_workers))
+            ),
+        }
+
+    def _tool(self, name: str) -> Callable:
+        """The tool's run function, importing its module on first use."""
+        fn = self.tools.get(name)
+        if fn is None:
+            with self._lock:
+                fn = self.tools.get(name)
+                if fn is None:
+                    module = importlib.import_module(self.modules[name])
+                    fn = self.tools[name] = module.run
+        return fn
+
+    def _executor(self, name: str) -> concurrent.futures.Executor:
+        """The tool's own pool, started on first use."""
+        options = self.options[name]
+        with self._lock:
+            if name not in self._executors:
+                if options["executor"] == "process":
+                    self._executors[name] = concurrent.futures.ProcessPoolExecutor(
+                        options["max_workers"],
+                        initializer=_add_sys_path,
+                        initargs=(self.tool_dir,),
+                    )
+                else:
+                    self._executors[name] = concurrent.futures.ThreadPoolExecutor(
+                        options["max_workers"], thread_name_prefix=f"plexy-{name}"
+                    )
+            return self._executors[name]
+
+    @staticmethod
+    def cache_key(tool_name: str, args: Dict[str, Any]) -> str:
+        payload = json.dumps(args, sort_keys=True, default=str)
+        return f"tool:{tool_name}:{hashlib.sha256(payload.encode()).hexdigest()}"
+
+    def run_tools(
+        self,
+        calls: List[Tuple[str, Dict[str, Any]]],
+        timeout_sec: Optional[float] = None,
+    ) -> List[ToolResult]:
+        """
+        Run a batch of (tool_name, args) calls concurrently and return one
+        ToolResult per call, in order. Each call gets its tool's timeout (or
+        `timeout_sec`, if given), counted from submission; a call that runs
+        over is reported as "timeout" and left to finish in the background,
+        taking up one of its tool's workers until it does.
+        Errors are caught and reported, never raised.
+        """
+        start = time.perf_counter()
+        pending = []  # (index, future, span, deadline, cache key)
+        results: List[Optional[ToolResult]] = [None] * len(calls)
+        for i, (name, args) in enumerate(calls):
+            if name not in self.options:
+                results[i] = ToolResult(name, args, "error", error="Tool not found")
+                continue
+            options = self.options[name]
+            key = self.cache_key(name, args) if options["pure"] else None
+            cached = self.cache.get(key) if key else None
+            if cached is not None:
+                results[i] = ToolResult(name, args, "cached", json.loads(cached))
+                tracing.start_span("tool", tool=name, status="cached").finish()
+                continue
+
+            try:
+                fn = self._tool(name)
+            except Exception as e:
+                log(f"Error loading tool {name}: {e}", error=True)
+                results[i] = ToolResult(
+                    name, args, "error", error=f"{type(e).__name__}: {e}"
+                )
+                continue
+
+            log(f"Executing tool: {name} with arguments: {args}")
+            span = tracing.start_span("tool", tool=name)
+            if options["executor"] == "thread":
+                fn = tracing.propagate(fn)
+            future = self._executor(name).submit(fn, **args)
+            future.add_done_callback(functools.partial(_finish_span, span))
+            timeout = options["timeout_sec"] if timeout_sec is None else timeout_sec
+            pending.append((i, future, span, start + timeout, key))
+
+        for i, future, span, deadline, key in pending:
+            name, args = calls[i]
+            try:
+                value = future.result(timeout=max(0.0, deadline - time.perf_counter()))
+            except concurrent.futures.TimeoutError:
+                future.cancel()
+                span.set(status="timeout")
+                span.finish()
+                log(f"Tool {name} timed out", error=True)
+                results[i] = ToolResult(
+                    name,
+                    args,
+                    "timeout",
+                    error=f"Timed out after {deadline - start:.1f}s",
+                    duration_ms=span.elapsed_ms(),
+                )
+                continue
+            except Exception as e:
+                _finish_span(span, future)
+                log(f"Tool {name} failed: {e}", error=True)
+                results[i] = ToolResult(
+                    name,
+                    args,
+                    "error",
+                    error=f"{type(e).__name__}: {e}",
+                    duration_ms=round(span.duration * 1000, 1),
+                )
+                continue
+            _finish_span(span, future)
+            if key:
+                try:
+                    self.cache.set(key, json.dumps(value))
+                except (TypeError, ValueError):
+                    pass
+            results[i] = ToolResult(
+                name, args, "ok", value, duration_ms=round(span.duration * 1000, 1)
+            )
+        return results
+
     def run_tool(self, tool_name: str, args: Dict[str, Any]) -> Dict[str, Any]:
-        if tool_name not in self.tools:
+        """Run one tool with its timeout; raises if it fails or times out."""
+        if tool_name not in self.options:
             raise ValueError(f"Tool not found: {tool_name}")
-        log(f"Executing tool: {tool_name} with arguments: {args}")
-        return self.tools[tool_name](**args)
+        (result,) = self.run_tools([(tool_name, args)])
+        if result.status == "timeout":
+            raise TimeoutError(f"Tool {tool_name}: {result.error}")
+        if not result.ok:
+            raise RuntimeError(f"Tool {tool_name} failed: {result.error}")
+        return result.result
+
+    def shutdown(self):
+        """Stop the worker pools without waiting for running tools."""
+        with self._lock:
+            executors, self._executors = self._executors, {}
+        for executor in executors.values():
+            executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,321 @@
+"""
+Lightweight tracing for the pipeline.
+
+A span records the wall time of one step (a decision LLM call, a Tavily
+search, a crawl, a rerank, a pipeline iteration) plus attributes such as
+token and doc counts or cache hits. Spans nest through a context variable;
+work handed to a thread pool keeps its parent span when submitted through
+propagate().
+
+Finished traces can be written to a file (configure()) as JSON lines, one
+span per line, or as OpenTelemetry OTLP/JSON, one ExportTraceServiceRequest
+per trace per line, which OTel collectors' file receivers can ingest.
+"""
+
+import contextvars
+import functools
+import json
+import os
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional
+
+from rich.markup import escape
+from rich.table import Table
+
+_current: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar(
+    "plexy_span", default=None
+)
+
+_lock = threading.Lock()
+_open_traces: Dict[str, List["Span"]] = {}
+_exporter: Optional[Callable[[List["Span"]], None]] = None
+
+
+class Span:
+    """One timed step; set attributes with set() / add()."""
+
+    def __init__(self, name: str, parent: Optional["Span"] = None, **attributes):
+        self.name = name
+        self.parent_id = parent.span_id if parent else None
+        self.trace_id = parent.trace_id if parent else secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self.attributes = dict(attributes)
+        self.start_time = time.time()
+        self.end_time: Optional[float] = None
+        self.error: Optional[str] = None
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+        self.duration = 0.0
+        # For a root span: every span of its trace, once it has finished.
+        self.trace: List["Span"] = []
+
+    def set(self, **attributes):
+        with self._lock:
+            self.attributes.update(attributes)
+
+    def add(self, key: str, value: float = 1):
+        """Increment a numeric attribute."""
+        with self._lock:
+            self.attributes[key] = self.attributes.get(key, 0) + value
+
+    def elapsed_ms(self) -> float:
+        return round((time.perf_counter() - self._start) * 1000, 1)
+
+    def finish(self, error: Optional[BaseException] = None):
+        if self.end_time is not None:
+            return
+        self.duration = time.perf_counter() - self._start
+        self.end_time = self.start_time + self.duration
+        if error is not None:
+            self.error = f"{type(error).__name__}: {error}"
+        _finished(self)
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": self.start_time,
+            "duration_ms": round(self.duration * 1000, 3),
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+def current_span() -> Optional[Span]:
+    return _current.get()
+
+
+def set_attributes(**attributes):
+    """Set attributes on the current span, if any."""
+    span = _current.get()
+    if span is not None:
+        span.set(**attributes)
+
+
+def add_to(key: str, value: float = 1):
+    """Increment an attribute on the current span, if any."""
+    span = _current.get()
+    if span is not None:
+        span.add(key, value)
+
+
+def start_span(name: str, **attributes) -> Span:
+    """
+    Start a child of the current span without making it current; call
+    finish() on it. For stages that overlap other work.
+    """
+    span = Span(name, _current.get(), **attributes)
+    if span.parent_id is None:
+        with _lock:
+            _open_traces[span.trace_id] = []
+    return span
+
+
+@contextmanager
+def span(name: str, **attributes) -> Iterator[Span]:
+    """Time the enclosed block as a child of the current span."""
+    s = start_span(name, **attributes)
+    token = _current.set(s)
+    try:
+        yield s
+    except BaseException as e:
+        if not isinstance(e, GeneratorExit):
+            s.finish(e)
+        raise
+    finally:
+        try:
+            _current.reset(token)
+        except ValueError:
+            # Closed from another context (e.g. an abandoned generator).
+            pass
+        s.finish()
+
+
+def propagate(fn: Callable) -> Callable:
+    """
+    Bind fn to the caller's context so spans it opens on another thread
+    (e.g. in a ThreadPoolExecutor) nest under the caller's current span.
+    """
+    context = contextvars.copy_context()
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        return context.copy().run(fn, *args, **kwargs)
+
+    return wrapper
+
+
+def _finished(s: Span):
+    with _lock:
+        trace = _open_traces.get(s.trace_id)
+        if trace is not None:
+            trace.append(s)
+            if s.parent_id is None:
+                del _open_traces[s.trace_id]
+        exporter = _exporter
+    if s.parent_id is None:
+        s.trace = trace or [s]
+        if exporter is not None:
+            exporter(s.trace)
+    elif trace is None and exporter is not None:
+        # Background work that outlived its trace (e.g. a late crawl).
+        exporter([s])
+
+
+def finished_subtree(span: Span) -> List[Span]:
+    """
+    The finished spans of span's subtree, span included: its trace for a
+    root span, else the part of its (possibly still open) trace under it.
+    """
+    if span.parent_id is None:
+        return span.trace
+    with _lock:
+        spans = list(_open_traces.get(span.trace_id, ()))
+    parents = {s.span_id: s.parent_id for s in spans}
+
+    def under(s: Span) -> bool:
+        span_id = s.span_id
+        while span_id is not None:
+            if span_id == span.span_id:
+                return True
+            span_id = parents.get(span_id)
+        return False
+
+    return [s for s in spans if under(s)]
+
+
+##############################################################################
+# Export
+##############################################################################
+
+
+def _otlp_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def otlp_json(spans: List[Span]) -> dict:
+    """Spans as an OTLP/JSON ExportTraceServiceRequest."""
+    return {
+        "resourceSpans": [
+            {
+                "resource": {
+                    "attributes": [
+                        {"key": "service.name", "value": {"stringValue": "plexy"}}
+                    ]
+                },
+                "scopeSpans": [
+                    {
+                        "scope": {"name": "plexy"},
+                        "spans": [
+                            {
+                                "traceId": s.trace_id,
+                                "spanId": s.span_id,
+                                "parentSpanId": s.parent_id or "",
+                                "name": s.name,
+                                "kind": 1,
+                                "startTimeUnixNano": str(int(s.start_time * 1e9)),
+                                "endTimeUnixNano": str(int(s.end_time * 1e9)),
+                                "attributes": [
+                                    {"key": k, "value": _otlp_value(v)}
+                                    for k, v in s.attributes.items()
+                                ],
+                                "status": (
+                                    {"code": 2, "message": s.error}
+                                    if s.error
+                                    else {"code": 1}
+                                ),
+                            }
+                            for s in spans
+                        ],
+                    }
+                ],
+            }
+        ]
+    }
+
+
+def configure(path: str = "", fmt: str = "jsonl"):
+    """
+    Append finished traces to `path` as "jsonl" (one span per line) or
+    "otlp" (one OTLP/JSON request per trace per line). An empty path turns
+    export off.
+    """
+    global _exporter
+    if fmt not in ("jsonl", "otlp"):
+        raise ValueError(f"Unknown trace format: {fmt!r}")
+    if not path:
+        _exporter = None
+        return
+
+    write_lock = threading.Lock()
+
+    def export(spans: List[Span]):
+        if fmt == "otlp":
+            lines = [json.dumps(otlp_json(spans), default=str)]
+        else:
+            lines = [json.dumps(s.to_dict(), default=str) for s in spans]
+        with write_lock, open(path, "a", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+
+    _exporter = export
+
+
+configure(os.getenv("TRACE_FILE", ""), os.getenv("TRACE_FORMAT", "jsonl"))
+
+
+##############################################################################
+# Summary
+##############################################################################
+
+
+def _short(value, limit: int = 60) -> str:
+    text = str(value)
+    return text if len(text) <= limit else text[: limit - 3] + "..."
+
+
+def summary_table(spans: List[Span]) -> Table:
+    """Spans of one trace as an indented tree with durations and attributes."""
+    children: Dict[Optional[str], List[Span]] = {}
+    for s in sorted(spans, key=lambda s: s.start_time):
+        children.setdefault(s.parent_id, []).append(s)
+    known = {s.span_id for s in spans}
+    roots = [s for s in spans if s.parent_id not in known]
+    roots.sort(key=lambda s: s.start_time)
+    origin = roots[0].start_time if roots else 0.0
+
+    table = Table(title="Trace")
+    table.add_column("Span")
+    table.add_column("Start ms", justify="right")
+    table.add_column("Duration ms", justify="right")
+    table.add_column("Attributes")
+
+    def add(s: Span, depth: int):
+        # Values include user queries and provider errors: not markup.
+        attrs = ", ".join(
+            f"{k}={_short(escape(str(v)))}" for k, v in s.attributes.items()
+        )
+        if s.error:
+            attrs = f"[red]{_short(escape(s.error))}[/red] {attrs}"
+        table.add_row(
+            "  " * depth + s.name,
+            f"{(s.start_time - origin) * 1000:.0f}",
+            f"{s.duration * 1000:.1f}",
+            attrs,
+        )
+        for child in children.get(s.span_id, []):
+            add(child, depth + 1)
+
+    for root in roots:
+        add(root, 0)
+    return table
@@ -0,0 +1,105 @@
+"""
+HTTP transports that send each request through its provider's limiter
+(core.ratelimit): httpx transports for the OpenAI and Cohere SDKs and the
+async clients, and a requests adapter for the shared session.
+
+Responses with a retryable status (429, 5xx) are retried by the limiter;
+the last one is returned as is, so callers still see the usual SDK or
+raise_for_status() errors. The concurrency slot is held until response
+headers arrive, i.e. for streamed responses until the first byte.
+
+Imported when the first client is built, not at startup.
+"""
+
+from typing import Callable, Optional
+
+import httpx
+from requests.adapters import HTTPAdapter
+
+from .ratelimit import RETRYABLE_STATUS, ProviderLimiter
+
+# url -> the limiter for its provider, or None to send it unlimited
+Router = Callable[[str], Optional[ProviderLimiter]]
+
+
+class RetryableResponse(Exception):
+    """A response the limiter should retry; `response` is already read."""
+
+    def __init__(self, response):
+        super().__init__(f"HTTP {response.status_code}")
+        self.response = response
+
+
+class LimitedTransport(httpx.BaseTransport):
+    def __init__(self, route: Router, inner: httpx.BaseTransport):
+        self.route = route
+        self.inner = inner
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        found = self.route(str(request.url))
+        if found is None:
+            return self.inner.handle_request(request)
+
+        def send() -> httpx.Response:
+            response = self.inner.handle_request(request)
+            if response.status_code in RETRYABLE_STATUS:
+                response.read()
+                raise RetryableResponse(response)
+            return response
+
+        try:
+            return found.call(send)
+        except RetryableResponse as e:
+            return e.response
+
+    def close(self):
+        self.inner.close()
+
+
+class LimitedAsyncTransport(httpx.AsyncBaseTransport):
+    def __init__(self, route: Router, inner: httpx.AsyncBaseTransport):
+        self.route = route
+        self.inner = inner
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        found = self.route(str(request.url))
+        if found is None:
+            return await self.inner.handle_async_request(request)
+
+        async def send() -> httpx.Response:
+            response = await self.inner.handle_async_request(request)
+            if response.status_code in RETRYABLE_STATUS:
+                await response.aread()
+                raise RetryableResponse(response)
+            return response
+
+        try:
+            return await found.acall(send)
+        except RetryableResponse as e:
+            return e.response
+
+    async def aclose(self):
+        await self.inner.aclose()
+
+
+class LimitedAdapter(HTTPAdapter):
+    def __init__(self, route: Router, **kwargs):
+        self.route = route
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        found = self.route(request.url)
+        if found is None:
+            return super().send(request, **kwargs)
+
+        def send():
+            response = super(LimitedAdapter, self).send(request, **kwargs)
+            if response.status_code in RETRYABLE_STATUS:
+                _ = response.content  # read it, releasing the connection
+                raise RetryableResponse(response)
+            return response
+
+        try:
+            return found.call(send)
+        except RetryableResponse as e:
+            return e.response
@@ -1,16 +1,16 @@
 import json
 from typing import List, Dict, Generator
-from openai import OpenAI
-
-from core.config import OPENAI_API_KEY
+from core.clients import openai_client
 from core.logger import log
 from .base import BaseModel
 
+DEFAULT_MODEL = "gpt-4o"
+
 
 class OpenAIModel(BaseModel):
     def __init__(self):
-        self.client = OpenAI(api_key=OPENAI_API_KEY)
-        self.model_name = "gpt-4o"
+        self.client = openai_client()
+        self.model_name = DEFAULT_MODEL
         # Define our tool for web searching.
         self.tools = [
             {
@@ -1,13 +1,20 @@
 import os
 import importlib
 from typing import Dict, Optional
-from .web_search import run as web_search_run
 
-DEFAULT_TOOLS = {"web_search_tool": web_search_run}
+
+def __getattr__(name):
+    # The web search tool pulls in the search clients, so it is imported on
+    # first access rather than with every tools.* submodule.
+    if name == "DEFAULT_TOOLS":
+        from .web_search import run as web_search_run
+
+        return {"web_search_tool": web_search_run}
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def load_tools(tool_dir: Optional[str] = None) -> Dict:
-    tools = DEFAULT_TOOLS.copy()
+    tools = __getattr__("DEFAULT_TOOLS")
     if tool_dir and os.path.exists(tool_dir):
         for filename in os.listdir(tool_dir):
             if filename.endswith(".py") and not filename.startswith("_"):
@@ -0,0 +1,388 @@
+"""
+asyncio versions of the pipeline helpers, used by Agent.arun_pipeline.
+
+They mirror tools.pipeline_helpers step for step and share its parsing,
+filtering and caching logic (including the in-process cache tier), but do
+their I/O with async clients so one event loop can serve many queries:
+AsyncOpenAI, cohere.AsyncClient, httpx.AsyncClient for Tavily and Crawl4AI,
+and redis.asyncio for the Redis cache tier.
+
+Clients come from core.clients and are created once per event loop.
+"""
+
+import asyncio
+import json
+import time
+import weakref
+from typing import Callable, Dict, List, Optional
+
+import redis.asyncio as aioredis
+
+from core import tracing
+from core.clients import (
+    async_cohere_client,
+    async_http_client,
+    async_openai_client,
+    per_loop_client,
+)
+from core.config import (
+    REDIS_HOST,
+    REDIS_PORT,
+    REDIS_DB,
+    CRAWL_BUDGET_SEC,
+    CRAWL_MAX_CONCURRENCY,
+    CRAWL_BATCH_SIZE,
+    PRERANK_TOP_K,
+)
+from core.decision import Decision
+from core.logger import log
+from models.openai import DEFAULT_MODEL
+from .cache import AsyncTieredCache
+from .search import search_cache, search_cache_key, tavily_request
+from . import pipeline_helpers as ph
+
+
+def _redis():
+    return per_loop_client(
+        "redis",
+        lambda: aioredis.Redis(
+            host=REDIS_HOST,
+            port=REDIS_PORT,
+            db=REDIS_DB,
+            socket_connect_timeout=2,
+            socket_timeout=5,
+        ),
+    )
+
+
+async_page_cache = AsyncTieredCache(ph.page_cache, _redis)
+async_search_cache = AsyncTieredCache(search_cache, _redis)
+
+# Keeps abandoned-but-running crawls referenced until they finish.
+_background_tasks = set()
+
+
+class AsyncSingleFlight:
+    """
+    asyncio flavour of tools.search.SingleFlight: concurrent awaits of the
+    same key on one event loop share a single execution.
+    """
+
+    def __init__(self):
+        self._calls = weakref.WeakKeyDictionary()  # loop -> {key: future}
+        self.shared = 0
+
+    async def do(self, key: str, fn: Callable):
+        calls = self._calls.setdefault(asyncio.get_running_loop(), {})
+        future = calls.get(key)
+        if future is not None:
+            self.shared += 1
+            return await asyncio.shield(future)
+        future = calls[key] = asyncio.get_running_loop().create_future()
+        try:
+            result = await fn()
+        except BaseException as e:
+            future.set_exception(e)
+            # mark retrieved so an unawaited failure isn't logged
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del calls[key]
+
+
+_inflight = AsyncSingleFlight()
+
+##############################################################################
+# 1) Crawl4AI + cache
+##############################################################################
+
+
+async def afetch_markdown_batch(
+    urls: List[str], priority: int = 10, timeout_sec: float = 240
+) -> Dict[str, Optional[str]]:
+    """
+    Async fetch_markdown_batch: one Crawl4AI task for all urls, polled with
+    the same backoff. Cancel the awaiting task to stop polling.
+    """
+    client = async_http_client()
+    headers = ph.crawl4ai_headers()
+    resp = await client.post(
+        f"{ph.CRAWL4AI_BASE_URL}/crawl",
+        headers=headers,
+        json=ph.crawl4ai_payload(urls, priority),
+    )
+    resp.raise_for_status()
+    task_id = resp.json()["task_id"]
+    deadline = time.monotonic() + timeout_sec
+    for delay in ph.poll_delays():
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise TimeoutError(f"Crawl job timed out for {', '.join(urls)}")
+        await asyncio.sleep(min(delay, remaining))
+        status_resp = await client.get(
+            f"{ph.CRAWL4AI_BASE_URL}/task/{task_id}", headers=headers
+        )
+        status_resp.raise_for_status()
+        tracing.add_to("polls")
+        done, pages = ph.crawl_task_results(status_resp.json(), urls)
+        if done:
+            return pages
+
+
+async def afetch_markdown_with_crawl4ai(
+    url: str, priority: int = 10, timeout_sec: float = 240
+) -> Optional[str]:
+    return (await afetch_markdown_batch([url], priority, timeout_sec)).get(url)
+
+
+async def acrawl_webpage_texts(
+    urls: List[str], timeout_sec: float = 240
+) -> Dict[str, Optional[str]]:
+    with tracing.span("crawl", urls=len(urls), url=urls[0]) as span:
+        try:
+            pages = await afetch_markdown_batch(urls, timeout_sec=timeout_sec)
+        except asyncio.CancelledError:
+            span.set(cancelled=True)
+            raise
+        except Exception as e:
+            log(f"Error crawling {', '.join(urls)}: {e}", error=True)
+            span.set(error=str(e))
+            return {}
+        span.set(chars=sum(len(text or "") for text in pages.values()))
+        return pages
+
+
+async def acrawl_webpage_text(url: str, timeout_sec: float = 240) -> Optional[str]:
+    return (await acrawl_webpage_texts([url], timeout_sec=timeout_sec)).get(url)
+
+
+async def aenrich_docs_with_cache(
+    docs: list,
+    budget_sec: float = CRAWL_BUDGET_SEC,
+    max_concurrency: int = CRAWL_MAX_CONCURRENCY,
+    batch_size: int = CRAWL_BATCH_SIZE,
+    cancel_pending: bool = True,
+) -> list:
+    """
+    Async enrich_docs_with_cache: same cache lookup, crawl budget, batching
+    and concurrency cap, with crawls running as tasks on the event loop.
+    """
+    with tracing.span("enrich", docs=len(docs)):
+        return await _aenrich_docs_with_cache(
+            docs, budget_sec, max_concurrency, max(1, batch_size), cancel_pending
+        )
+
+
+async def _aenrich_docs_with_cache(
+    docs: list,
+    budget_sec: float,
+    max_concurrency: int,
+    batch_size: int,
+    cancel_pending: bool,
+) -> list:
+    targets = ph.select_enrichment_targets(docs)
+    if not targets:
+        return docs
+
+    cached = await async_page_cache.get_many(targets)
+    tracing.set_attributes(cache_hits=len(cached))
+    for url, text in cached.items():
+        ph.apply_page_text(targets[url], text)
+
+    misses = [url for url in targets if url not in cached]
+    if not misses:
+        return docs
+
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+    def originals(batch: List[str]) -> List[str]:
+        return [targets[url][0]["url"] for url in batch]
+
+    async def crawl(batch: List[str]):
+        async with semaphore:
+            return await acrawl_webpage_texts(originals(batch), timeout_sec=budget_sec)
+
+    batches = [misses[i : i + batch_size] for i in range(0, len(misses), batch_size)]
+    tasks = {asyncio.create_task(crawl(batch)): batch for batch in batches}
+    done, pending = await asyncio.wait(tasks, timeout=budget_sec)
+
+    fills = {}
+    for task in done:
+        batch = tasks[task]
+        pages = task.result()
+        for url, original in zip(batch, originals(batch)):
+            new_text = pages.get(original)
+            if new_text:
+                fills[url] = new_text
+            ph.apply_page_text(targets[url], new_text)
+
+    pending_pages = sum(len(tasks[task]) for task in pending)
+    tracing.set_attributes(crawled=len(fills), pending=pending_pages)
+    if pending:
+        log(
+            f"Crawl budget of {budget_sec}s exhausted, "
+            f"returning early with {pending_pages} page(s) still pending",
+            error=True,
+        )
+        for task in pending:
+            if cancel_pending:
+                task.cancel()
+                continue
+            # Late pages are still worth caching for the next query.
+            batch = tasks[task]
+            task.add_done_callback(_cache_when_done(batch, originals(batch)))
+            _background_tasks.add(task)
+            task.add_done_callback(_background_tasks.discard)
+
+    await async_page_cache.set_many(fills)
+    return docs
+
+
+def _cache_when_done(urls: List[str], originals: List[str]):
+    def callback(task: asyncio.Task):
+        if task.cancelled():
+            return
+        pages = task.result()
+        texts = {u: pages[o] for u, o in zip(urls, originals) if pages.get(o)}
+        if texts:
+            cache_task = asyncio.ensure_future(async_page_cache.set_many(texts))
+            _background_tasks.add(cache_task)
+            cache_task.add_done_callback(_background_tasks.discard)
+
+    return callback
+
+
+##############################################################################
+# 2) Tavily
+##############################################################################
+
+
+async def atavily_search(
+    query: str,
+    max_results: int = 20,
+    include_raw_content: bool = True,
+    search_depth: str = "basic",
+) -> list:
+    """
+    Async tools.search.tavily_search, sharing its cache keys and cache.
+    """
+    params = {
+        "max_results": max_results,
+        "include_raw_content": include_raw_content,
+        "search_depth": search_depth,
+    }
+    key = search_cache_key(query, **params)
+    cached = await async_search_cache.get(key)
+    if cached is not None:
+        tracing.set_attributes(cache="hit")
+        return json.loads(cached)
+
+    async def fetch() -> list:
+        tracing.set_attributes(cache="miss")
+        resp = await async_http_client().post(**tavily_request(query, **params))
+        resp.raise_for_status()
+        results = resp.json().get("results", [])
+        await async_search_cache.set(key, json.dumps(results))
+        return results
+
+    tracing.set_attributes(cache="shared")
+    return await _inflight.do(key, fetch)
+
+
+async def asingle_tavily_search(query: str) -> list:
+    with tracing.span("tavily", query=query) as span:
+        results = await atavily_search(
+            query, max_results=20, include_raw_content=True
+        )
+        span.set(results=len(results))
+    return ph.shape_tavily_results(results)
+
+
+async def atavily_in_parallel(search_queries: List[str]) -> list:
+    with tracing.span("tavily_in_parallel", queries=len(search_queries)) as span:
+        results = await asyncio.gather(
+            *(asingle_tavily_search(q) for q in search_queries),
+            return_exceptions=True,
+        )
+        all_docs = []
+        for query, docs in zip(search_queries, results):
+            # Like streaming_search: a failed query is logged and dropped.
+            if isinstance(docs, BaseException):
+                log(f"Tavily search failed for {query!r}: {docs}", error=True)
+                continue
+            all_docs.extend(docs)
+        docs = ph.filter_by_score_dropoff(all_docs, drop_threshold=0.15)
+        span.set(docs=len(docs))
+    return docs
+
+
+##############################################################################
+# 3) Cohere Re-Rank
+##############################################################################
+
+
+async def acohere_rerank(user_query: str, docs: list, top_n: int = 10) -> list:
+    if not docs:
+        return []
+
+    with tracing.span("rerank", docs=len(docs)) as span:
+        return await _acohere_rerank(user_query, docs, top_n, span)
+
+
+async def _acohere_rerank(
+    user_query: str, docs: list, top_n: int, span: tracing.Span
+) -> list:
+    valid_docs = ph.valid_rerank_docs(docs)
+    if not valid_docs:
+        log("No valid docs to re-rank, returning empty list.", error=False)
+        return []
+
+    ranking = ph.prerank_docs(user_query, valid_docs)
+    candidates = ranking.top_passages(PRERANK_TOP_K)
+    span.set(passages=len(ranking.passages), sent=len(candidates))
+    if not candidates:
+        return ranking.top_docs(top_n)
+
+    try:
+        resp = await async_cohere_client().rerank(
+            model=ph.RERANK_MODEL,
+            query=ph.rerank_query(user_query),
+            documents=[ranking.passages[p] for p in candidates],
+            top_n=len(candidates),
+        )
+    except Exception as e:
+        log(f"Cohere re-rank error: {e}, using local BM25 ranking", error=True)
+        span.set(fallback="bm25")
+        return ranking.top_docs(top_n)
+
+    return ph.reranked_docs(ranking, candidates, resp.results, top_n, span)
+
+
+##############################################################################
+# 4) Decision Step
+##############################################################################
+
+
+async def acall_decision_llm(
+    conversation_history: list, debug: bool = False
+) -> Optional[Decision]:
+    if debug:
+        log(f"Decision prompt messages: {conversation_history}", error=False)
+
+    with tracing.span("decision_llm", messages=len(conversation_history)) as span:
+        try:
+            completion = await async_openai_client().beta.chat.completions.parse(
+                model=DEFAULT_MODEL,
+                messages=conversation_history,
+                **ph.DECISION_PARAMS,
+            )
+        except Exception as e:
+            if debug:
+                log(f"Decision LLM parse error: {e}", error=True)
+            span.set(error=str(e))
+            return None
+
+        return ph.parsed_decision(completion, conversation_history)
@@ -0,0 +1,457 @@
+"""
+Shared pieces of Plexy's caches: the versioned value format, canonical URL
+keys, hit/size statistics, and a two-tier cache (in-process LRU in front of
+Redis) used for crawled pages and search results.
+
+Cached values are stored as
+    b"PX" + <format version byte> + <codec byte> + payload
+where the codec is raw UTF-8, zlib or zstd. Values without the header are
+treated as legacy plain-text entries.
+"""
+
+import re
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from core.config import REDIS_DB, REDIS_HOST, REDIS_PORT
+from core import tracing
+from core.logger import log
+
+try:
+    import zstandard
+except ImportError:  # optional dependency, fall back to zlib
+    zstandard = None
+
+CACHE_FORMAT_VERSION = 1
+
+_MAGIC = b"PX"
+_CODEC_RAW = b"r"
+_CODEC_ZLIB = b"z"
+_CODEC_ZSTD = b"s"
+
+# Below this size compression isn't worth the header and CPU.
+MIN_COMPRESS_BYTES = 512
+
+# Query parameters that never change page content.
+TRACKING_PARAMS = {
+    "fbclid",
+    "gclid",
+    "dclid",
+    "msclkid",
+    "yclid",
+    "igshid",
+    "mc_cid",
+    "mc_eid",
+    "_ga",
+    "_hsenc",
+    "_hsmi",
+}
+
+
+class LazyRedis:
+    """
+    A redis.Redis that is only built, and the redis package only imported,
+    when a command is first sent, so importing tools.cache (e.g. for
+    MemoryLRU) stays cheap.
+    """
+
+    def __init__(self, **kwargs):
+        self._kwargs = kwargs
+        self._client = None
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    import redis
+
+                    self._client = redis.Redis(**self._kwargs)
+        return getattr(self._client, name)
+
+
+def redis_error() -> type:
+    """
+    redis.exceptions.RedisError, for `except redis_error():` around Redis
+    calls; the expression is only evaluated once a call has raised, by
+    which point the client has imported redis.
+    """
+    from redis.exceptions import RedisError
+
+    return RedisError
+
+
+# Shared client for all Redis-backed caches. Values are binary (see
+# encode_value), so responses are not decoded. Short timeouts let the caches
+# fall back to memory-only quickly.
+rclient = LazyRedis(
+    host=REDIS_HOST,
+    port=REDIS_PORT,
+    db=REDIS_DB,
+    socket_connect_timeout=2,
+    socket_timeout=5,
+)
+
+
+def available_compression() -> str:
+    return "zstd" if zstandard is not None else "zlib"
+
+
+def encode_value(text: str, compression: str = "zstd", max_chars: int = 0) -> bytes:
+    """
+    Encode text for storage, truncating to max_chars (0 = unlimited) and
+    compressing with the requested codec. "zstd" quietly falls back to zlib
+    when the zstandard package isn't installed; "none" stores raw UTF-8.
+    """
+    if max_chars and len(text) > max_chars:
+        text = text[:max_chars]
+    data = text.encode("utf-8")
+    header = _MAGIC + bytes([CACHE_FORMAT_VERSION])
+    if compression == "none" or len(data) < MIN_COMPRESS_BYTES:
+        return header + _CODEC_RAW + data
+    if compression == "zstd" and zstandard is not None:
+        return header + _CODEC_ZSTD + zstandard.ZstdCompressor(level=3).compress(data)
+    return header + _CODEC_ZLIB + zlib.compress(data, 6)
+
+
+def decode_value(raw) -> Optional[str]:
+    """
+    Decode a value written by encode_value (or a legacy plain string).
+    Returns None for values we can't read, so callers treat them as misses.
+    """
+    if raw is None:
+        return None
+    if isinstance(raw, str):
+        return raw
+    if not raw.startswith(_MAGIC):
+        return raw.decode("utf-8", errors="replace")
+    version, codec, payload = raw[2], raw[3:4], raw[4:]
+    if version != CACHE_FORMAT_VERSION:
+        return None
+    try:
+        if codec == _CODEC_RAW:
+            return payload.decode("utf-8")
+        if codec == _CODEC_ZLIB:
+            return zlib.decompress(payload).decode("utf-8")
+        if codec == _CODEC_ZSTD and zstandard is not None:
+            return zstandard.ZstdDecompressor().decompress(payload).decode("utf-8")
+    except (zlib.error, UnicodeDecodeError, ValueError):
+        return None
+    return None
+
+
+def canonicalize_url(url: str) -> str:
+    """
+    Normalize a URL so trivially different spellings share one cache entry:
+    lowercase scheme/host, drop default ports, fragments, trailing slashes,
+    utm_* and click-tracking params, and sort the remaining query params.
+    """
+    try:
+        parts = urlsplit(url.strip())
+        port = parts.port
+    except ValueError:
+        return url
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if port is None or (scheme, port) in (("http", 80), ("https", 443)):
+        netloc = host
+    else:
+        netloc = f"{host}:{port}"
+    path = re.sub(r"/{2,}", "/", parts.path)
+    if len(path) > 1:
+        path = path.rstrip("/")
+    query = sorted(
+        (k, v)
+        for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not k.lower().startswith("utm_") and k.lower() not in TRACKING_PARAMS
+    )
+    return urlunsplit((scheme, netloc, path, urlencode(query), ""))
+
+
+class CacheStats:
+    """Thread-safe hit/miss and byte counters for one cache."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.raw_bytes = 0
+        self.stored_bytes = 0
+
+    def record_lookups(self, hits: int, misses: int):
+        with self._lock:
+            self.hits += hits
+            self.misses += misses
+
+    def record_write(self, raw_bytes: int, stored_bytes: int):
+        with self._lock:
+            self.writes += 1
+            self.raw_bytes += raw_bytes
+            self.stored_bytes += stored_bytes
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "name": self.name,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "writes": self.writes,
+                "raw_bytes": self.raw_bytes,
+                "stored_bytes": self.stored_bytes,
+                "bytes_saved": self.raw_bytes - self.stored_bytes,
+                "compression_ratio": (
+                    self.raw_bytes / self.stored_bytes if self.stored_bytes else 1.0
+                ),
+            }
+
+
+class MemoryLRU:
+    """
+    Thread-safe in-process LRU of str values with per-entry TTLs, bounded by
+    the total size of keys and values in bytes. max_bytes=0 disables it.
+    """
+
+    def __init__(self, max_bytes: int, ttl_sec: float):
+        self.max_bytes = max_bytes
+        self.ttl_sec = ttl_sec
+        self._entries = OrderedDict()  # key -> (value, size, expires_at)
+        self._lock = threading.Lock()
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, size, expires_at = entry
+            if expires_at <= time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: str, value: str, ttl_sec: Optional[float] = None):
+        size = len(key) + len(value.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        ttl = self.ttl_sec if ttl_sec is None else min(ttl_sec, self.ttl_sec)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, size, time.monotonic() + ttl)
+            self.size_bytes += size
+            while self.size_bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def _remove(self, key: str):
+        _, size, _ = self._entries.pop(key)
+        self.size_bytes -= size
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "size_bytes": self.size_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+class TieredCache:
+    """
+    In-process MemoryLRU in front of Redis. Lookups try memory first and
+    batch the rest into one MGET; writes go to both tiers, Redis via one
+    pipeline. Values are encoded with encode_value() before hitting Redis.
+
+    If Redis errors (e.g. it's unreachable) the cache keeps working from
+    memory only and retries Redis after `redis_retry_sec`.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        redis_client,
+        prefix: str,
+        ttl_sec: int,
+        memory_max_bytes: int,
+        memory_ttl_sec: float,
+        compression: str = "zstd",
+        max_chars: int = 0,
+        redis_retry_sec: float = 30.0,
+    ):
+        self.name = name
+        self.redis = redis_client
+        self.prefix = prefix
+        self.ttl_sec = ttl_sec
+        self.memory = MemoryLRU(memory_max_bytes, memory_ttl_sec)
+        self.compression = compression
+        self.max_chars = max_chars
+        self.redis_retry_sec = redis_retry_sec
+        self.stats = CacheStats(name)
+        self._redis_down_until = 0.0
+
+    @property
+    def redis_available(self) -> bool:
+        return self.redis is not None and time.monotonic() >= self._redis_down_until
+
+    def _redis_failed(self, op: str, err: Exception):
+        if self.redis_available:
+            log(
+                f"{self.name} cache: Redis {op} failed ({err}); "
+                f"using memory only for {self.redis_retry_sec:.0f}s",
+                error=True,
+            )
+        self._redis_down_until = time.monotonic() + self.redis_retry_sec
+
+    # The lookup/write steps are split out so AsyncTieredCache can share
+    # them and only swap in its own Redis round trips.
+
+    def _lookup_memory(self, keys: Iterable[str]):
+        keys = list(dict.fromkeys(keys))
+        hits = {}
+        remote = []
+        for key in keys:
+            value = self.memory.get(key)
+            if value is not None:
+                hits[key] = value
+            else:
+                remote.append(key)
+        return keys, hits, remote
+
+    def _absorb_remote(self, remote: List[str], raws: list, hits: Dict[str, str]):
+        for key, raw in zip(remote, raws):
+            value = decode_value(raw)
+            if value:
+                hits[key] = value
+                self.memory.set(key, value)
+
+    def _prepare_write(self, values: Dict[str, str], ttl_sec: int) -> Dict[str, bytes]:
+        """Writes the memory tier and returns the encoded values for Redis."""
+        encoded = {}
+        for key, value in values.items():
+            data = encode_value(value, self.compression, self.max_chars)
+            encoded[self.prefix + key] = data
+            self.stats.record_write(len(value.encode("utf-8")), len(data))
+            # keep memory consistent with what Redis would return
+            if self.max_chars and len(value) > self.max_chars:
+                value = value[: self.max_chars]
+            self.memory.set(key, value, ttl_sec)
+        return encoded
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, str]:
+        """Returns {key: value} for the hits only."""
+        keys, hits, remote = self._lookup_memory(keys)
+        if remote and self.redis_available:
+            with tracing.span("redis.mget", cache=self.name, keys=len(remote)) as s:
+                try:
+                    raws = self.redis.mget([self.prefix + k for k in remote])
+                except redis_error() as e:
+                    self._redis_failed("MGET", e)
+                    raws = []
+                memory_hits = len(hits)
+                self._absorb_remote(remote, raws, hits)
+                s.set(hits=len(hits) - memory_hits)
+        self.stats.record_lookups(len(hits), len(keys) - len(hits))
+        return hits
+
+    def get(self, key: str) -> Optional[str]:
+        return self.get_many([key]).get(key)
+
+    def set_many(self, values: Dict[str, str], ttl_sec: Optional[int] = None):
+        if not values:
+            return
+        ttl_sec = self.ttl_sec if ttl_sec is None else ttl_sec
+        encoded = self._prepare_write(values, ttl_sec)
+        if not self.redis_available:
+            return
+        with tracing.span("redis.set", cache=self.name, keys=len(encoded)):
+            try:
+                pipe = self.redis.pipeline(transaction=False)
+                for redis_key, data in encoded.items():
+                    pipe.set(redis_key, data, ex=ttl_sec)
+                pipe.execute()
+            except redis_error() as e:
+                self._redis_failed("SET", e)
+
+    def set(self, key: str, value: str, ttl_sec: Optional[int] = None):
+        self.set_many({key: value}, ttl_sec)
+
+    def snapshot(self) -> dict:
+        snap = self.stats.snapshot()
+        snap["memory"] = self.memory.snapshot()
+        snap["redis_available"] = self.redis_available
+        return snap
+
+
+class AsyncTieredCache:
+    """
+    asyncio counterpart of TieredCache. It shares the wrapped cache's memory
+    tier, stats and Redis health, and talks to Redis through an async client
+    returned by `redis_factory()` (one per event loop).
+    """
+
+    def __init__(self, cache: TieredCache, redis_factory: Callable):
+        self.cache = cache
+        self.redis_factory = redis_factory
+
+    async def get_many(self, keys: Iterable[str]) -> Dict[str, str]:
+        cache = self.cache
+        keys, hits, remote = cache._lookup_memory(keys)
+        if remote and cache.redis_available:
+            with tracing.span("redis.mget", cache=cache.name, keys=len(remote)) as s:
+                try:
+                    raws = await self.redis_factory().mget(
+                        [cache.prefix + k for k in remote]
+                    )
+                except redis_error() as e:
+                    cache._redis_failed("MGET", e)
+                    raws = []
+                memory_hits = len(hits)
+                cache._absorb_remote(remote, raws, hits)
+                s.set(hits=len(hits) - memory_hits)
+        cache.stats.record_lookups(len(hits), len(keys) - len(hits))
+        return hits
+
+    async def get(self, key: str) -> Optional[str]:
+        return (await self.get_many([key])).get(key)
+
+    async def set_many(self, values: Dict[str, str], ttl_sec: Optional[int] = None):
+        cache = self.cache
+        if not values:
+            return
+        ttl_sec = cache.ttl_sec if ttl_sec is None else ttl_sec
+        encoded = cache._prepare_write(values, ttl_sec)
+        if not cache.redis_available:
+            return
+        with tracing.span("redis.set", cache=cache.name, keys=len(encoded)):
+            try:
+                pipe = self.redis_factory().pipeline(transaction=False)
+                for redis_key, data in encoded.items():
+                    pipe.set(redis_key, data, ex=ttl_sec)
+                await pipe.execute()
+            except redis_error() as e:
+                cache._redis_failed("SET", e)
+
+    async def set(self, key: str, value: str, ttl_sec: Optional[int] = None):
+        await self.set_many({key: value}, ttl_sec)
@@ -0,0 +1,156 @@
+"""
+Token-budgeted packing of search results into the decision prompt.
+
+Instead of pasting every doc's full content (often whole crawled pages)
+into the prompt, ReferencePacker keeps only the passages most relevant to
+the question, fits them into a per-question token budget, and sends each
+URL once per conversation under a stable reference number.
+"""
+
+from typing import Dict, Iterable, List, Tuple
+
+from .cache import canonicalize_url
+from .prerank import bm25_scores
+from .text_utils import count_tokens, split_passages
+
+# Don't bother including a reference with less room than this.
+MIN_REFERENCE_TOKENS = 48
+
+
+def score_passages(query: str, passages: List[str]) -> List[float]:
+    """BM25 score of each passage for the query."""
+    return bm25_scores(query, passages).tolist()
+
+
+def select_passages(query: str, text: str, budget_tokens: int) -> str:
+    """
+    The most query-relevant passages of text that fit in budget_tokens,
+    joined in their original order with " ... " between gaps.
+    """
+    if count_tokens(text) <= budget_tokens:
+        return " ".join(text.split())
+    passages = split_passages(text)
+    scores = score_passages(query, passages)
+    ranked = sorted(range(len(passages)), key=lambda i: (-scores[i], i))
+    chosen = []
+    used = 0
+    for i in ranked:
+        cost = count_tokens(passages[i])
+        if used + cost > budget_tokens:
+            continue
+        chosen.append(i)
+        used += cost
+    if not chosen and passages:
+        # Even the best passage is too long: keep its head.
+        best = passages[ranked[0]]
+        return best[: budget_tokens * 4]
+    chosen.sort()
+    parts = []
+    for prev, i in zip([None] + chosen, chosen):
+        if prev is not None and i != prev + 1:
+            parts.append("...")
+        parts.append(passages[i])
+    return " ".join(parts)
+
+
+class ReferencePacker:
+    """
+    Assigns conversation-wide reference numbers to docs and renders new ones
+    within a token budget per question.
+
+    Call start_question() when a new user question arrives; each pack() then
+    spends from that question's budget, splitting what's left evenly over
+    the new docs in rank order (unused share rolls over to later docs).
+
+    The rendered text of every reference sent is kept in `blocks`, so the
+    prompt can be rebuilt with only some of them (see forget()).
+    """
+
+    def __init__(self, budget_tokens: int):
+        self.budget_tokens = budget_tokens
+        self.numbers: Dict[str, int] = {}
+        self.blocks: Dict[int, str] = {}
+        self.used_tokens = 0
+        self._next_number = 1
+
+    def start_question(self):
+        self.used_tokens = 0
+
+    @property
+    def remaining_tokens(self) -> int:
+        return max(0, self.budget_tokens - self.used_tokens)
+
+    def forget(self, numbers: Iterable[int]) -> int:
+        """
+        Drop references from the conversation; their URLs get new numbers
+        if found again, so numbers cited in earlier answers stay unique.
+        Returns how many were dropped.
+        """
+        numbers = set(numbers) & set(self.blocks)
+        for number in numbers:
+            del self.blocks[number]
+        self.numbers = {k: n for k, n in self.numbers.items() if n not in numbers}
+        return len(numbers)
+
+    def sent(self, numbers: Iterable[int]) -> List[dict]:
+        """
+        The given references as {"ref", "key", "block"}, to restore() in
+        another conversation.
+        """
+        keys = {n: key for key, n in self.numbers.items()}
+        return [
+            {"ref": n, "key": keys[n], "block": self.blocks[n]}
+            for n in sorted(numbers)
+            if n in self.blocks and n in keys
+        ]
+
+    def restore(self, references: Iterable[dict]):
+        """
+        Take over references sent() elsewhere under the same numbers, so
+        text citing them keeps pointing at the same sources and new
+        references are numbered after them.
+        """
+        for ref in references:
+            self.numbers[ref["key"]] = ref["ref"]
+            self.blocks[ref["ref"]] = ref["block"]
+            self._next_number = max(self._next_number, ref["ref"] + 1)
+
+    def pack(self, query: str, docs: list) -> Tuple[str, List[dict]]:
+        """
+        Returns (reference_block, refs): the rendered text for docs not sent
+        before, and a compact {"ref", "title", "url"} entry for every doc
+        (new or already known) to use in the tool result.
+        """
+        refs = []
+        new_docs = []
+        for doc in docs:
+            key = canonicalize_url(doc.get("url", "")) or doc.get("title", "")
+            if key not in self.numbers:
+                if self.remaining_tokens < MIN_REFERENCE_TOKENS * (len(new_docs) + 1):
+                    continue
+                self.numbers[key] = self._next_number
+                self._next_number += 1
+                new_docs.append((self.numbers[key], doc))
+            refs.append(
+                {
+                    "ref": self.numbers[key],
+                    "title": doc.get("title", "Untitled"),
+                    "url": doc.get("url", "#"),
+                }
+            )
+
+        blocks = []
+        for position, (number, doc) in enumerate(new_docs):
+            header = (
+                f"[{number}] Title: {doc.get('title','Untitled')}\n"
+                f"   URL: {doc.get('url','#')}\n"
+                f"   Snippet:\n   \""
+            )
+            share = self.remaining_tokens // (len(new_docs) - position)
+            room = max(0, share - count_tokens(header) - 2)
+            snippet = select_passages(query, doc.get("content", ""), room)
+            block = f"{header}{snippet}\"\n---\n"
+            self.used_tokens += count_tokens(block)
+            self.blocks[number] = block
+            blocks.append(block)
+        return "\n".join(blocks), refs
@@ -0,0 +1,155 @@
+"""
+Duplicate and near-duplicate detection for search results.
+
+Two docs are duplicates when their URLs identify the same page (after
+canonicalization that also folds http/https, www./m. hosts and AMP
+variants), or when their content is nearly identical, as with syndicated
+articles and mirrors. Near-duplicates are found with MinHash signatures
+over word shingles and an LSH band index, so each new doc is only compared
+against the few docs sharing a band with it and dedup stays linear in the
+number of docs.
+"""
+
+import re
+import zlib
+from collections import defaultdict
+from typing import Dict, List, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+import numpy as np
+
+from core.config import NEAR_DUP_THRESHOLD
+from .cache import canonicalize_url
+from .text_utils import terms
+
+# Only the head of long pages is signed; it's plenty to tell copies apart.
+MAX_SIGNATURE_CHARS = 20000
+SHINGLE_WORDS = 3
+# Texts with fewer shingles than this are too short to compare reliably.
+MIN_SHINGLES = 8
+
+_PRIME = (1 << 31) - 1
+_AMP_CACHE_PATH_RE = re.compile(r"^/[cvi]/(?:s/)?([^/]+)(/.*)?$")
+_HOST_PREFIXES = ("www.", "m.", "amp.")
+_AMP_QUERY_PARAMS = {
+    ("amp", ""),
+    ("amp", "1"),
+    ("amp", "true"),
+    ("outputtype", "amp"),
+}
+
+
+def dedup_url(url: str) -> str:
+    """
+    Scheme-less identity of a page's URL: canonicalize_url, then unwrap AMP
+    cache URLs and drop www./m./amp. host prefixes and AMP path or query
+    markers.
+    """
+    parts = urlsplit(canonicalize_url(url))
+    host = parts.netloc
+    path = parts.path
+    if host.endswith(".cdn.ampproject.org"):
+        match = _AMP_CACHE_PATH_RE.match(path)
+        if match:
+            host, path = match.group(1).lower(), match.group(2) or ""
+    for prefix in _HOST_PREFIXES:
+        if host.startswith(prefix):
+            host = host[len(prefix) :]
+            break
+    if path.endswith(".amp.html"):
+        path = path[: -len(".amp.html")] + ".html"
+    path = re.sub(r"(^|/)amp(/|$)", r"\1", path).rstrip("/")
+    query = [
+        (k, v)
+        for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if (k.lower(), v.lower()) not in _AMP_QUERY_PARAMS
+    ]
+    query_string = urlencode(query)
+    return f"{host}{path}?{query_string}" if query_string else f"{host}{path}"
+
+
+class MinHasher:
+    """MinHash signatures of word-shingle sets, vectorized over permutations."""
+
+    def __init__(self, num_perm: int = 64, seed: int = 1):
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self.a = rng.integers(1, _PRIME, num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, _PRIME, num_perm, dtype=np.uint64)
+
+    def signature(self, text: str) -> Optional[np.ndarray]:
+        """Signature of text, or None if it's too short to compare."""
+        words = terms(text[:MAX_SIGNATURE_CHARS])
+        if len(words) < SHINGLE_WORDS + MIN_SHINGLES - 1:
+            return None
+        # Hash words once, then combine neighbours into shingle hashes.
+        word_hashes = np.array(
+            [zlib.crc32(w.encode("utf-8")) for w in words], dtype=np.uint64
+        )
+        count = len(words) - SHINGLE_WORDS + 1
+        shingles = np.zeros(count, dtype=np.uint64)
+        for offset in range(SHINGLE_WORDS):
+            shingles = (shingles * np.uint64(1000003)) ^ word_hashes[
+                offset : offset + count
+            ]
+        shingles = np.unique(shingles % np.uint64(_PRIME))
+        if len(shingles) < MIN_SHINGLES:
+            return None
+        return ((self.a[:, None] * shingles[None, :] + self.b[:, None]) % _PRIME).min(
+            axis=1
+        )
+
+
+_hasher = MinHasher()
+
+
+class DedupIndex:
+    """
+    Incremental duplicate filter: add() each doc as it arrives and keep it
+    only if it returns True. The first doc of a duplicate group wins.
+
+    With 16 bands of 4 rows, docs sharing a band are compared and treated
+    as near-duplicates when their estimated Jaccard similarity is at least
+    `threshold`.
+    """
+
+    def __init__(self, threshold: float = NEAR_DUP_THRESHOLD, bands: int = 16):
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = _hasher.num_perm // bands
+        self.keys = set()
+        self.signatures: List[np.ndarray] = []
+        self.buckets: Dict[bytes, List[int]] = defaultdict(list)
+        self.url_duplicates = 0
+        self.near_duplicates = 0
+
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        rows = self.rows
+        return [
+            bytes([band]) + signature[band * rows : (band + 1) * rows].tobytes()
+            for band in range(self.bands)
+        ]
+
+    def add(self, doc: dict) -> bool:
+        """Register doc; False if it duplicates a doc added before."""
+        url = doc.get("url", "")
+        key = dedup_url(url) if url else ("title", doc.get("title", ""))
+        if key in self.keys:
+            self.url_duplicates += 1
+            return False
+        self.keys.add(key)
+
+        signature = _hasher.signature(doc.get("content", ""))
+        if signature is None:
+            return True
+        band_keys = self._band_keys(signature)
+        candidates = {i for band in band_keys for i in self.buckets.get(band, ())}
+        for i in candidates:
+            if np.mean(self.signatures[i] == signature) >= self.threshold:
+                self.near_duplicates += 1
+                return False
+
+        self.signatures.append(signature)
+        for band in band_keys:
+            self.buckets[band].append(len(self.signatures) - 1)
+        return True
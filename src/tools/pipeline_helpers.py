@@ -1,26 +1,44 @@
 import os
 import json
-import redis
-import requests
+import math
+import random
+import threading
 import time
 import concurrent.futures
 from datetime import datetime
-from typing import Optional, List
+from typing import Optional, List, Dict, Generator, Iterator, Tuple
 
-from cohere import Client as CohereClient
-from tavily import TavilyClient
 from pydantic import BaseModel
 
+from core import tracing
 from core.logger import log
+from core.clients import cohere_client, http_session
 from core.config import (
-    TAVILY_API_KEY,
-    REDIS_HOST,
-    REDIS_PORT,
-    REDIS_DB,
     OPENAI_API_KEY,
+    CRAWL_BUDGET_SEC,
+    CRAWL_MAX_CONCURRENCY,
+    HTTP_TIMEOUT_SEC,
+    SEARCH_QUORUM,
+    SEARCH_DEADLINE_SEC,
+    CRAWL_CACHE_TTL_SEC,
+    CRAWL_CACHE_MAX_CHARS,
+    CACHE_COMPRESSION,
+    PAGE_MEMORY_CACHE_MAX_BYTES,
+    MEMORY_CACHE_TTL_SEC,
+    CRAWL_BATCH_SIZE,
+    CRAWL_POLL_INITIAL_SEC,
+    CRAWL_POLL_MAX_SEC,
+    PASSAGE_MAX_CHARS,
+    PRERANK_TOP_K,
+    SPECULATIVE_MIN_OVERLAP,
 )
 from models.openai import OpenAIModel
 from core.decision import Decision
+from .cache import TieredCache, canonicalize_url, rclient
+from .dedup import DedupIndex
+from .prerank import PassageRanking
+from .search import search_cache, tavily_search
+from .text_utils import terms
 
 ##############################################################################
 # 1) Redis + Crawl4AI caching
@@ -29,80 +47,441 @@ from core.decision import Decision
 CRAWL4AI_BASE_URL = os.getenv("CRAWL4AI_BASE_URL", "http://localhost:11235")
 CRAWL4AI_API_TOKEN = os.getenv("CRAWL4AI_API_TOKEN", "your_secret_token")
 
-rclient = redis.Redis(
-    host=REDIS_HOST, port=REDIS_PORT, db=REDIS_DB, decode_responses=True
+CRAWL_CACHE_PREFIX = "crawl4ai:markdown:v1:"
+
+page_cache = TieredCache(
+    "crawl4ai",
+    rclient,
+    prefix=CRAWL_CACHE_PREFIX,
+    ttl_sec=CRAWL_CACHE_TTL_SEC,
+    memory_max_bytes=PAGE_MEMORY_CACHE_MAX_BYTES,
+    memory_ttl_sec=MEMORY_CACHE_TTL_SEC,
+    compression=CACHE_COMPRESSION,
+    max_chars=CRAWL_CACHE_MAX_CHARS,
 )
 
 
 def cache_key_for_url(url: str) -> str:
-    return f"crawl4ai:markdown:{url}"
+    return CRAWL_CACHE_PREFIX + canonicalize_url(url)
 
 
-def fetch_markdown_with_crawl4ai(
-    url: str, priority: int = 10, timeout_sec: int = 240
-) -> Optional[str]:
+def crawl4ai_headers() -> dict:
     headers = {}
     if CRAWL4AI_API_TOKEN:
         headers["Authorization"] = f"Bearer {CRAWL4AI_API_TOKEN}"
-    resp = requests.post(
+    return headers
+
+
+class CrawlCancelled(Exception):
+    """The caller stopped waiting for a crawl (e.g. its deadline passed)."""
+
+
+def poll_delays(
+    initial: float = CRAWL_POLL_INITIAL_SEC,
+    maximum: float = CRAWL_POLL_MAX_SEC,
+    factor: float = 2.0,
+) -> Iterator[float]:
+    """
+    Waits between task status polls: exponential backoff from `initial` up
+    to `maximum`, each drawn from [delay/2, delay] so parallel crawls don't
+    poll in lockstep.
+    """
+    delay = initial
+    while True:
+        yield random.uniform(delay / 2, delay)
+        delay = min(maximum, delay * factor)
+
+
+def crawl_task_results(
+    js: dict, urls: List[str]
+) -> Tuple[bool, Dict[str, Optional[str]]]:
+    """
+    Interpret a /task/{id} response as (done, {url: markdown}). A batch task
+    has one entry per submitted url in `results`; pages that failed
+    individually map to None. Raises if the whole job failed.
+    """
+    if js["status"] == "failed":
+        raise RuntimeError(
+            f"Crawl4AI job failed for {', '.join(urls)}: {js.get('error', 'unknown')}"
+        )
+    if js["status"] != "completed":
+        return False, {}
+    results = js.get("results") or [js.get("result") or {}]
+    by_url = {canonicalize_url(r.get("url", "")): r for r in results}
+    pages = {}
+    for i, url in enumerate(urls):
+        result = by_url.get(canonicalize_url(url))
+        if result is None and len(results) == len(urls):
+            # Results are in submission order; the url may have redirected.
+            result = results[i]
+        if result and result.get("success", True):
+            pages[url] = result.get("markdown")
+        else:
+            pages[url] = None
+    return True, pages
+
+
+def crawl4ai_payload(urls: List[str], priority: int) -> dict:
+    return {"urls": urls if len(urls) > 1 else urls[0], "priority": priority}
+
+
+def fetch_markdown_batch(
+    urls: List[str],
+    priority: int = 10,
+    timeout_sec: float = 240,
+    cancel: Optional[threading.Event] = None,
+) -> Dict[str, Optional[str]]:
+    """
+    Crawl several pages as one Crawl4AI task and poll it with backoff until
+    it completes. Raises TimeoutError after timeout_sec, or CrawlCancelled
+    as soon as `cancel` is set.
+    """
+    session = http_session()
+    headers = crawl4ai_headers()
+    resp = session.post(
         f"{CRAWL4AI_BASE_URL}/crawl",
         headers=headers,
-        json={"urls": url, "priority": priority},
+        json=crawl4ai_payload(urls, priority),
+        timeout=HTTP_TIMEOUT_SEC,
     )
     resp.raise_for_status()
     task_id = resp.json()["task_id"]
-    start_time = time.time()
-    while True:
-        if time.time() - start_time > timeout_sec:
-            raise TimeoutError(f"Crawl job timed out for {url}")
-        status_resp = requests.get(
-            f"{CRAWL4AI_BASE_URL}/task/{task_id}", headers=headers
+    deadline = time.monotonic() + timeout_sec
+    for delay in poll_delays():
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise TimeoutError(f"Crawl job timed out for {', '.join(urls)}")
+        if cancel is not None:
+            if cancel.wait(min(delay, remaining)):
+                raise CrawlCancelled(task_id)
+        else:
+            time.sleep(min(delay, remaining))
+        status_resp = session.get(
+            f"{CRAWL4AI_BASE_URL}/task/{task_id}",
+            headers=headers,
+            timeout=HTTP_TIMEOUT_SEC,
         )
         status_resp.raise_for_status()
-        js = status_resp.json()
-        if js["status"] == "completed":
-            if "markdown" in js["result"]:
-                return js["result"]["markdown"]
-            return None
-        elif js["status"] == "failed":
-            raise RuntimeError(
-                f"Crawl4AI job failed for {url}: {js.get('error', 'unknown')}"
-            )
-        time.sleep(2)
+        tracing.add_to("polls")
+        done, pages = crawl_task_results(status_resp.json(), urls)
+        if done:
+            return pages
+
+
+def fetch_markdown_with_crawl4ai(
+    url: str,
+    priority: int = 10,
+    timeout_sec: float = 240,
+    cancel: Optional[threading.Event] = None,
+) -> Optional[str]:
+    return fetch_markdown_batch([url], priority, timeout_sec, cancel).get(url)
 
 
-def get_webpage_text(url: str) -> Optional[str]:
-    key = cache_key_for_url(url)
-    cached_val = rclient.get(key)
+def get_cached_texts(urls: List[str]) -> Dict[str, str]:
+    """
+    Look up many URLs in the page cache: memory first, then one MGET
+    round trip for the rest. Returns {url: text} for the cache hits only.
+    """
+    canonical = {url: canonicalize_url(url) for url in urls}
+    hits = page_cache.get_many(canonical.values())
+    return {url: hits[key] for url, key in canonical.items() if key in hits}
+
+
+def cache_texts(texts: Dict[str, str], ttl_sec: int = CRAWL_CACHE_TTL_SEC) -> None:
+    """
+    Store many {url: text} entries with a TTL, in memory and in one
+    pipelined Redis round trip. Pages are truncated to CRAWL_CACHE_MAX_CHARS
+    and compressed.
+    """
+    page_cache.set_many(
+        {canonicalize_url(url): text for url, text in texts.items()}, ttl_sec
+    )
+
+
+def crawl_webpage_texts(
+    urls: List[str],
+    timeout_sec: float = 240,
+    cancel: Optional[threading.Event] = None,
+) -> Dict[str, Optional[str]]:
+    """
+    Crawl pages with crawl4ai as one task, bypassing the cache. Returns
+    {url: text or None}; empty if the task failed or was cancelled.
+    """
+    with tracing.span("crawl", urls=len(urls), url=urls[0]) as span:
+        try:
+            pages = fetch_markdown_batch(urls, timeout_sec=timeout_sec, cancel=cancel)
+        except CrawlCancelled:
+            span.set(cancelled=True)
+            return {}
+        except Exception as e:
+            log(f"Error crawling {', '.join(urls)}: {e}", error=True)
+            span.set(error=str(e))
+            return {}
+        span.set(chars=sum(len(text or "") for text in pages.values()))
+        return pages
+
+
+def crawl_webpage_text(url: str, timeout_sec: float = 240) -> Optional[str]:
+    """
+    Crawl a page with crawl4ai, bypassing the cache. Returns None on failure.
+    """
+    return crawl_webpage_texts([url], timeout_sec=timeout_sec).get(url)
+
+
+def get_webpage_text(url: str, timeout_sec: int = 240) -> Optional[str]:
+    cached_val = get_cached_texts([url]).get(url)
     if cached_val:
         return cached_val
-    try:
-        text = fetch_markdown_with_crawl4ai(url)
-        if text:
-            rclient.set(key, text, ex=60 * 60 * 24 * 14)
-            return text
-        else:
-            return None
-    except Exception as e:
-        log(f"Error crawling {url}: {e}", error=True)
-        return None
+    text = crawl_webpage_text(url, timeout_sec=timeout_sec)
+    if text:
+        cache_texts({url: text})
+    return text
+
 
+MIN_TEXT_LEN = 100
 
-def enrich_docs_with_cache(docs: list) -> list:
+
+def select_enrichment_targets(docs: list) -> Dict[str, list]:
     """
-    If the doc has short content, try to fetch from crawl4ai.
-    Store it in doc['content'] if we successfully get more text.
+    Docs whose content is too short, grouped by canonical url so each page is
+    crawled at most once (we crawl the first spelling of the url we saw).
     """
-    MIN_TEXT_LEN = 100
+    targets = {}
     for doc in docs:
         # doc.get(...,"") ensures we won't crash if 'content' is missing
         curr_content = doc.get("content", "")
-        if len(curr_content) < MIN_TEXT_LEN:
-            url = doc.get("url", "")
-            if url.startswith("http"):
-                new_text = get_webpage_text(url)
-                if new_text and len(new_text) > len(curr_content):
-                    doc["content"] = new_text
+        url = doc.get("url", "")
+        if len(curr_content) < MIN_TEXT_LEN and url.startswith("http"):
+            targets.setdefault(canonicalize_url(url), []).append(doc)
+    return targets
+
+
+def apply_page_text(docs: list, new_text: Optional[str]) -> None:
+    if not new_text:
+        return
+    for doc in docs:
+        if len(new_text) > len(doc.get("content", "")):
+            doc["content"] = new_text
+
+
+def _cache_when_done(urls: List[str], originals: List[str]):
+    def callback(future: concurrent.futures.Future):
+        if future.cancelled():
+            return
+        pages = future.result()
+        cache_texts({u: pages[o] for u, o in zip(urls, originals) if pages.get(o)})
+
+    return callback
+
+
+class _Crawl:
+    """
+    A Crawl4AI task in flight and the enrichers waiting for it. It is only
+    dropped or cancelled once every one of them has given up on it.
+    """
+
+    def __init__(self):
+        self.future: Optional[concurrent.futures.Future] = None
+        self.cancel = threading.Event()
+        self.waiters = 1
+
+
+# Crawls in flight in this process: canonical url -> (crawl, crawled url)
+_crawls_in_flight: Dict[str, Tuple[_Crawl, str]] = {}
+_crawls_lock = threading.Lock()
+
+
+def _register_crawls(crawl: _Crawl, urls: List[str], originals: List[str]):
+    with _crawls_lock:
+        for url, original in zip(urls, originals):
+            _crawls_in_flight[url] = (crawl, original)
+
+    def done(_):
+        with _crawls_lock:
+            for url in urls:
+                if _crawls_in_flight.get(url, (None,))[0] is crawl:
+                    del _crawls_in_flight[url]
+
+    crawl.future.add_done_callback(done)
+
+
+def _release_crawl(crawl: _Crawl, stop_running: bool):
+    """
+    An enricher stops waiting for a crawl. After the last one, the crawl
+    is dropped if it has not started, and with stop_running cancelled
+    if it has.
+    """
+    with _crawls_lock:
+        crawl.waiters -= 1
+        if crawl.waiters > 0:
+            return
+    crawl.future.cancel()
+    if stop_running:
+        crawl.cancel.set()
+
+
+class PageEnricher:
+    """
+    Incrementally enriches docs with short content. Each add() applies cached
+    pages right away (one lookup per call) and submits the misses to a crawl
+    pool, up to `batch_size` pages per Crawl4AI task and at most
+    `max_concurrency` tasks in flight; finish() waits for outstanding crawls
+    up to a timeout and writes new pages back to the cache.
+
+    Crawls still running after finish() are cancelled (they stop polling
+    right away), or with cancel_pending=False left to finish in the
+    background and cached when they complete.
+
+    A page another enricher in this process is already crawling (e.g. for a
+    concurrent question in `plexy serve` or `plexy batch`) is not crawled
+    again; this enricher waits for that crawl instead. A shared crawl is
+    only cancelled once every enricher waiting for it has given up.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int,
+        crawl_timeout_sec: float,
+        batch_size: int = CRAWL_BATCH_SIZE,
+    ):
+        self.crawl_timeout_sec = crawl_timeout_sec
+        self.batch_size = max(1, batch_size)
+        self.executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max(1, max_concurrency)
+        )
+        self.targets: Dict[str, list] = {}
+        self.texts: Dict[str, str] = {}
+        # future -> canonical urls of the pages it crawls
+        self.futures: Dict[concurrent.futures.Future, List[str]] = {}
+        self.crawls: Dict[concurrent.futures.Future, _Crawl] = {}
+        # canonical url -> the spelling its crawl was submitted with
+        self.crawled_as: Dict[str, str] = {}
+        self.fills: Dict[str, str] = {}
+        self.cache_hits = 0
+        self.shared_crawls = 0
+
+    def add(self, docs: list) -> None:
+        fresh = []
+        for url, group in select_enrichment_targets(docs).items():
+            if url in self.targets:
+                self.targets[url].extend(group)
+                apply_page_text(group, self.texts.get(url))
+            else:
+                self.targets[url] = group
+                fresh.append(url)
+        if not fresh:
+            return
+        cached = get_cached_texts(fresh)
+        self.cache_hits += len(cached)
+        for url, text in cached.items():
+            self._apply(url, text)
+        misses = []
+        with _crawls_lock:
+            for url in fresh:
+                if url in cached:
+                    continue
+                if url in _crawls_in_flight:
+                    crawl, original = _crawls_in_flight[url]
+                    if crawl.future not in self.futures:
+                        crawl.waiters += 1
+                        self.crawls[crawl.future] = crawl
+                    self.futures.setdefault(crawl.future, []).append(url)
+                    self.crawled_as[url] = original
+                    self.shared_crawls += 1
+                else:
+                    misses.append(url)
+        for i in range(0, len(misses), self.batch_size):
+            batch = misses[i : i + self.batch_size]
+            # We crawl the first spelling of each url we saw.
+            originals = [self.targets[url][0]["url"] for url in batch]
+            crawl = _Crawl()
+            crawl.future = self.executor.submit(
+                tracing.propagate(crawl_webpage_texts),
+                originals,
+                timeout_sec=self.crawl_timeout_sec,
+                cancel=crawl.cancel,
+            )
+            self.futures[crawl.future] = batch
+            self.crawls[crawl.future] = crawl
+            self.crawled_as.update(zip(batch, originals))
+            _register_crawls(crawl, batch, originals)
+
+    def _originals(self, urls: List[str]) -> List[str]:
+        return [self.crawled_as[url] for url in urls]
+
+    def _apply(self, url: str, text: Optional[str]):
+        if text:
+            self.texts[url] = text
+        apply_page_text(self.targets[url], text)
+
+    def finish(self, timeout_sec: float, cancel_pending: bool = True) -> int:
+        """
+        Wait up to timeout_sec for outstanding crawls. Returns how many pages
+        were still pending when we gave up.
+        """
+        pending = []
+        try:
+            for future in concurrent.futures.as_completed(
+                self.futures, timeout=max(0.0, timeout_sec)
+            ):
+                urls = self.futures[future]
+                # A crawl shared from another enricher may have been dropped.
+                pages = {} if future.cancelled() else future.result()
+                for url, original in zip(urls, self._originals(urls)):
+                    new_text = pages.get(original)
+                    if new_text:
+                        self.fills[url] = new_text
+                    self._apply(url, new_text)
+        except concurrent.futures.TimeoutError:
+            pending = [f for f in self.futures if not f.done()]
+            log(
+                f"Crawl budget exhausted, returning early with "
+                f"{sum(len(self.futures[f]) for f in pending)} page(s) still pending",
+                error=True,
+            )
+            for future in pending:
+                if not cancel_pending:
+                    # Late pages are still worth caching for the next query.
+                    urls = self.futures[future]
+                    future.add_done_callback(
+                        _cache_when_done(urls, self._originals(urls))
+                    )
+                # Crawls that never started are dropped, unless another
+                # enricher still waits for them.
+                _release_crawl(self.crawls[future], stop_running=cancel_pending)
+        finally:
+            # Queued crawls other enrichers wait for still run.
+            self.executor.shutdown(wait=False)
+        cache_texts(self.fills)
+        return sum(len(self.futures[f]) for f in pending)
+
+
+def enrich_docs_with_cache(
+    docs: list,
+    budget_sec: float = CRAWL_BUDGET_SEC,
+    max_concurrency: int = CRAWL_MAX_CONCURRENCY,
+) -> list:
+    """
+    If the doc has short content, try to fetch from crawl4ai.
+    Store it in doc['content'] if we successfully get more text.
+
+    All candidate URLs are looked up in the page cache at once (memory, then
+    a single Redis MGET). Misses are crawled concurrently, with at most
+    `max_concurrency` in flight, under a wall-clock budget of `budget_sec`,
+    and the new pages are written back in one pipeline. When the budget runs
+    out we return with whatever has finished; docs whose crawl is still
+    pending keep their original content.
+    """
+    with tracing.span("enrich", docs=len(docs)) as span:
+        # The crawl timeout matches the budget so abandoned workers don't linger.
+        enricher = PageEnricher(max_concurrency, crawl_timeout_sec=budget_sec)
+        enricher.add(docs)
+        pending = enricher.finish(budget_sec)
+        span.set(
+            cache_hits=enricher.cache_hits,
+            crawled=len(enricher.fills),
+            pending=pending,
+        )
     return docs
 
 
@@ -112,14 +491,13 @@ def enrich_docs_with_cache(docs: list) -> list:
 
 
 def single_tavily_search(query: str) -> list:
-    tv_client = TavilyClient(api_key=TAVILY_API_KEY)
-    response = tv_client.search(
-        query=query,
-        include_answer=False,
-        include_raw_content=True,
-        max_results=20,
-    )
-    results = response.get("results", [])
+    with tracing.span("tavily", query=query) as span:
+        results = tavily_search(query, max_results=20, include_raw_content=True)
+        span.set(results=len(results))
+    return shape_tavily_results(results)
+
+
+def shape_tavily_results(results: list) -> list:
     docs = []
     for item in results:
         doc_text = item.get("raw_content") or item.get("content") or ""
@@ -151,15 +529,22 @@ def tavily_in_parallel(search_queries: List[str], pages_to_fetch: int = 1) -> li
     Added pages_to_fetch for possible pagination, but it’s optional.
     """
     all_docs = []
-    with concurrent.futures.ThreadPoolExecutor() as executor:
-        futures = []
-        for q in search_queries:
-            for page in range(1, pages_to_fetch + 1):
-                futures.append(executor.submit(single_tavily_search, q))
-        for future in concurrent.futures.as_completed(futures):
-            all_docs.extend(future.result())
-
-    return filter_by_score_dropoff(all_docs, drop_threshold=0.15)
+    with tracing.span("tavily_in_parallel", queries=len(search_queries)) as span:
+        # One thread per request; provider limits are applied per request.
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=max(1, len(search_queries) * pages_to_fetch)
+        ) as executor:
+            futures = []
+            for q in search_queries:
+                for page in range(1, pages_to_fetch + 1):
+                    futures.append(
+                        executor.submit(tracing.propagate(single_tavily_search), q)
+                    )
+            for future in concurrent.futures.as_completed(futures):
+                all_docs.extend(future.result())
+        docs = filter_by_score_dropoff(all_docs, drop_threshold=0.15)
+        span.set(docs=len(docs))
+    return docs
 
 
 ##############################################################################
@@ -168,27 +553,21 @@ def tavily_in_parallel(search_queries: List[str], pages_to_fetch: int = 1) -> li
 
 
 def deduplicate_docs(docs: list) -> list:
-    unique = []
-    seen = set()
-    for d in docs:
-        key = (d.get("url", ""), d.get("title", ""))
-        if key not in seen:
-            seen.add(key)
-            unique.append(d)
-    return unique
+    """
+    Drop docs whose URL points at the same page as an earlier doc, or whose
+    content nearly duplicates it (mirrors, syndication, AMP copies).
+    """
+    index = DedupIndex()
+    return [d for d in docs if index.add(d)]
 
 
-cohere_client = CohereClient(os.getenv("COHERE_API_KEY", ""))
+RERANK_MODEL = "rerank-v3.5"
 
 
-def cohere_rerank(user_query: str, docs: list, top_n: int = 10) -> list:
+def valid_rerank_docs(docs: list) -> list:
     """
-    Re-rank the documents with Cohere.
     Skip docs that have 'error' or no 'content'.
     """
-    if not docs:
-        return []
-
     valid_docs = []
     for d in docs:
         if "error" in d:
@@ -198,27 +577,81 @@ def cohere_rerank(user_query: str, docs: list, top_n: int = 10) -> list:
             log(f"Skipping doc missing 'content' field: {d}", error=False)
             continue
         valid_docs.append(d)
+    return valid_docs
+
+
+def rerank_query(user_query: str) -> str:
+    return f"{user_query} [Date: {datetime.now().strftime('%Y-%m-%d')}]"
+
 
+def prerank_docs(user_query: str, valid_docs: list) -> PassageRanking:
+    return PassageRanking(user_query, valid_docs, max_chars=PASSAGE_MAX_CHARS)
+
+
+def cohere_rerank(user_query: str, docs: list, top_n: int = 10) -> list:
+    """
+    Re-rank the documents with Cohere.
+    Skip docs that have 'error' or no 'content'.
+
+    Only the PRERANK_TOP_K best passages by local BM25 are sent; if Cohere
+    fails, the BM25 ranking is returned instead (without `rerank_score`s).
+    """
+    if not docs:
+        return []
+
+    with tracing.span("rerank", docs=len(docs)) as span:
+        return _cohere_rerank(user_query, docs, top_n, span)
+
+
+def _cohere_rerank(
+    user_query: str, docs: list, top_n: int, span: tracing.Span
+) -> list:
+    valid_docs = valid_rerank_docs(docs)
     if not valid_docs:
         log("No valid docs to re-rank, returning empty list.", error=False)
         return []
 
-    doc_texts = [doc["content"] for doc in valid_docs]
-    query_with_date = f"{user_query} [Date: {datetime.now().strftime('%Y-%m-%d')}]"
+    ranking = prerank_docs(user_query, valid_docs)
+    candidates = ranking.top_passages(PRERANK_TOP_K)
+    span.set(passages=len(ranking.passages), sent=len(candidates))
+    if not candidates:
+        return ranking.top_docs(top_n)
 
     try:
-        resp = cohere_client.rerank(
-            model="rerank-v3.5",
-            query=query_with_date,
-            documents=doc_texts,
-            top_n=min(top_n, len(doc_texts)),
+        resp = cohere_client().rerank(
+            model=RERANK_MODEL,
+            query=rerank_query(user_query),
+            documents=[ranking.passages[p] for p in candidates],
+            top_n=len(candidates),
         )
     except Exception as e:
-        log(f"Cohere re-rank error: {e}", error=True)
-        return []
+        log(f"Cohere re-rank error: {e}, using local BM25 ranking", error=True)
+        span.set(fallback="bm25")
+        return ranking.top_docs(top_n)
+
+    return reranked_docs(ranking, candidates, resp.results, top_n, span)
 
-    sorted_indices = [r.index for r in resp.results]
-    return [valid_docs[i] for i in sorted_indices]
+
+def reranked_docs(
+    ranking: PassageRanking,
+    candidates: List[int],
+    results: list,
+    top_n: int,
+    span: tracing.Span,
+) -> list:
+    """
+    The top docs in the reranker's order. Each doc that had a passage
+    reranked gets its best passage's relevance score as `rerank_score`.
+    """
+    scores: Dict[int, float] = {}
+    for r in results:
+        owner = ranking.owners[candidates[r.index]]
+        scores[owner] = max(scores.get(owner, 0.0), r.relevance_score)
+    for owner, score in scores.items():
+        ranking.docs[owner]["rerank_score"] = score
+    if scores:
+        span.set(top_score=round(max(scores.values()), 3))
+    return ranking.top_docs(top_n, [candidates[r.index] for r in results])
 
 
 ##############################################################################
@@ -240,20 +673,79 @@ def call_decision_llm(conversation_history: list, debug: bool = False) -> Decisi
         log(f"Decision prompt messages: {conversation_history}", error=False)
 
     model = OpenAIModel()
-    try:
-        # We'll parse as a 'Decision' pydantic object
-        completion = model.client.beta.chat.completions.parse(
-            model=model.model_name,
-            messages=conversation_history,
-            response_format=Decision,
-            temperature=0.0,  # keep it zero for less creative disobedience
-            max_tokens=500,
-        )
-    except Exception as e:
-        if debug:
-            log(f"Decision LLM parse error: {e}", error=True)
-        return None
+    with tracing.span("decision_llm", messages=len(conversation_history)):
+        try:
+            # We'll parse as a 'Decision' pydantic object
+            completion = model.client.beta.chat.completions.parse(
+                model=model.model_name,
+                messages=conversation_history,
+                **DECISION_PARAMS,
+            )
+        except Exception as e:
+            if debug:
+                log(f"Decision LLM parse error: {e}", error=True)
+            tracing.set_attributes(error=str(e))
+            return None
+
+        return parsed_decision(completion, conversation_history)
+
+
+DECISION_PARAMS = {
+    "response_format": Decision,
+    "temperature": 0.0,  # keep it zero for less creative disobedience
+    "max_tokens": 500,
+}
 
+
+class PromptCacheStats:
+    """
+    Process-wide prompt tokens of decision calls and how many of them the
+    provider served from its prompt cache (usage.prompt_tokens_details).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+
+    def record(self, prompt_tokens: int, cached_tokens: int):
+        with self._lock:
+            self.calls += 1
+            self.prompt_tokens += prompt_tokens
+            self.cached_tokens += cached_tokens
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "prompt_tokens": self.prompt_tokens,
+                "cached_tokens": self.cached_tokens,
+                "hit_rate": round(self.cached_tokens / self.prompt_tokens, 3)
+                if self.prompt_tokens
+                else 0.0,
+            }
+
+
+prompt_cache_stats = PromptCacheStats()
+
+
+def parsed_decision(completion, conversation_history: list) -> Optional[Decision]:
+    """
+    Extract the parsed Decision, recording a refusal in the history instead.
+    Token usage (including cached prompt tokens) and the action go on the
+    current trace span.
+    """
+    usage = getattr(completion, "usage", None)
+    if usage is not None:
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached = getattr(details, "cached_tokens", None) or 0
+        tracing.set_attributes(
+            prompt_tokens=usage.prompt_tokens,
+            completion_tokens=usage.completion_tokens,
+            cached_tokens=cached,
+        )
+        prompt_cache_stats.record(usage.prompt_tokens, cached)
     choice = completion.choices[0].message
     if hasattr(choice, "refusal") and choice.refusal:
         conversation_history.append(
@@ -264,4 +756,410 @@ def call_decision_llm(conversation_history: list, debug: bool = False) -> Decisi
         )
         return None
 
+    if choice.parsed is not None:
+        tracing.set_attributes(action=choice.parsed.action)
     return choice.parsed
+
+
+_JSON_ESCAPES = {
+    '"': '"',
+    "\\": "\\",
+    "/": "/",
+    "b": "\b",
+    "f": "\f",
+    "n": "\n",
+    "r": "\r",
+    "t": "\t",
+}
+
+
+class JSONFieldStream:
+    """
+    Incrementally extracts one top-level string field from JSON text that
+    arrives in chunks. feed() returns the newly decoded characters of that
+    field's value, so it can be shown while the rest is still generating.
+    """
+
+    def __init__(self, field: str):
+        self.field = field
+        self.done = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._unicode = None  # hex digits of a pending \uXXXX escape
+        self._high_surrogate = None
+        self._capturing = False
+        self._expect_value = False
+        self._key = []
+        self._last_key = ""
+
+    def feed(self, chunk: str) -> str:
+        out = []
+        for ch in chunk:
+            if not self._in_string:
+                self._scan_structure(ch)
+            elif self._unicode is not None:
+                self._unicode += ch
+                if len(self._unicode) == 4:
+                    self._emit_codepoint(int(self._unicode, 16), out)
+                    self._unicode = None
+            elif self._escape:
+                self._escape = False
+                if ch == "u":
+                    self._unicode = ""
+                else:
+                    self._emit(_JSON_ESCAPES.get(ch, ch), out)
+            elif ch == "\\":
+                self._escape = True
+            elif ch == '"':
+                self._end_string()
+            else:
+                self._emit(ch, out)
+        return "".join(out)
+
+    def _scan_structure(self, ch: str):
+        if ch == '"':
+            self._in_string = True
+            self._capturing = (
+                self._expect_value
+                and self._depth == 1
+                and self._last_key == self.field
+                and not self.done
+            )
+            self._key = []
+        elif ch in "{[":
+            self._depth += 1
+            self._expect_value = False
+        elif ch in "}]":
+            self._depth -= 1
+        elif ch == ":":
+            self._expect_value = True
+        elif ch == ",":
+            self._expect_value = False
+
+    def _emit(self, text: str, out: list):
+        if self._capturing:
+            out.append(text)
+        elif not self._expect_value:
+            self._key.append(text)
+
+    def _emit_codepoint(self, code: int, out: list):
+        if 0xD800 <= code < 0xDC00:
+            self._high_surrogate = code
+            return
+        if 0xDC00 <= code < 0xE000 and self._high_surrogate is not None:
+            code = 0x10000 + ((self._high_surrogate - 0xD800) << 10) + (code - 0xDC00)
+        self._high_surrogate = None
+        self._emit(chr(code), out)
+
+    def _end_string(self):
+        self._in_string = False
+        if self._capturing:
+            self._capturing = False
+            self.done = True
+        elif self._expect_value:
+            self._expect_value = False
+        else:
+            self._last_key = "".join(self._key)
+
+
+def stream_decision_llm(
+    conversation_history: list, debug: bool = False
+) -> Generator[Tuple[str, str], None, Optional[Decision]]:
+    """
+    Streaming variant of call_decision_llm. For an 'answer' decision, yields
+    ("scratchpad", text) once, if the model filled it in, followed by
+    ("message", text) pieces as tokens arrive; a 'search' decision yields
+    nothing. Returns the parsed Decision, so callers use:
+
+        decision = yield from stream_decision_llm(conversation)
+
+    The scratchpad precedes the message in the Decision schema, so it is
+    complete by the time the message starts.
+    """
+    if debug:
+        log(f"Decision prompt messages: {conversation_history}", error=False)
+
+    model = OpenAIModel()
+    action = JSONFieldStream("action")
+    scratchpad = JSONFieldStream("scratchpad")
+    message = JSONFieldStream("message")
+    action_text = scratchpad_text = pending = ""
+    with tracing.span("decision_llm", messages=len(conversation_history)) as span:
+        try:
+            with model.client.beta.chat.completions.stream(
+                model=model.model_name,
+                messages=conversation_history,
+                stream_options={"include_usage": True},
+                **DECISION_PARAMS,
+            ) as stream:
+                for event in stream:
+                    if event.type != "content.delta":
+                        continue
+                    action_text += action.feed(event.delta)
+                    scratchpad_text += scratchpad.feed(event.delta)
+                    pending += message.feed(event.delta)
+                    # Hold the message back until the action is known.
+                    if not pending or not action.done or action_text != "answer":
+                        continue
+                    if "first_token_ms" not in span.attributes:
+                        span.set(first_token_ms=span.elapsed_ms())
+                        if scratchpad_text and scratchpad.done:
+                            yield "scratchpad", scratchpad_text
+                    yield "message", pending
+                    pending = ""
+                completion = stream.get_final_completion()
+        except Exception as e:
+            if debug:
+                log(f"Decision LLM stream error: {e}", error=True)
+            span.set(error=str(e))
+            return None
+
+        return parsed_decision(completion, conversation_history)
+
+
+##############################################################################
+# 5) Streaming search: dedup, crawl and rerank as Tavily results arrive
+##############################################################################
+
+
+def streaming_search(
+    user_query: str,
+    search_queries: List[str],
+    top_n: int = 10,
+    quorum: float = SEARCH_QUORUM,
+    search_deadline_sec: float = SEARCH_DEADLINE_SEC,
+    crawl_budget_sec: float = CRAWL_BUDGET_SEC,
+    max_concurrency: int = CRAWL_MAX_CONCURRENCY,
+    prefetched: Optional[Dict[str, concurrent.futures.Future]] = None,
+) -> Tuple[list, Dict[str, float]]:
+    """
+    Search -> enrich -> dedup -> rerank as a streaming stage graph instead of
+    a barrier between each step:
+
+    * Each query's results are deduplicated as soon as they land, and short
+      docs start crawling right away (PageEnricher).
+    * We stop waiting for Tavily once a `quorum` fraction of the queries has
+      answered, or at `search_deadline_sec`; stragglers still fill the
+      search cache in the background.
+    * Crawls get `crawl_budget_sec` from when the first one was submitted.
+    * Then the global score dropoff is applied and the docs are reranked.
+
+    `prefetched` maps queries to already running single_tavily_search
+    futures (see SpeculativeSearch), which are used instead of new searches.
+
+    Returns (top_docs, timings), where timings holds seconds since start for
+    each stage boundary plus doc counts.
+    """
+    with tracing.span("streaming_search", queries=len(search_queries)) as span:
+        top_docs, timings = _streaming_search(
+            user_query,
+            search_queries,
+            top_n,
+            quorum,
+            search_deadline_sec,
+            crawl_budget_sec,
+            max_concurrency,
+            prefetched or {},
+        )
+        span.set(**{k: v for k, v in timings.items() if not isinstance(v, float)})
+    return top_docs, timings
+
+
+def _streaming_search(
+    user_query: str,
+    search_queries: List[str],
+    top_n: int,
+    quorum: float,
+    search_deadline_sec: float,
+    crawl_budget_sec: float,
+    max_concurrency: int,
+    prefetched: Dict[str, concurrent.futures.Future],
+) -> Tuple[list, Dict[str, float]]:
+    start = time.monotonic()
+    timings: Dict[str, float] = {}
+
+    def mark(stage: str):
+        timings[stage] = round(time.monotonic() - start, 3)
+
+    needed = max(1, math.ceil(quorum * len(search_queries)))
+    search_pool = concurrent.futures.ThreadPoolExecutor(
+        max_workers=max(1, len(search_queries))
+    )
+    search_span = tracing.start_span("search_stage")
+    futures = {
+        prefetched.get(q)
+        or search_pool.submit(tracing.propagate(single_tavily_search), q): q
+        for q in search_queries
+    }
+    enricher = PageEnricher(max_concurrency, crawl_timeout_sec=crawl_budget_sec)
+    crawl_started = None
+    unique = []
+    dedup = DedupIndex()
+    answered = 0
+    try:
+        for future in concurrent.futures.as_completed(
+            futures, timeout=search_deadline_sec
+        ):
+            answered += 1
+            try:
+                results = future.result()
+            except Exception as e:
+                log(f"Tavily search failed for {futures[future]!r}: {e}", error=True)
+                results = []
+            if "first_results" not in timings:
+                mark("first_results")
+            # A doc below its own query's dropoff is below the global one too,
+            # so this only skips docs the final filter would drop anyway.
+            new_docs = [
+                doc
+                for doc in filter_by_score_dropoff(results, drop_threshold=0.15)
+                if dedup.add(doc)
+            ]
+            unique.extend(new_docs)
+            enricher.add(new_docs)
+            if crawl_started is None and enricher.futures:
+                crawl_started = time.monotonic()
+            if answered >= needed:
+                break
+    except concurrent.futures.TimeoutError:
+        log(
+            f"Search deadline of {search_deadline_sec}s reached with "
+            f"{answered}/{len(search_queries)} queries answered",
+            error=True,
+        )
+    finally:
+        search_pool.shutdown(wait=False, cancel_futures=True)
+    mark("search")
+    search_span.set(answered=answered, docs=len(unique))
+    search_span.finish()
+
+    crawl_deadline = (crawl_started or time.monotonic()) + crawl_budget_sec
+    with tracing.span("crawl_wait", tasks=len(enricher.futures)) as crawl_span:
+        pending = enricher.finish(crawl_deadline - time.monotonic())
+        crawl_span.set(
+            cache_hits=enricher.cache_hits,
+            crawled=len(enricher.fills),
+            shared=enricher.shared_crawls,
+            pending=pending,
+        )
+    mark("crawl")
+
+    # Crawled pages can reveal near-duplicates the search snippets hid.
+    filtered = filter_by_score_dropoff(unique, drop_threshold=0.15)
+    docs = deduplicate_docs(filtered)
+    top_docs = cohere_rerank(user_query, docs, top_n=top_n)
+    mark("rerank")
+
+    timings["queries_answered"] = answered
+    timings["docs"] = len(docs)
+    timings["duplicates"] = (
+        dedup.url_duplicates + dedup.near_duplicates + len(filtered) - len(docs)
+    )
+    timings["crawl_cache_hits"] = enricher.cache_hits
+    timings["crawled"] = len(enricher.fills)
+    timings["crawls_shared"] = enricher.shared_crawls
+    return top_docs, timings
+
+
+##############################################################################
+# 6) Speculative search: search the raw question while the LLM decides
+##############################################################################
+
+
+def query_overlap(a: str, b: str) -> float:
+    """Jaccard similarity of two queries' terms."""
+    ta, tb = set(terms(a)), set(terms(b))
+    if not ta or not tb:
+        return 0.0
+    return len(ta & tb) / len(ta | tb)
+
+
+class SpeculationStats:
+    """Process-wide counts of speculative searches and how they were used."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = 0
+        self.hits = 0
+        self.wasted = 0
+
+    def count(self, outcome: str):
+        with self._lock:
+            setattr(self, outcome, getattr(self, outcome) + 1)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {"started": self.started, "hits": self.hits, "wasted": self.wasted}
+
+
+speculation_stats = SpeculationStats()
+
+
+class SpeculativeSearch:
+    """
+    Runs single_tavily_search(query) in the background, e.g. on the raw user
+    question while the first decision LLM call is in flight. claim() then
+    swaps the most similar decision query for it, so streaming_search can
+    reuse its results instead of searching again; a search no decision
+    query is similar enough to is counted as wasted.
+    """
+
+    # Started on first use, so runs without --speculative never start it
+    _pool: Optional[concurrent.futures.ThreadPoolExecutor] = None
+    _pool_lock = threading.Lock()
+
+    @classmethod
+    def _executor(cls) -> concurrent.futures.ThreadPoolExecutor:
+        if cls._pool is None:
+            with cls._pool_lock:
+                if cls._pool is None:
+                    cls._pool = concurrent.futures.ThreadPoolExecutor(
+                        max_workers=4, thread_name_prefix="plexy-speculative"
+                    )
+        return cls._pool
+
+    def __init__(self, query: str, min_overlap: float = SPECULATIVE_MIN_OVERLAP):
+        self.query = query
+        self.min_overlap = min_overlap
+        self.span = tracing.start_span("speculative_search", query=query)
+        self.future = self._executor().submit(
+            tracing.propagate(single_tavily_search), query
+        )
+        self.future.add_done_callback(lambda _: self.span.finish())
+        self.claimed = False
+        speculation_stats.count("started")
+
+    def claim(
+        self, search_queries: List[str]
+    ) -> Tuple[List[str], Dict[str, concurrent.futures.Future]]:
+        """
+        (queries, prefetched) for streaming_search: the decision's queries
+        with the closest match replaced by the speculative query, if it is
+        close enough. Each speculative search can be claimed once.
+        """
+        if self.claimed:
+            return search_queries, {}
+        self.claimed = True
+        best, overlap = None, 0.0
+        for i, q in enumerate(search_queries):
+            score = query_overlap(q, self.query)
+            if score > overlap:
+                best, overlap = i, score
+        if best is None or overlap < self.min_overlap:
+            self.discard()
+            return search_queries, {}
+
+        speculation_stats.count("hits")
+        self.span.set(
+            hit=1, wasted=0, replaced=search_queries[best], overlap=round(overlap, 2)
+        )
+        queries = list(search_queries)
+        queries[best] = self.query
+        return queries, {self.query: self.future}
+
+    def discard(self):
+        """Mark the search as wasted (e.g. the decision was to answer)."""
+        self.claimed = True
+        speculation_stats.count("wasted")
+        self.span.set(hit=0, wasted=1)
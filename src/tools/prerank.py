@@ -0,0 +1,93 @@
+"""
+Local BM25 pre-ranking of search results.
+
+Docs are split into passages and scored against the question with BM25
+(vectorized with NumPy). The reranker then only gets the best passages
+instead of whole pages, and the same scores serve as the ranking when the
+reranker is unavailable.
+"""
+
+from collections import Counter
+from typing import List, Tuple
+
+import numpy as np
+
+from .text_utils import split_passages, terms
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def bm25_scores(
+    query: str, passages: List[str], k1: float = BM25_K1, b: float = BM25_B
+) -> np.ndarray:
+    """
+    BM25 score of each passage for the query, with document frequencies
+    taken over the passages themselves.
+    """
+    query_terms = sorted(set(terms(query)))
+    if not passages or not query_terms:
+        return np.zeros(len(passages))
+
+    tf = np.zeros((len(passages), len(query_terms)))
+    lengths = np.empty(len(passages))
+    for row, passage in enumerate(passages):
+        tokens = terms(passage)
+        counts = Counter(tokens)
+        tf[row] = [counts[t] for t in query_terms]
+        lengths[row] = len(tokens)
+
+    df = np.count_nonzero(tf, axis=0)
+    idf = np.log1p((len(passages) - df + 0.5) / (df + 0.5))
+    norm = k1 * (1 - b + b * lengths / max(lengths.mean(), 1.0))
+    return (tf * (k1 + 1) / (tf + norm[:, None])) @ idf
+
+
+def chunk_docs(docs: list, max_chars: int) -> Tuple[List[int], List[str]]:
+    """
+    Split each doc's content into passages prefixed with its title.
+    Returns (owners, passages), where owners[i] is the index of the doc
+    passages[i] came from.
+    """
+    owners, passages = [], []
+    for i, doc in enumerate(docs):
+        title = doc.get("title", "")
+        for passage in split_passages(doc.get("content", ""), max_chars=max_chars):
+            owners.append(i)
+            passages.append(f"{title}\n{passage}" if title else passage)
+    return owners, passages
+
+
+class PassageRanking:
+    """
+    BM25 ranking of every passage of a list of docs. A doc scores as its
+    best passage.
+    """
+
+    def __init__(self, query: str, docs: list, max_chars: int = 1000):
+        self.docs = docs
+        self.owners, self.passages = chunk_docs(docs, max_chars)
+        self.scores = bm25_scores(query, self.passages)
+        self.doc_scores = np.full(len(docs), -np.inf)
+        np.maximum.at(self.doc_scores, np.array(self.owners, dtype=int), self.scores)
+
+    def top_passages(self, k: int) -> List[int]:
+        """Indices of the k best passages, best first."""
+        order = np.argsort(-self.scores, kind="stable")
+        return order[:k].tolist()
+
+    def top_docs(self, top_n: int, passage_order: List[int] = ()) -> list:
+        """
+        Distinct docs in the order their passages appear in passage_order,
+        topped up with the remaining docs by BM25 score.
+        """
+        picked = []
+        seen = set()
+        doc_order = np.argsort(-self.doc_scores, kind="stable").tolist()
+        for i in [self.owners[p] for p in passage_order] + doc_order:
+            if len(picked) >= top_n:
+                break
+            if i not in seen:
+                seen.add(i)
+                picked.append(self.docs[i])
+        return picked
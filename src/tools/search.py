@@ -0,0 +1,137 @@
+"""
+Cached Tavily search, shared by the pipeline and the web_search tool.
+
+Results are cached (memory + Redis) under the normalized query text plus the
+search parameters, and concurrent identical searches share one request.
+"""
+
+import hashlib
+import json
+import re
+import threading
+import unicodedata
+from concurrent.futures import Future
+from typing import Callable, Dict
+
+from core import tracing
+from core.clients import http_session
+from core.config import (
+    TAVILY_API_KEY,
+    TAVILY_BASE_URL,
+    HTTP_TIMEOUT_SEC,
+    TAVILY_CACHE_TTL_SEC,
+    SEARCH_MEMORY_CACHE_MAX_BYTES,
+    MEMORY_CACHE_TTL_SEC,
+    CACHE_COMPRESSION,
+)
+from .cache import TieredCache, rclient
+
+search_cache = TieredCache(
+    "tavily",
+    rclient,
+    prefix="tavily:search:v1:",
+    ttl_sec=TAVILY_CACHE_TTL_SEC,
+    memory_max_bytes=SEARCH_MEMORY_CACHE_MAX_BYTES,
+    memory_ttl_sec=MEMORY_CACHE_TTL_SEC,
+    compression=CACHE_COMPRESSION,
+)
+
+
+class SingleFlight:
+    """
+    Collapses concurrent calls with the same key into one execution: the
+    first caller runs fn, the others wait for and share its result (or
+    exception).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, Future] = {}
+        self.shared = 0
+
+    def do(self, key: str, fn: Callable):
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+            else:
+                self.shared += 1
+        if not leader:
+            return future.result()
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+
+_inflight = SingleFlight()
+
+
+def normalize_query(query: str) -> str:
+    """
+    Case-, whitespace- and punctuation-insensitive form of a search query,
+    so "Latest Python release?" and "latest  python release" share a key.
+    """
+    text = unicodedata.normalize("NFKC", query).casefold()
+    text = re.sub(r"\s+", " ", text)
+    return text.strip(" \t\"'`.,;:!?")
+
+
+def tavily_request(query: str, **params) -> dict:
+    """Keyword arguments for a POST to Tavily's /search endpoint."""
+    return {
+        "url": f"{TAVILY_BASE_URL}/search",
+        "headers": {"Authorization": f"Bearer {TAVILY_API_KEY}"},
+        "json": {"query": query, "include_answer": False, **params},
+        "timeout": HTTP_TIMEOUT_SEC,
+    }
+
+
+def search_cache_key(query: str, **params) -> str:
+    payload = json.dumps({"q": normalize_query(query), **params}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def tavily_search(
+    query: str,
+    max_results: int = 20,
+    include_raw_content: bool = True,
+    search_depth: str = "basic",
+) -> list:
+    """
+    Run a Tavily search and return its raw `results` list, served from the
+    search cache when possible. Errors propagate and are not cached.
+    """
+    params = {
+        "max_results": max_results,
+        "include_raw_content": include_raw_content,
+        "search_depth": search_depth,
+    }
+    key = search_cache_key(query, **params)
+    cached = search_cache.get(key)
+    if cached is not None:
+        tracing.set_attributes(cache="hit")
+        return json.loads(cached)
+
+    def fetch() -> list:
+        # A previous leader may have filled the cache since our lookup.
+        cached = search_cache.get(key)
+        if cached is not None:
+            return json.loads(cached)
+        tracing.set_attributes(cache="miss")
+        resp = http_session().post(**tavily_request(query, **params))
+        resp.raise_for_status()
+        results = resp.json().get("results", [])
+        search_cache.set(key, json.dumps(results))
+        return results
+
+    tracing.set_attributes(cache="shared")
+    return _inflight.do(key, fetch)
@@ -0,0 +1,86 @@
+"""
+Small text helpers shared by prompt packing and local ranking: token
+counting, passage splitting and query-term extraction.
+"""
+
+import re
+from functools import lru_cache
+from typing import List
+
+try:
+    import tiktoken
+except ImportError:  # optional dependency, fall back to a chars/4 estimate
+    tiktoken = None
+
+STOPWORDS = frozenset(
+    """
+    a an and are as at be but by for from has have how i if in into is it its
+    of on or that the their there these this to was what when where which who
+    why will with you your do does did can could should would about than then
+    """.split()
+)
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+
+
+@lru_cache(maxsize=1)
+def _encoding():
+    try:
+        return tiktoken.get_encoding("o200k_base")
+    except Exception:
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """
+    Token count for the decision model's tokenizer, or an estimate of
+    ~4 characters per token when tiktoken isn't available.
+    """
+    if not text:
+        return 0
+    encoding = _encoding() if tiktoken is not None else None
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return (len(text) + 3) // 4
+
+
+def terms(text: str) -> List[str]:
+    """Lowercased word tokens without stopwords."""
+    return [
+        t for t in _WORD_RE.findall(text.lower()) if t not in STOPWORDS and len(t) > 1
+    ]
+
+
+def split_passages(text: str, max_chars: int = 800) -> List[str]:
+    """
+    Split text into passages of at most ~max_chars: paragraphs are merged
+    while they fit, and long paragraphs are split on sentence boundaries
+    (or hard-wrapped as a last resort).
+    """
+    pieces = []
+    for para in re.split(r"\n\s*\n", text):
+        para = " ".join(para.split())
+        if not para:
+            continue
+        if len(para) <= max_chars:
+            pieces.append(para)
+            continue
+        for sentence in _SENTENCE_RE.split(para):
+            while len(sentence) > max_chars:
+                pieces.append(sentence[:max_chars])
+                sentence = sentence[max_chars:]
+            if sentence:
+                pieces.append(sentence)
+
+    passages = []
+    current = ""
+    for piece in pieces:
+        if current and len(current) + 1 + len(piece) > max_chars:
+            passages.append(current)
+            current = piece
+        else:
+            current = f"{current} {piece}" if current else piece
+    if current:
+        passages.append(current)
+    return passages
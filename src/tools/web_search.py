@@ -1,8 +1,7 @@
 import json
 from typing import Dict, List
 from datetime import datetime
-from tavily import TavilyClient
-from core.config import TAVILY_API_KEY
+from .search import tavily_search
 
 TOOL_NAME = "web_search_tool"
 
@@ -13,18 +12,15 @@ def run(queries: List[str]) -> Dict:
     If Tavily or the search fails, we add an error doc that includes content="",
     to avoid KeyError down the pipeline.
     """
-    client = TavilyClient(api_key=TAVILY_API_KEY)
     all_results = []
     for q in queries:
         try:
-            response = client.search(
-                query=q,
-                search_depth="advanced",
-                include_answer=False,
-                include_raw_content=True,
+            results = tavily_search(
+                q,
                 max_results=10,
+                include_raw_content=True,
+                search_depth="advanced",
             )
-            results = response.get("results", [])
             shaped = [
                 {
                     "title": r.get("title", ""),
@@ -0,0 +1,42 @@
+"""
+Tests run against the local provider stubs in benchmarks/stub_servers.py;
+src/ and benchmarks/ go on sys.path and the API keys get dummy values.
+"""
+
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+for var in ("OPENAI_API_KEY", "TAVILY_API_KEY", "COHERE_API_KEY"):
+    os.environ.setdefault(var, "test")
+
+
+@pytest.fixture(scope="session")
+def stubs():
+    """
+    One stub per provider for the whole session (the API clients are
+    process-wide and keep the first base URLs they see), caches off.
+    """
+    from harness import configure_caches, parse_latency
+    from load_test import start_stubs
+
+    started = start_stubs(parse_latency([]), token_delay=0.002)
+    configure_caches("off")
+    yield dict(zip(("openai", "tavily", "cohere", "crawl4ai"), started))
+    for stub in started:
+        stub.stop()
+
+
+@pytest.fixture
+def openai_stub(stubs):
+    """The OpenAI stub, with its responder restored after the test."""
+    stub = stubs["openai"]
+    responder = stub.responder
+    yield stub
+    stub.responder = responder
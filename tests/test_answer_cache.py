@@ -0,0 +1,68 @@
+"""
+Answers served from the semantic answer cache, against the fake OpenAI
+server (decisions and embeddings) and the other provider stubs.
+"""
+
+import re
+
+_REFERENCE_RE = re.compile(r"^\[(\d+)\] Title: ", re.M)
+
+
+def cite_latest_search(messages: list) -> dict:
+    """Search once per question, then answer citing its first reference."""
+    asked = max(
+        i
+        for i, m in enumerate(messages)
+        if m["role"] == "user" and not m["content"].startswith("Please now")
+    )
+    tools = [m for m in messages[asked:] if m["role"] == "tool"]
+    if not tools:
+        return {
+            "action": "search",
+            "search_queries": [messages[asked]["content"]],
+            "scratchpad": None,
+            "message": None,
+        }
+    number = _REFERENCE_RE.findall(tools[-1]["content"])[0]
+    return {
+        "action": "answer",
+        "search_queries": [],
+        "scratchpad": None,
+        "message": f"The sources say so [{number}].",
+    }
+
+
+def ask(agent, question: str) -> str:
+    return "".join(agent.run_pipeline(question))
+
+
+def test_cached_answer_keeps_the_references_it_cites(
+    stubs, openai_stub, monkeypatch
+):
+    from core import agent as agent_module
+    from core.agent import Agent
+    from core.answer_cache import AnswerCache
+
+    cache = AnswerCache(redis_client=None)
+    monkeypatch.setattr(agent_module, "answer_cache", cache)
+    openai_stub.responder = cite_latest_search
+
+    def new_agent():
+        return Agent(max_iters=1, use_answer_cache=True, render_markdown=False)
+
+    first = new_agent()
+    assert "[1]" in ask(first, "what is rust")
+    (cited,) = first.references.sent([1])
+
+    second = new_agent()
+    assert "[1]" in ask(second, "what is rust")
+    assert cache.hits == 1
+    assert second.references.blocks == {1: cited["block"]}
+    tool_results = [m for m in second.conversation if m["role"] == "tool"]
+    assert cited["block"] in tool_results[0]["content"]
+
+    # A follow-up's new references are numbered after the cached one,
+    # which keeps its number and source.
+    assert "[2]" in ask(second, "what about go")
+    assert second.references.blocks[1] == cited["block"]
+    assert min(set(second.references.blocks) - {1}) == 2
@@ -0,0 +1,22 @@
+"""The async search path (Agent.arun_pipeline) against the Tavily stub."""
+
+import asyncio
+
+
+def test_failed_query_is_dropped_not_raised(stubs, monkeypatch, capsys):
+    from tools import async_pipeline_helpers as aph
+
+    search = aph.atavily_search
+
+    async def flaky_search(query: str, **params):
+        if query == "broken":
+            raise TimeoutError("read timed out")
+        return await search(query, **params)
+
+    monkeypatch.setattr(aph, "atavily_search", flaky_search)
+    docs = asyncio.run(aph.atavily_in_parallel(["broken", "what is rust"]))
+
+    assert docs
+    assert all("what-is-rust" in doc["url"] for doc in docs)
+    err = capsys.readouterr().err
+    assert "Tavily search failed for 'broken': read timed out" in err
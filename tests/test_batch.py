@@ -0,0 +1,53 @@
+"""Reading `plexy batch` input and resuming from an earlier run's output."""
+
+import json
+
+
+def write_lines(tmp_path, name: str, lines: list) -> str:
+    path = tmp_path / name
+    path.write_text("\n".join(lines) + "\n")
+    return str(path)
+
+
+def test_read_questions_skips_lines_that_are_not_questions(tmp_path, capsys):
+    from cli.batch import read_questions
+
+    path = write_lines(
+        tmp_path,
+        "questions.jsonl",
+        [
+            json.dumps({"id": "a", "question": "What is Rust?"}),
+            "[1, 2]",
+            "42",
+            "null",
+            "{not json",
+            json.dumps("What is Go?"),
+            json.dumps({"id": "c", "question": "  "}),
+        ],
+    )
+    assert list(read_questions(path)) == [
+        ("a", "What is Rust?"),
+        ("line-6", "What is Go?"),
+    ]
+    err = capsys.readouterr().err
+    for number in (2, 3, 4):
+        assert f"{path}:{number}: not a JSON object, skipped" in err
+    assert f"{path}:5: not valid JSON, skipped" in err
+    assert f"{path}:7: no question found, skipped" in err
+
+
+def test_answered_ids_ignores_malformed_rows(tmp_path):
+    from cli.batch import answered_ids
+
+    path = write_lines(
+        tmp_path,
+        "answers.jsonl",
+        [
+            json.dumps({"id": "a", "status": "ok"}),
+            json.dumps({"id": "b", "status": "error"}),
+            json.dumps({"status": "ok"}),
+            "[1, 2]",
+            '{"id": "c", "sta',
+        ],
+    )
+    assert answered_ids(path) == {"a"}
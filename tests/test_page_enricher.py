@@ -0,0 +1,41 @@
+"""
+Crawls shared between concurrent PageEnrichers (e.g. two questions of a
+`plexy batch` run finding the same page), against the Crawl4AI stub.
+"""
+
+SLOW_PAGE = "https://example.com/shared?delay=1"
+
+
+def short_doc(url: str) -> dict:
+    return {"url": url, "title": "Shared", "content": "too short"}
+
+
+def test_shared_crawl_outlives_the_enricher_that_started_it(stubs):
+    from tools.pipeline_helpers import PageEnricher
+
+    first, second = PageEnricher(4, 10), PageEnricher(4, 10)
+    first_doc, second_doc = short_doc(SLOW_PAGE), short_doc(SLOW_PAGE)
+    first.add([first_doc])
+    second.add([second_doc])
+    assert second.shared_crawls == 1
+
+    # The first enricher runs out of budget while the crawl is running ...
+    assert first.finish(0.1) == 1
+    assert first_doc["content"] == "too short"
+    # ... which must not cancel it for the second one.
+    assert second.finish(10) == 0
+    assert second_doc["content"].startswith(f"# Page for {SLOW_PAGE}")
+
+
+def test_shared_crawl_cancelled_once_every_enricher_gave_up(stubs):
+    from tools.pipeline_helpers import PageEnricher
+
+    first, second = PageEnricher(4, 10), PageEnricher(4, 10)
+    first.add([short_doc(SLOW_PAGE + "&run=2")])
+    second.add([short_doc(SLOW_PAGE + "&run=2")])
+    (crawl,) = second.crawls.values()
+
+    first.finish(0.1)
+    assert not crawl.cancel.is_set()
+    second.finish(0.1)
+    assert crawl.cancel.is_set()
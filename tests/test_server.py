@@ -0,0 +1,47 @@
+"""`plexy serve` request handling when the agent can't be built."""
+
+import json
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+
+
+@pytest.fixture
+def failing_server():
+    from cli.server import PlexyServer
+
+    def agent_factory():
+        raise RuntimeError("no model configured")
+
+    server = PlexyServer(("127.0.0.1", 0), agent_factory, workers=2)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def ask(server, payload: dict):
+    request = urllib.request.Request(
+        f"http://127.0.0.1:{server.server_address[1]}/v1/ask",
+        data=json.dumps(payload).encode("utf-8"),
+        headers={"Content-Type": "application/json"},
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=5) as response:
+            return response.status, json.load(response)
+    except urllib.error.HTTPError as e:
+        return e.code, json.load(e)
+
+
+def test_agent_factory_failure_is_a_500_and_frees_the_session(failing_server):
+    payload = {"question": "hi", "session_id": "s1", "stream": False}
+    status, body = ask(failing_server, payload)
+    assert status == 500
+    assert "no model configured" in body["error"]
+    # Not left behind as a busy session (which would answer 409 forever).
+    assert len(failing_server.sessions) == 0
+    assert ask(failing_server, payload)[0] == 500
+    assert failing_server.counters["errors"] == 2
+    assert failing_server.admission.snapshot()["active"] == 0
@@ -0,0 +1,12 @@
+"""--speculative against the provider stubs."""
+
+
+def test_only_a_sessions_first_question_is_speculated_on(stubs):
+    from core.agent import Agent
+    from tools.pipeline_helpers import speculation_stats
+
+    agent = Agent(max_iters=1, speculative=True, render_markdown=False)
+    started = speculation_stats.snapshot()["started"]
+    "".join(agent.run_pipeline("what is rust"))
+    "".join(agent.run_pipeline("what about go"))
+    assert speculation_stats.snapshot()["started"] == started + 1
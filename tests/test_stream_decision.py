@@ -0,0 +1,98 @@
+"""
+Streaming decisions (stream_decision_llm, Agent(stream_answers=True))
+against the fake OpenAI-compatible server.
+"""
+
+import time
+
+ANSWER = {
+    "action": "answer",
+    "search_queries": [],
+    "scratchpad": "Both sources agree.",
+    "message": "Python 3.13 ships a new interactive shell [1]. "
+    + "More detail follows in this sentence. " * 20,
+}
+SEARCH = {
+    "action": "search",
+    "search_queries": ["python 3.13 release notes"],
+    "scratchpad": None,
+    "message": "Let me look that up.",
+}
+CONVERSATION = [
+    {"role": "system", "content": "You are Plexy."},
+    {"role": "user", "content": "What is new in Python 3.13?"},
+]
+
+
+def search_then_answer(messages: list) -> dict:
+    return ANSWER if any(m["role"] == "tool" for m in messages) else SEARCH
+
+
+def consume(stream):
+    """(field, text, arrival time) per chunk, the Decision, and the end time."""
+    chunks = []
+    while True:
+        try:
+            field, text = next(stream)
+        except StopIteration as stop:
+            return chunks, stop.value, time.perf_counter()
+        chunks.append((field, text, time.perf_counter()))
+
+
+def test_answer_streams_in_chunks(openai_stub):
+    from tools.pipeline_helpers import stream_decision_llm
+
+    openai_stub.responder = lambda messages: ANSWER
+    chunks, decision, end = consume(stream_decision_llm(list(CONVERSATION)))
+
+    message = [(text, at) for field, text, at in chunks if field == "message"]
+    assert len(message) > 1
+    assert "".join(text for text, _ in message) == decision.message
+    # The first text shows up well before the stream is over.
+    assert message[0][1] < end - 0.1
+
+
+def test_scratchpad_streams_before_message(openai_stub):
+    from tools.pipeline_helpers import stream_decision_llm
+
+    openai_stub.responder = lambda messages: ANSWER
+    chunks, decision, _ = consume(stream_decision_llm(list(CONVERSATION)))
+
+    assert chunks[0][:2] == ("scratchpad", decision.scratchpad)
+    assert all(field == "message" for field, _, _ in chunks[1:])
+
+
+def test_search_decision_streams_nothing(openai_stub):
+    from tools.pipeline_helpers import stream_decision_llm
+
+    openai_stub.responder = lambda messages: SEARCH
+    chunks, decision, _ = consume(stream_decision_llm(list(CONVERSATION)))
+
+    assert decision.action == "search"
+    assert chunks == []
+
+
+def run_agent(stream_answers: bool) -> list:
+    from core.agent import Agent
+
+    agent = Agent(
+        stream_answers=stream_answers,
+        render_markdown=False,
+        use_answer_cache=False,
+    )
+    chunks = list(agent.run_pipeline("What is new in Python 3.13?"))
+    assert agent.last_answer == ANSWER["message"]
+    return chunks
+
+
+def test_agent_streams_answer_like_blocking_path(openai_stub):
+    openai_stub.responder = search_then_answer
+    streamed = run_agent(stream_answers=True)
+    blocking = run_agent(stream_answers=False)
+
+    output = "".join(streamed)
+    assert sum(1 for chunk in streamed if chunk in ANSWER["message"]) > 1
+    assert SEARCH["message"] not in output
+    assert output.count(ANSWER["message"]) == 1
+    assert output.index("Scratchpad iteration=2") < output.index(ANSWER["message"])
+    assert output == "".join(blocking)
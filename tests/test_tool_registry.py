@@ -0,0 +1,88 @@
+"""Discovering external tools from a --tool-dir."""
+
+import textwrap
+
+import pytest
+
+
+def write_tool(tmp_path, name: str, source: str) -> str:
+    path = tmp_path / f"{name}.py"
+    path.write_text(textwrap.dedent(source))
+    return str(path)
+
+
+@pytest.mark.parametrize(
+    "source, expected",
+    [
+        ('TOOL_NAME = "echo"\ndef run(**args): return args\n', ("echo", {})),
+        (
+            'TOOL_NAME: str = "echo"\nTOOL_PURE: bool = True\n'
+            "def run(**args): return args\n",
+            ("echo", {"TOOL_PURE": True}),
+        ),
+        ("def helper(): pass\n", None),
+        # Only importing the module tells what these are.
+        (
+            'import os\nif os.name == "nt":\n    TOOL_NAME = "a"\nelse:\n'
+            '    TOOL_NAME = "b"\ndef run(**args): return args\n',
+            (None, {}),
+        ),
+        ("from shared import TOOL_NAME\ndef run(**args): return args\n", (None, {})),
+        ('TOOL_NAME = "echo"\nfrom impl import run\n', (None, {})),
+        ('TOOL_NAME = "x".upper()\ndef run(**args): return args\n', (None, {})),
+        ("from shared import *\n", (None, {})),
+    ],
+)
+def test_read_manifest(tmp_path, source, expected):
+    from core.tool_registry import read_manifest
+
+    assert read_manifest(write_tool(tmp_path, "tool", source)) == expected
+
+
+def test_tools_that_cant_be_read_statically_are_imported(tmp_path, capsys):
+    from core.tool_registry import ToolRegistry
+
+    write_tool(
+        tmp_path,
+        "conditional",
+        """
+        import sys
+        if sys.platform:
+            TOOL_NAME = "conditional"
+        TOOL_PURE = True
+        def run(text=""):
+            return {"text": text}
+        """,
+    )
+    write_tool(tmp_path, "not_a_tool", "VALUE = 1\n")
+    registry = ToolRegistry(str(tmp_path))
+
+    assert registry.options["conditional"]["pure"] is True
+    assert registry.run_tool("conditional", {"text": "hi"}) == {"text": "hi"}
+    assert "Skipping not_a_tool.py" in capsys.readouterr().err
+    registry.shutdown()
+
+
+def test_hung_tool_does_not_take_other_tools_workers(tmp_path):
+    from core.tool_registry import ToolRegistry
+
+    write_tool(
+        tmp_path,
+        "hangs",
+        """
+        import time
+        TOOL_NAME = "hangs"
+        TOOL_TIMEOUT_SEC = 0.1
+        def run():
+            time.sleep(1)
+        """,
+    )
+    write_tool(tmp_path, "quick", 'TOOL_NAME = "quick"\ndef run(): return 1\n')
+    registry = ToolRegistry(str(tmp_path), max_workers=2)
+
+    hung = registry.run_tools([("hangs", {})] * 3)
+    assert [r.status for r in hung] == ["timeout"] * 3
+    # Both of the pool's workers are still stuck in "hangs" calls.
+    results = registry.run_tools([("quick", {})] * 4, timeout_sec=0.5)
+    assert [r.result for r in results] == [1] * 4
+    registry.shutdown()
@@ -0,0 +1,21 @@
+"""The --debug trace table."""
+
+from rich.console import Console
+
+
+def test_summary_table_shows_markup_in_values_literally():
+    from core import tracing
+
+    with tracing.span("pipeline", query="[bold]what is [/x] rust") as root:
+        try:
+            with tracing.span("tavily", query="[red]"):
+                raise RuntimeError("HTTP 400 [/error]")
+        except RuntimeError:
+            pass
+
+    console = Console(width=200, record=True)
+    console.print(tracing.summary_table(tracing.finished_subtree(root)))
+    text = console.export_text()
+    assert "query=[bold]what is [/x] rust" in text
+    assert "RuntimeError: HTTP 400 [/error]" in text
+    assert "query=[red]" in text